@@ -1,7 +1,8 @@
 from PyQt5 import QtWidgets
 from PyQt5.QtCore import Qt
-from labjack import ljm
 from collections import deque
+import time
+from backend.telemetry import telemetry
 
 class LoadCell:
     def __init__(self, name, input_channel_1, input_channel_2, max_voltage, max_load, scalar_offset, linear_offset, x, y, parent):
@@ -18,19 +19,47 @@ class LoadCell:
         self.load = 0.0
         self.data = deque(maxlen=5)  # Store last 5
         self.redline = None
+        self.display_precision = 1  # Decimal places shown on the label
         self.linear_offset = linear_offset
         self.scalar_offset = scalar_offset
 
-    def update_load(self, handle):
+    @property
+    def value(self):
+        """Latest reading in engineering units"""
+        return self.load
+
+    def display_text(self):
+        """Latest reading as shown on the P&ID label"""
+        return f"{self.load:.{self.display_precision}f}"
+
+    def calibration(self):
+        """Conversion constants, recorded in the binary log header"""
+        return {"max_voltage": self.max_voltage, "max_load": self.max_load,
+                "scalar_offset": self.scalar_offset, "linear_offset": self.linear_offset}
+
+    def channels(self):
+        """Return the LabJack channels this load cell reads, in the order update_from_voltages expects"""
+        return [self.input_channel_1, self.input_channel_2]
+
+    def convert(self, voltage_diff):
+        """Convert a differential voltage (or an array of them) to load"""
+        return self.scalar_offset * voltage_diff / self.max_voltage * self.max_load - self.linear_offset
+
+    def update_from_voltages(self, voltages):
+        """Update the load reading from voltages already read for each of channels()"""
+        voltage_diff = voltages[0] - voltages[1]
+        # print(f"Load Cell: {voltage_diff}")
+        self.load = self.convert(voltage_diff)
+        self.data.append(self.load)
+
+    def update_load(self, labjack):
+        start_ns = time.perf_counter_ns()
         try:
-            names = ["", "AIN3"]
-            voltages = ljm.eReadNames(handle, 2, [self.input_channel_1, self.input_channel_2])
-            voltage_diff = voltages[0] - voltages[1]
-            # print(f"Load Cell: {voltage_diff}")
-            self.load = self.scalar_offset * voltage_diff / self.max_voltage * self.max_load - self.linear_offset
-            self.label.setText(f"{self.load:.1f}")
-            self.data.append(self.load)
+            voltages = labjack.read_names(self.channels())
+            self.update_from_voltages(voltages)
+            telemetry.record("device.read", time.perf_counter_ns() - start_ns)
         except Exception as e:
+            telemetry.count("device.read_errors")
             self.load = float('nan')
             self.data.append(self.load)
             raise Exception(f"load_cell.py: Error reading load from {self.input_channel_1}: {e}")
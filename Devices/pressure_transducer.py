@@ -1,7 +1,8 @@
 from PyQt5 import QtWidgets
 from PyQt5.QtCore import Qt
-from labjack import ljm
 from collections import deque
+import time
+from backend.telemetry import telemetry
 
 class PressureTransducer:
     def __init__(self, name, input_channel_1, input_channel_2, min_voltage, max_voltage, max_psi, scalar_offset, linear_offset, x, y, parent=None):
@@ -20,23 +21,55 @@ class PressureTransducer:
         self.pressure = 0.0
         self.data = deque(maxlen=5)  # Store last 5
         self.redline = None
+        self.display_precision = 1  # Decimal places shown on the label
         self.linear_offset = linear_offset
         self.scalar_offset = scalar_offset
 
-    def update_pressure(self, handle):
+    @property
+    def value(self):
+        """Latest reading in engineering units"""
+        return self.pressure
+
+    def display_text(self):
+        """Latest reading as shown on the P&ID label"""
+        return f"{self.pressure:.{self.display_precision}f}"
+
+    def calibration(self):
+        """Conversion constants, recorded in the binary log header"""
+        return {"min_voltage": self.min_voltage, "max_voltage": self.max_voltage, "max_psi": self.max_psi,
+                "scalar_offset": self.scalar_offset, "linear_offset": self.linear_offset}
+
+    def channels(self):
+        """Return the LabJack channels this transducer reads, in the order update_from_voltages expects"""
+        if self.input_channel_2 != "":
+            return [self.input_channel_1, self.input_channel_2]
+        return [self.input_channel_1]
+
+    def convert(self, voltage_diff):
+        """Convert a differential voltage (or an array of them) to pressure in psi"""
+        return self.scalar_offset * (voltage_diff-self.min_voltage) / self.voltage_range * self.max_psi - self.linear_offset
+
+    def update_from_voltages(self, voltages):
+        """Update the pressure reading from voltages already read for each of channels()"""
+        voltage_1 = voltages[0]
+        if len(voltages) > 1:
+            voltage_2 = voltages[1]
+        else:
+            voltage_2 = 0
+        voltage_diff = voltage_1 - voltage_2
+        # if self.input_channel_1 == "AIN92":
+        #     print(f"{self.input_channel_1},{self.input_channel_2}: {voltage_diff}")
+        self.pressure = self.convert(voltage_diff)
+        self.data.append(self.pressure)
+
+    def update_pressure(self, labjack):
+        start_ns = time.perf_counter_ns()
         try:
-            voltage_1 = ljm.eReadName(handle, self.input_channel_1)
-            if self.input_channel_2 != "":
-                voltage_2 = ljm.eReadName(handle, self.input_channel_2)
-            else:
-                voltage_2 = 0
-            voltage_diff = voltage_1 - voltage_2
-            # if self.input_channel_1 == "AIN92":
-            #     print(f"{self.input_channel_1},{self.input_channel_2}: {voltage_diff}")
-            self.pressure = self.scalar_offset * (voltage_diff-self.min_voltage) / self.voltage_range * self.max_psi - self.linear_offset
-            self.label.setText(f"{self.pressure:.1f}")
-            self.data.append(self.pressure)
+            voltages = labjack.read_names(self.channels())
+            self.update_from_voltages(voltages)
+            telemetry.record("device.read", time.perf_counter_ns() - start_ns)
         except Exception as e:
+            telemetry.count("device.read_errors")
             self.pressure = float('nan')
             self.data.append(self.pressure)
             raise Exception(f"pressure_transducer.py: Error reading pressure from {self.input_channel_1}: {e}")
@@ -1,7 +1,8 @@
 from PyQt5 import QtWidgets
 from PyQt5.QtCore import Qt
-from labjack import ljm
 from collections import deque
+import time
+from backend.telemetry import telemetry
 
 class Thermocouple:
     def __init__(self, name, input_channel_1, max_voltage, max_temp, scalar_offset, linear_offset, x, y, parent):
@@ -17,17 +18,46 @@ class Thermocouple:
         self.temperature = 0.0
         self.data = deque(maxlen=5)  # Store last 5
         self.redline = None
+        self.display_precision = 1  # Decimal places shown on the label
         self.linear_offset = linear_offset
         self.scalar_offset = scalar_offset
 
-    def update_temperature(self, handle):
+    @property
+    def value(self):
+        """Latest reading in engineering units"""
+        return self.temperature
+
+    def display_text(self):
+        """Latest reading as shown on the P&ID label"""
+        return f"{self.temperature:.{self.display_precision}f}"
+
+    def calibration(self):
+        """Conversion constants, recorded in the binary log header"""
+        return {"max_voltage": self.max_voltage, "max_temp": self.max_temp,
+                "scalar_offset": self.scalar_offset, "linear_offset": self.linear_offset}
+
+    def channels(self):
+        """Return the LabJack channels this thermocouple reads, in the order update_from_voltages expects"""
+        return [self.input_channel_1]
+
+    def convert(self, voltage):
+        """Convert a voltage (or an array of them) to temperature"""
+        return self.scalar_offset * voltage / self.max_voltage * self.max_temp - self.linear_offset
+
+    def update_from_voltages(self, voltages):
+        """Update the temperature reading from voltages already read for each of channels()"""
+        # print(voltages[0])
+        self.temperature = self.convert(voltages[0])
+        self.data.append(self.temperature)
+
+    def update_temperature(self, labjack):
+        start_ns = time.perf_counter_ns()
         try:
-            voltage_1 = ljm.eReadName(handle, self.input_channel_1)
-            # print(voltage_1)
-            self.temperature = self.scalar_offset * voltage_1 / self.max_voltage * self.max_temp - self.linear_offset
-            self.label.setText(f"{self.temperature:.1f}")
-            self.data.append(self.temperature)
+            voltage_1 = labjack.read_name(self.input_channel_1)
+            self.update_from_voltages([voltage_1])
+            telemetry.record("device.read", time.perf_counter_ns() - start_ns)
         except Exception as e:
+            telemetry.count("device.read_errors")
             self.temperature = float('nan')
             self.data.append(self.temperature)
             raise Exception(f"thermocouple.py: Error reading temperature from {self.input_channel_1}: {e}")
@@ -0,0 +1,137 @@
+import re
+import threading
+import time
+from backend.telemetry import telemetry
+from backend.event_log import get_logger
+
+log = get_logger("valves")
+
+# First DIO number of each T7 digital port (FIO0-7 = DIO0-7, EIO0-7 = DIO8-15, ...)
+DIO_PORTS = {"FIO": 0, "EIO": 8, "CIO": 16, "MIO": 20}
+
+def dio_number(output):
+    """DIO number of a digital output name like "EIO3", or None if it is not a digital line"""
+    match = re.fullmatch(r"(FIO|EIO|CIO|MIO)(\d+)", output)
+    if match is None:
+        return None
+    return DIO_PORTS[match.group(1)] + int(match.group(2))
+
+class ValveBank:
+    """
+    Sets many valves in one LabJack command.
+
+    apply() takes the desired state of every valve in a sequence row, works out each output's
+    value (respecting normally open valves) and writes them together. When every output is a
+    digital line the whole row goes out as a single DIO_STATE register write, so all valves
+    switch in the same instant; otherwise one eWriteNames carries every output in one packet.
+    If the batched write fails the bank falls back to the valves' own per-valve writes.
+
+    Every write is recorded in `skew_log`. The skew between valves is not measured (that needs
+    the lines on a scope); max_skew_bound_ms is an upper bound on it from the host's timing: 0
+    for a DIO_STATE write, where the lines change in one register write, the duration of the
+    command for an eWriteNames, and the time from the first write returning to the last for the
+    per-valve fallback.
+    """
+    def __init__(self, valves, labjack):
+        self.valves = list(valves)
+        self.labjack = labjack  # Shared LabJackConnection
+        self.skew_log = []
+        self._lock = threading.Lock()
+
+    def apply(self, states, quiet=False):
+        """
+        Set several valves at once.
+
+        Args:
+            states: dict of valve -> True (open) / False (closed)
+            quiet: log the write at DEBUG instead of INFO (e.g. a shutdown re-asserted every tick)
+
+        Returns:
+            dict: the skew_log entry for this write
+        """
+        with self._lock:
+            outputs = {}  # LabJack output -> value; later valves win if two share an output
+            for valve, valve_open in states.items():
+                valve.valve_open = valve_open
+                if not valve.labjack_output:
+                    continue  # Valve has no output wired
+                value = valve.output_value()
+                if outputs.get(valve.labjack_output, value) != value:
+                    log.warning("Conflicting states for %s in one event, using %s", valve.labjack_output, valve.name)
+                outputs[valve.labjack_output] = value
+
+            try:
+                entry = self._write(outputs)
+            except Exception as e:
+                log.error("Error writing valve bank: %s, falling back to per-valve writes", e)
+                entry = self._write_individually(states)
+            self.skew_log.append(entry)
+
+        for valve in states:
+            valve.valve_changed.emit()
+        (log.debug if quiet else log.info)("Valve bank: %d outputs via %s in %.3f ms (skew <= %.3f ms)",
+                 entry["outputs"], entry["method"], entry["duration_ms"], entry["max_skew_bound_ms"])
+        return entry
+
+    def _write(self, outputs):
+        if not self.labjack.connection_status:
+            raise RuntimeError("LabJack not connected")
+        dio = {output: dio_number(output) for output in outputs}
+        if outputs and None not in dio.values():
+            # Every output is a digital line: one atomic DIO_STATE write. DIO_INHIBIT masks the
+            # lines we are not driving (1 = leave alone) and is cleared again in the same packet.
+            mask = 0
+            state = 0
+            for output, value in outputs.items():
+                mask |= 1 << dio[output]
+                if value:
+                    state |= 1 << dio[output]
+            names = ["DIO_INHIBIT", "DIO_DIRECTION", "DIO_STATE", "DIO_INHIBIT"]
+            values = [~mask & 0x7FFFFF, mask, state, 0]
+            method = "DIO_STATE"
+        else:
+            names = list(outputs)
+            values = [outputs[name] for name in names]
+            method = "eWriteNames"
+
+        start = time.perf_counter_ns()
+        if names:
+            self.labjack.write_names(names, values)
+        duration_ns = time.perf_counter_ns() - start
+        telemetry.record("valves.write", duration_ns)
+        duration_ms = duration_ns / 1e6
+        return {
+            "method": method,
+            "outputs": len(outputs),
+            "duration_ms": duration_ms,
+            "max_skew_bound_ms": 0.0 if method == "DIO_STATE" else duration_ms,
+        }
+
+    def _write_individually(self, states):
+        start = time.perf_counter_ns()
+        first_done = None
+        for valve in states:
+            if not valve.labjack_output:
+                continue
+            valve.update_labjack_output()
+            if first_done is None:
+                first_done = time.perf_counter_ns()
+        end = time.perf_counter_ns()
+        return {
+            "method": "per-valve",
+            "outputs": len(states),
+            "duration_ms": (end - start) / 1e6,
+            "max_skew_bound_ms": 0.0 if first_done is None else (end - first_done) / 1e6,
+        }
+
+    def states(self, valves):
+        """Open/closed state of each of `valves`, never read half way through an apply()"""
+        with self._lock:
+            return [valve.valve_open for valve in valves]
+
+    def skew_summary(self):
+        """Max and mean of the skew upper bounds over every write so far, in ms"""
+        if not self.skew_log:
+            return {"writes": 0, "max_skew_bound_ms": 0.0, "mean_skew_bound_ms": 0.0}
+        bounds = [entry["max_skew_bound_ms"] for entry in self.skew_log]
+        return {"writes": len(bounds), "max_skew_bound_ms": max(bounds), "mean_skew_bound_ms": sum(bounds) / len(bounds)}
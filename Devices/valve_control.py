@@ -1,23 +1,27 @@
 from PyQt5 import QtWidgets
-from labjack import ljm
-import datetime as dt
+from PyQt5.QtCore import pyqtSignal
+from backend.event_log import get_logger
+
+log = get_logger("valves")
 
-# TODO: Fix connect_to_labjack redundancies. Many try catches - device_connected doesn't even get 
-# updated anywhere except shitty hardcode in update_labjack_output
 class ValveControl(QtWidgets.QPushButton):
-    def __init__(self, name, labjack_output, x, y, norm_open = False, horizontal = False, parent=None):
+    # Emitted after every state change; restyles the button on the GUI thread even when the
+    # change came from another thread (e.g. the sequencer scheduler)
+    valve_changed = pyqtSignal()
+
+    def __init__(self, name, labjack_output, x, y, norm_open = False, horizontal = False, parent=None, labjack=None):
         super(ValveControl, self).__init__(parent)
-        print(f"Creating valve {name} with parent: {parent}")
+        log.debug("Creating valve %s with parent: %s", name, parent)
         self.name = name
         self.labjack_output = labjack_output
         self.valve_open = norm_open
-        self.device_connected = False
-        self.handle = None
+        self.labjack = labjack  # Shared LabJackConnection - the valve never opens its own handle
         self.norm_open = norm_open
         # self.setText("C")
         # self.setText("Valve Closed")
         self.update_button_style()
         self.clicked.connect(self.toggle_valve)
+        self.valve_changed.connect(self.update_button_style)
         self.move(x, y)
         # self.adjustSize()
         if horizontal:
@@ -27,13 +31,12 @@ class ValveControl(QtWidgets.QPushButton):
             self.setFixedHeight(int(21 * parent.windim_y/parent.static_y))
             self.setFixedWidth(int(20 * parent.scaled_width/parent.static_width))
 
-        # Initialize a connection and read initial values
-        self.connect_to_labjack()
-        if self.device_connected:
+        # Read initial values through the shared connection
+        if self.device_connected and self.labjack_output:
             try:
                 # Read the current state from the LabJack
-                current_state = ljm.eReadName(self.handle, self.labjack_output)
-                print(f"This is the current state: {current_state}")
+                current_state = self.labjack.read_name(self.labjack_output)
+                log.debug("%s current state: %s", self.name, current_state)
                 # Update our internal state based on actual hardware state (0=open, 1=closed)
                 if norm_open:
                     self.valve_open = (current_state == 1)
@@ -46,22 +49,14 @@ class ValveControl(QtWidgets.QPushButton):
                     # eReadName resets the switch to off, this will switch it back to on
                     self.toggle_valve_on()
 
-                print(f"Initialized {self.name} - Current state: {'OPEN' if self.valve_open else 'CLOSED'}")
+                log.info("Initialized %s - Current state: %s", self.name, "OPEN" if self.valve_open else "CLOSED")
             except Exception as e:
-                print(f"Error reading initial state of {self.name}: {e}")
+                log.error("Error reading initial state of %s: %s", self.name, e)
 
-    def connect_to_labjack(self):
-        """Establish connection to LabJack if not already connected."""
-        if not self.device_connected:
-            try:
-                # Attempt to open LabJack device
-                self.handle = ljm.openS("T7", "ANY", "ANY")
-                self.device_connected = True
-            except Exception as e:
-                print(f"Failed to connect to LabJack: {e}")
-                self.device_connected = False
-        else: 
-            print("Device already connected")
+    @property
+    def device_connected(self):
+        """True while the shared LabJack connection is up"""
+        return self.labjack is not None and self.labjack.connection_status
 
     # def confirm_toggle_valve(self):
     #     """Display confirmation dialog before toggling the valve."""
@@ -98,10 +93,7 @@ class ValveControl(QtWidgets.QPushButton):
     #             self.toggle_valve_on()
 
     def toggle_valve(self):
-        # Ensure connection is established before showing confirmation
-        if not self.device_connected:
-            self.connect_to_labjack()
-
+        # The connection manager reconnects on its own - just refuse while it is down
         if not self.device_connected:
             QtWidgets.QMessageBox.warning(self, "Connection Error", "Failed to connect to LabJack. Please try again.")
             return
@@ -111,50 +103,47 @@ class ValveControl(QtWidgets.QPushButton):
         else:
             self.toggle_valve_on()
 
-        print(f"Valve {self.name} open state: {self.valve_open}")
+        log.info("Valve %s open state: %s", self.name, self.valve_open)
 
     def toggle_valve_on(self):
         """Toggle on the valve and update LabJack output"""
-        print("toggle_on triggered")
-        self.valve_open = True
-        self.update_button_style()
-        self.update_labjack_output()
+        log.debug("%s toggle_on triggered", self.name)
+        self.set_valve(True)
 
     def toggle_valve_off(self):
-        print("toggle_off triggered")
+        log.debug("%s toggle_off triggered", self.name)
         """Toggle off the valve and update LabJack output"""
-        self.valve_open = False
-        self.update_button_style()
+        self.set_valve(False)
+
+    def set_valve(self, valve_open):
+        """Set the valve state and LabJack output. Safe to call from a non-GUI thread."""
+        self.valve_open = valve_open
         self.update_labjack_output()
+        self.valve_changed.emit()
+
+    def output_value(self):
+        """LabJack output value for the current valve state"""
+        if (self.norm_open):
+            return 1 if self.valve_open else 0
+        return 0 if self.valve_open else 1
 
     def update_labjack_output(self):
         """Send the valve state to the LabJack output."""
-        if self.device_connected and self.handle:
-            if (self.norm_open):
-                output_value = 1 if self.valve_open else 0
-            else:
-                output_value = 0 if self.valve_open else 1
+        if self.device_connected and self.labjack_output:
+            output_value = self.output_value()
             try:
-                ljm.eWriteName(self.handle, self.labjack_output, output_value)
-                print(f"{self.labjack_output} set to {output_value} for {'open' if self.valve_open else 'closed'} valve state at {dt.datetime.now()}")
+                self.labjack.write_name(self.labjack_output, output_value)
+                log.info("%s set to %d for %s valve state", self.labjack_output, output_value,
+                         "open" if self.valve_open else "closed", extra={"valve": self.name})
             except Exception as e:
-                print(f"Error writing to {self.labjack_output}: {e}, Attempting Reconnect")
-                self.device_connected = False
-                self.connect_to_labjack()
-                if self.device_connected and self.handle:
-                    if (self.norm_open):
-                        output_value = 1 if self.valve_open else 0
-                    else:
-                        output_value = 0 if self.valve_open else 1
-                    try:
-                        ljm.eWriteName(self.handle, self.labjack_output, output_value)
-                        print(f"{self.labjack_output} set to {output_value} for {'open' if self.valve_open else 'closed'} valve state at {dt.datetime.now()}")
-                    except Exception as e:
-                        print(f"Confirm Error writing to {self.labjack_output}: {e}")
-
-    def update_button_style(self):
-        """Update the button's text and style based on the valve state."""
+                # Reconnecting is left to the connection manager's heartbeat
+                log.error("Error writing to %s: %s", self.labjack_output, e)
+
+    def update_button_style(self, valve_open=None):
+        """Update the button's text and style based on the valve state (or on valve_open, to show a recorded state)."""
+        if valve_open is None:
+            valve_open = self.valve_open
         # text, color = ("Valve Open", "green") if self.valve_open else ("Valve Closed", "red")
-        text, color = ("O", "green") if self.valve_open else ("C", "red")
+        text, color = ("O", "green") if valve_open else ("C", "red")
         self.setText(text)
         self.setStyleSheet(f"background-color: {color}; color: white; font-size: 8pt; font-weight: bold;")
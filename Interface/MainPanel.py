@@ -1,15 +1,28 @@
 from PyQt5 import QtWidgets, QtGui
 from PyQt5.QtCore import Qt
 from Devices.valve_control import ValveControl
+from Devices.valve_bank import ValveBank
 from Devices.pressure_transducer import PressureTransducer
 from Devices.thermocouple import Thermocouple
 from Devices.load_cell import LoadCell
 from backend.labjack_connection import LabJackConnection
+from backend.acquisition import BatchedAcquisition
+from backend.stream_acquisition import StreamAcquisition
+from backend.replay import LogReplay
+from backend.review import open_review
+from backend.sampler import Sampler
+from backend.redline import RedlineEngine
+from backend.conditions import ConditionEngine
+from Interface.live_plots import LivePlots
+from Interface.display_refresh import DisplayRefresher
+from Interface.telemetry_panel import TelemetryPanel
+from Interface.review_mode import ReviewMode
 from backend.data_logger import DataLogger
 from Sequencer.sequencer import Sequencer
-from PyQt5.QtCore import QTimer
+from backend.event_log import get_logger
 import pyqtgraph as pg
-import statistics
+
+log = get_logger("main")
 
 class MainWindow(QtWidgets.QMainWindow):
     def __init__(self):
@@ -102,24 +115,24 @@ class MainWindow(QtWidgets.QMainWindow):
         self._loadcells = []
 
         # Hydrogen Valves
-        self._solenoids.append(ValveControl("SN-H2-01", "CIO1", 1000-5, 682 - 5, parent=self))
+        self._solenoids.append(ValveControl("SN-H2-01", "CIO1", 1000-5, 682 - 5, parent=self, labjack=self.labjack))
         # Oxygen valves
-        self._solenoids.append(ValveControl("SN-O2-01", "EIO0", 862-15, 678-10-10, parent=self))
-        self._solenoids.append(ValveControl("SN-O2-02", "EIO1", 809-15, 677-10-10, parent=self))
+        self._solenoids.append(ValveControl("SN-O2-01", "EIO0", 862-15, 678-10-10, parent=self, labjack=self.labjack))
+        self._solenoids.append(ValveControl("SN-O2-02", "EIO1", 809-15, 677-10-10, parent=self, labjack=self.labjack))
         #Nitrogen Valves
     
-        self._solenoids.append(ValveControl("SN-N2-02", "", 725 -15, 635-20-15+32, horizontal=True, parent=self))
-        self._solenoids.append(ValveControl("SN-N2-01", "", 938-20, 625, horizontal=True, parent=self))
+        self._solenoids.append(ValveControl("SN-N2-02", "", 725 -15, 635-20-15+32, horizontal=True, parent=self, labjack=self.labjack))
+        self._solenoids.append(ValveControl("SN-N2-01", "", 938-20, 625, horizontal=True, parent=self, labjack=self.labjack))
         #407 339
-        self._solenoids.append(ValveControl("SN-N2-07", "EIO7", 376-11, 322-10-30, norm_open=True, horizontal=True, parent=self))
+        self._solenoids.append(ValveControl("SN-N2-07", "EIO7", 376-11, 322-10-30, norm_open=True, horizontal=True, parent=self, labjack=self.labjack))
         # Carbon Valves
-        self._solenoids.append(ValveControl("SN-CO2-01", "EIO3", 588-10, 705- 50 , parent=self))
+        self._solenoids.append(ValveControl("SN-CO2-01", "EIO3", 588-10, 705- 50 , parent=self, labjack=self.labjack))
         # Spark plug
-        #self._solenoids.append(ValveControl("Pilot Circuit", "CIO0", int(self.side_panel_width + (540-self.static_panel_width) * self.scaled_width/self.static_width), int(594 * self.windim_y/973), parent=self))
+        #self._solenoids.append(ValveControl("Pilot Circuit", "CIO0", int(self.side_panel_width + (540-self.static_panel_width) * self.scaled_width/self.static_width), int(594 * self.windim_y/973), parent=self, labjack=self.labjack))
 
         #Pneumatoic Valves (I'll combine them for now)
-        self._solenoids.append(ValveControl("PV-N2-01", "CIO2", 376-11+348, 322-10-30, parent=self))
-        self._solenoids.append(ValveControl("PV-FU-01", "CIO2", 588-10+59, 705- 50, parent=self))
+        self._solenoids.append(ValveControl("PV-N2-01", "CIO2", 376-11+348, 322-10-30, parent=self, labjack=self.labjack))
+        self._solenoids.append(ValveControl("PV-FU-01", "CIO2", 588-10+59, 705- 50, parent=self, labjack=self.labjack))
 
         # # # Label Spark Plug (Spark Plug is not included in Maelstorm, but we are keeping this in case for flexibility of other projects)
         # self.label = QtWidgets.QLabel("Spark Plug", self)
@@ -157,6 +170,38 @@ class MainWindow(QtWidgets.QMainWindow):
         self._thermocouples.append(Thermocouple("TC-H2-03", 0, 5, 10000, 1, 0, 1038-10, 813 -7, self))
 
 
+        # Acquisition layer - reads every sensor above in one LabJack transaction per tick
+        self.acquisition = BatchedAcquisition(self._transducers, self._thermocouples, self._loadcells)
+
+        # Hardware-timed stream mode (1-10 kHz) for capturing fast transients. Off by default.
+        self.stream = StreamAcquisition(self.acquisition, scan_rate=5000)
+        self.stream_button = QtWidgets.QPushButton("Stream Mode: Off", self)
+        self.stream_button.setGeometry(self.windim_x - 260, 50, 240, 25)
+        self.stream_button.clicked.connect(self.toggle_stream_mode)
+        self.stream_status = QtWidgets.QLabel(self.stream.status_text(), self)
+        self.stream_status.setGeometry(self.windim_x - 260, 80, 240, 25)
+        self.stream_status.setAlignment(Qt.AlignCenter)
+        self.stream_status.setStyleSheet("background-color: #2e2e2e; color: white; font-weight: bold;")
+
+        # Replay a recorded log against the current redlines on its own engine - shown on the labels and graphs only
+        self.replay = None
+        self.replay_button = QtWidgets.QPushButton("Replay Log", self)
+        self.replay_button.setGeometry(self.windim_x - 260, 110, 160, 25)
+        self.replay_button.clicked.connect(self.toggle_replay)
+        self.replay_speed = QtWidgets.QComboBox(self)
+        self.replay_speed.addItems(["1x", "10x", "100x", "Max"])
+        self.replay_speed.setGeometry(self.windim_x - 95, 110, 75, 25)
+
+        # Hot-path timing and counters (rates, late ticks, queue depth, stage latencies), refreshed once a second
+        self.telemetry_panel = TelemetryPanel(self, refresh_interval_ms=1000)
+        self.telemetry_panel.setGeometry(self.windim_x - 260, 140, 240, 135)
+
+        # Read-only review of a recorded log: a timeline scrubber drives the labels, valve buttons and graphs
+        self.review = None
+        self.review_button = QtWidgets.QPushButton("Review Log", self)
+        self.review_button.setGeometry(self.windim_x - 260, 280, 240, 25)
+        self.review_button.clicked.connect(self.toggle_review)
+
         # ___ INITIALIZE DATA LOGGER ___
         # Data Logger
         self.data_logger = DataLogger(self._transducers, self._thermocouples, self._loadcells, self._solenoids, width = self.side_panel_width - 15, height = 100, parent=self)
@@ -168,14 +213,19 @@ class MainWindow(QtWidgets.QMainWindow):
         # Set initial border style
         self.update_border_color(self.data_logger.high_speed_mode) # TODO: Figure out why it initializes in high speed
 
-        # Timer for updating data value - this controls the sampling rate
-        self.reading_timer = QTimer(self)
-        self.reading_timer.setTimerType(Qt.PreciseTimer)
-        self.reading_timer.timeout.connect(self.update_data)
-        self.reading_timer.start(500)  # Initial timing at 500ms
+        # Sampler thread for reading data values - this controls the sampling rate. It runs off the GUI
+        # thread and hands snapshots back to update_display at display rate (~30 Hz)
+        # Rolling median redline checks for every sensor - limits are loaded from the sequence file
+        self.redlines = RedlineEngine(self.acquisition.sensors())
+        # Sequence WAIT / ABORTIF conditions, evaluated on every sample the sampler acquires
+        self.conditions = ConditionEngine(self.acquisition.sensors())
 
-        # Give the data logger a reference to the timer 
-        self.data_logger.set_timer(self.reading_timer)
+        self.sampler = Sampler(self.labjack, self.acquisition, self.stream, self.data_logger, self.redlines, interval_ms=500, conditions=self.conditions)  # Initial timing at 500ms
+        self.sampler.snapshot_ready.connect(self.update_display)
+        self.sampler.redline_exceeded.connect(self.redline_shutdown)
+
+        # Give the data logger a reference to the sampler so it can change the sampling rate
+        self.data_logger.set_sampler(self.sampler)
 
         # Initialize graphs of important data for sidebar
         self._graphs = []
@@ -204,6 +254,16 @@ class MainWindow(QtWidgets.QMainWindow):
         self._graphs[2].setTitle("PT-OX-01 Pressure")
         self._graphs[2].showGrid(y=True) 
 
+        # Bounded, decimated curves for the graphs, redrawn at ~30 Hz whatever the sample rate
+        self.live_plots = LivePlots(self.acquisition.sensors(), display_interval_ms=33, parent=self)
+        self._graph_sensors = [("PT-N2-07", 'b'), ("PT-FU-01", 'r'), ("PT-OX-01", 'r')]
+        for graph, (name, color) in zip(self._graphs, self._graph_sensors):
+            self.live_plots.add(name, graph, color)
+        self._plotting = False  # Graphs restart whenever a sequence starts
+
+        # P&ID readout labels are repainted at a fixed UI rate (10 Hz), and only when the shown text changes
+        self.display_refresher = DisplayRefresher(self.acquisition.sensors(), refresh_interval_ms=100, parent=self)
+
         # ____ INITIALIZE SEQUENCER ____
         # Device Map so sequencer can interact with devices
         self.device_map = {}
@@ -219,74 +279,160 @@ class MainWindow(QtWidgets.QMainWindow):
 
         # Create the sequencer with the events and devices 
         # Reference to data_logger is just so sequencer can toggle sampling rate
-        self.sequencer = Sequencer(self.device_map, self.data_logger, width = self.side_panel_width-15, height = 200, parent=self)
+        self.valve_bank = ValveBank(self._solenoids, self.labjack)
+        self.data_logger.valve_bank = self.valve_bank
+        self.sequencer = Sequencer(self.device_map, self.data_logger, width = self.side_panel_width-15, height = 200, parent=self, redline_engine=self.redlines, valve_bank=self.valve_bank, condition_engine=self.conditions)
         # Move the sequencer button to the appropriate position (i think)
         self.sequencer.move(10, 115)
 
+        # Everything the sampler's snapshots touch exists now - start acquiring
+        self.sampler.start()
 
-    # Function for each data read. Reads data from each device and puts it in a rolling window. If the median
-    # of the window exceeds the redline value, it will run the shutdown sequence. The graphs for relevant 
-    # transducers will also be updated. Then, write all the data into the data logger
-    def update_data(self):
-        """Update data readings from all measurement devices if LabJack is connected"""
-        if not self.labjack.connection_status:
-            print("Warning: Cannot update data reading - LabJack not connected")
-            return
-            
-        # Update Transducers
-        for i in range(len(self._transducers)):
-            try:
-                # Update data reading
-                self._transducers[i].update_pressure(self.labjack.handle)
-                if self._transducers[i].redline is not None:
-                    if statistics.median(self._transducers[i].data) > self._transducers[i].redline:
-                        print(f"CRITICAL: {self._transducers[i].name} exceeded redline value! Initiating shutdown.")
-                        print(self._transducers[i].data)
-                        self.perform_shutdown()
-
-                if self._transducers[i].name == "PT-N2-07":
-                    if self.sequencer.running:
-                        # Update Graphs
-                        self.sequencer.PT_N2_07_data.append(self._transducers[i].pressure)
-                        self._graphs[0].plot(self.sequencer.PT_N2_07_data, pen=pg.mkPen(color='b', width=3), clear=True)
-                elif self._transducers[i].name == "PT-FU-01":
-                    if self.sequencer.running:
-                        # Update Graphs
-                        self.sequencer.PT_FU_01_data.append(self._transducers[i].pressure)
-                        self._graphs[1].plot(self.sequencer.PT_FU_01_data, pen=pg.mkPen(color='r', width=3), clear=True)
-                elif self._transducers[i].name == "PT-OX-01":
-                    if self.sequencer.running:
-                        # Update Graphs
-                        self.sequencer.PT_OX_01_data.append(self._transducers[i].pressure)
-                        self._graphs[2].plot(self.sequencer.PT_OX_01_data, pen=pg.mkPen(color='r', width=3), clear=True)
-            except Exception as e:
-                print(f"CRITICAL ERROR: Failed reading pressure from {self._transducers[i].name} ({self._transducers[i].input_channel_1}): {e}")
-                # Log the error more prominently for rocket test infrastructure
-        for i in range(len(self._thermocouples)):
-            try:
-                # Update data reading
-                self._thermocouples[i].update_temperature(self.labjack.handle)
-                if self._thermocouples[i].redline is not None:
-                    if statistics.median(self._thermocouples[i].data) > self._thermocouples[i].redline:
-                        print(f"CRITICAL: {self._thermocouples[i].name} exceeded redline value! Initiating shutdown.")
-                        print(self._thermocouples[i].data)
-                        self.perform_shutdown()
-            except Exception as e:
-                print(f"CRITICAL ERROR: Failed reading pressure from {self._thermocouples[i].name} ({self._thermocouples[i].input_channel_1}): {e}")
-                # Log the error more prominently for rocket test infrastructure
-        for i in range(len(self._loadcells)):
+
+    # Function for each snapshot from the sampler thread. Adds every row sampled since the last snapshot to the
+    # graphs for relevant transducers. The P&ID labels are refreshed separately by self.display_refresher
+    def update_display(self, snapshot):
+        """Update the GUI from a sampler snapshot (runs on the GUI thread)"""
+        if self.sequencer.running:
+            if not self._plotting:
+                self.live_plots.clear()
+                self._plotting = True
+            # Update Graphs (the plots redraw themselves on their own timer)
+            self.live_plots.append_rows(snapshot["rows"])
+        else:
+            self._plotting = False
+
+        if self.stream.running or self.stream.error is not None:
+            if self.stream.error is not None:
+                # Stream died on its own (e.g. connection lost) - the sampler is back on polled reads
+                self.stream.error = None
+            self.update_stream_status()
+
+    # Called on every sampler tick while a device's rolling median is over its redline, so a valve reopened
+    # during the over-pressure is closed again on the next tick. Only the first tick of a crossing is logged
+    def redline_shutdown(self, name, data, new):
+        if new:
+            log.critical("%s exceeded redline value! Initiating shutdown. Window: %s", name, list(data))
+        self.perform_shutdown(quiet=not new)
+
+    def toggle_stream_mode(self):
+        """Start or stop hardware-timed stream acquisition"""
+        if self.stream.running:
+            self.stream.stop()
+        elif not self.labjack.connection_status:
+            log.warning("Cannot start stream - LabJack not connected")
+        else:
             try:
-                # Update data reading
-                self._loadcells[i].update_load(self.labjack.handle)
-                if self._loadcells[i].redline is not None:
-                    if statistics.median(self._loadcells[i].data) > self._loadcells[i].redline:
-                        print(f"CRITICAL: {self._loadcells[i].name} exceeded redline value! Initiating shutdown.")
-                        print(self._loadcells[i].data)
-                        self.perform_shutdown()
+                self.stream.start(self.labjack)
             except Exception as e:
-                print(f"CRITICAL ERROR: Failed reading pressure from {self._loadcells[i].name} ({self._loadcells[i].input_channel_1}): {e}")
-                # Log the error more prominently for rocket test infrastructure
-        self.data_logger.log_data()
+                log.error("Error starting stream: %s", e)
+                QtWidgets.QMessageBox.warning(self, "Stream Error", f"Could not start stream mode: {e}")
+        self.update_stream_status()
+
+    def toggle_replay(self):
+        """Pick a log and replay it against the current redlines, or end the current replay"""
+        if self.replay is not None:
+            self.end_replay()
+            return
+        # The replay takes over the labels and graphs - never while the rig could need them
+        if self.sequencer.running:
+            QtWidgets.QMessageBox.warning(self, "Replay Log", "Stop the sequence before replaying a log.")
+            return
+        if self.labjack.connection_status:
+            QtWidgets.QMessageBox.warning(self, "Replay Log", "Disconnect the LabJack before replaying a log.")
+            return
+        if self.review is not None:
+            self.end_review()
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Replay Log", "", "Logs (*.csv *.mlog)")
+        if not path:
+            log.info("No file selected")
+            return
+        speed = self.replay_speed.currentText()
+        self.replay = LogReplay(self.acquisition.sensors(), self.redlines, path,
+                                speed=None if speed == "Max" else float(speed.rstrip("x")))
+        self.replay.rows_ready.connect(self.replay_rows)
+        self.replay.done.connect(self.update_stream_status)
+        self.live_plots.clear()
+        self.display_refresher.pause()
+        self.sequencer.setEnabled(False)
+        self.replay.start()
+        self.update_stream_status()
+
+    def replay_rows(self, timestamps, values):
+        """Show a block of replayed rows on the graphs and labels"""
+        if self.replay is None or self.sender() is not self.replay:
+            return  # Queued before the replay was ended
+        if self.labjack.connection_status:
+            log.warning("LabJack connected - ending replay")
+            self.end_replay()
+            return
+        self.live_plots.append_block(timestamps, values)
+        self.display_refresher.show_values({device.name: float(value)
+                                            for device, value in zip(self.replay.sensors, values[-1])})
+        self.update_stream_status()
+
+    def end_replay(self):
+        """Stop replaying and go back to the live display"""
+        self.replay.stop()
+        self.replay = None
+        self.live_plots.clear()
+        self.display_refresher.resume()
+        self.sequencer.setEnabled(True)
+        self.update_stream_status()
+
+    def toggle_review(self):
+        """Pick a log and review it, or leave review mode"""
+        if self.review is not None:
+            self.end_review()
+            return
+        if self.replay is not None:
+            self.end_replay()
+        if self.sequencer.running:
+            QtWidgets.QMessageBox.warning(self, "Review Log", "Stop the sequence before reviewing a log.")
+            return
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Review Log", "", "Logs (*.csv *.mlog)")
+        if not path:
+            log.info("No file selected")
+            return
+        # Instant for a .mlog with a pyramid; a CSV is converted (and a missing pyramid built) once
+        QtWidgets.QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            review = open_review(path)
+        except (OSError, ValueError, KeyError) as e:
+            log.error("Could not open %s for review: %s", path, e)
+            QtWidgets.QMessageBox.warning(self, "Review Error", f"Could not open {path}: {e}")
+            return
+        finally:
+            QtWidgets.QApplication.restoreOverrideCursor()
+        graphs = [(name, graph, color) for graph, (name, color) in zip(self._graphs, self._graph_sensors)]
+        timeline = (self.side_panel_width + 10, self.windim_y - 50, self.scaled_width - 20, 40)
+        self.review = ReviewMode(review, self.acquisition.sensors(), self._solenoids, self.display_refresher,
+                                 graphs, timeline, parent=self)
+        self.sequencer.setEnabled(False)
+        self.review_button.setText("End Review")
+        log.info("Reviewing %s (%.1f s)", path, review.duration)
+
+    def end_review(self):
+        """Leave review mode and go back to the live display"""
+        self.review.close()
+        self.review = None
+        self.sequencer.setEnabled(True)
+        self.review_button.setText("Review Log")
+
+    def update_stream_status(self):
+        """Update the stream button and counters label"""
+        if self.stream.running:
+            self.stream_button.setText("Stream Mode: On")
+            self.stream_button.setStyleSheet("background-color: #4CAF50; color: white; font-weight: bold;")
+        else:
+            self.stream_button.setText("Stream Mode: Off")
+            self.stream_button.setStyleSheet("")
+        if self.replay is not None:
+            self.replay_button.setText("End Replay")
+            self.stream_status.setText(self.replay.status_text())
+        else:
+            self.replay_button.setText("Replay Log")
+            self.stream_status.setText(self.stream.status_text())
 
     # Function just to update border color to appropriate logging speed color
     def update_border_color(self, high_speed_mode):
@@ -302,12 +448,23 @@ class MainWindow(QtWidgets.QMainWindow):
         self.border_frame.setStyleSheet(border_style)
 
     # Shutdown sequence to properly depower devices (solenoids)
-    def perform_shutdown(self):
-        print("Shutting down")
+    def perform_shutdown(self, quiet=False):
+        """Every valve to its normal state (quiet: no INFO logging, for a shutdown re-asserted every tick)"""
+        if not quiet:
+            log.info("Shutting down")
+        # Show the real valve states again
+        if self.review is not None:
+            self.end_review()
         # Stop sequencer
         if self.sequencer.running:
             self.sequencer.stop_sequencer()
-        # Turn off all devices
+        # Turn off all devices - every valve to its normal state in one command
+        if self.labjack.connection_status and self.labjack.handle:
+            try:
+                self.valve_bank.apply({device: device.norm_open for device in self._solenoids}, quiet=quiet)
+                return
+            except Exception as e:
+                log.error("Error shutting down valve bank: %s, closing valves one at a time", e)
         for device in self._solenoids:
             try:
                 # Force the valve to off (careful of normally opened) regardless of UI state
@@ -318,11 +475,11 @@ class MainWindow(QtWidgets.QMainWindow):
                         device.toggle_valve_on()
                     else:
                         device.toggle_valve_off()
-                    print(f"{device.name} open state set to {device.valve_open}")
+                    log.info("%s open state set to %s", device.name, device.valve_open)
                 else:
-                    print(f"WARNING: Could not shut down {device.name} - No connection")
+                    log.warning("Could not shut down %s - No connection", device.name)
             except Exception as e:
-                print(f"ERROR closing {device.name}: {e}")
+                log.error("Error closing %s: %s", device.name, e)
     def closeEvent(self, event):
         # Graceful exit
         if not self.is_closing:
@@ -330,6 +487,10 @@ class MainWindow(QtWidgets.QMainWindow):
 
             # Perform shutdown tasks - only do this from the main window
             self.perform_shutdown()
+            self.stream.stop()
+            if self.replay is not None:
+                self.replay.stop()
+            self.sampler.stop()
             self.data_logger.stop()
             self.labjack.close_connection()
         event.accept()
\ No newline at end of file
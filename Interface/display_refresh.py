@@ -0,0 +1,60 @@
+from PyQt5.QtCore import QObject, QTimer
+
+class DisplayRefresher(QObject):
+    """
+    Refreshes the P&ID readout labels at a fixed UI rate.
+
+    On every refresh the latest value of each registered device is formatted at display
+    precision and the label is only repainted if that text changed, so noise below the last
+    displayed digit costs nothing. The sampler keeps writing device values at full rate and
+    never waits on a widget.
+    """
+    def __init__(self, devices, refresh_interval_ms=100, parent=None):
+        super().__init__(parent)
+        self._devices = list(devices)
+        self._shown = {}  # device name -> text currently on its label
+        self.skipped = 0  # Refreshes where the text was unchanged
+        self.updated = 0  # Labels actually repainted
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(refresh_interval_ms)
+
+    def set_refresh_interval(self, refresh_interval_ms):
+        """Change the UI refresh rate"""
+        self.refresh_timer.setInterval(refresh_interval_ms)
+
+    def pause(self):
+        """Stop showing live readings (e.g. while a recorded log is reviewed with show_values)"""
+        self.refresh_timer.stop()
+
+    def resume(self):
+        """Show live readings again, repainting every label on the next refresh"""
+        self._shown.clear()
+        self.refresh_timer.start()
+
+    def register(self, device):
+        """Add a device whose label should be kept up to date"""
+        self._devices.append(device)
+
+    def refresh(self):
+        """Push changed readings to their labels"""
+        for device in self._devices:
+            text = device.display_text()
+            if self._shown.get(device.name) == text:
+                self.skipped += 1
+                continue
+            self._shown[device.name] = text
+            device.label.setText(text)
+            self.updated += 1
+
+    def show_values(self, values):
+        """Show given readings (device name -> value, NaN if unknown) at display precision instead of the live ones"""
+        for device in self._devices:
+            text = f"{values.get(device.name, float('nan')):.{device.display_precision}f}"
+            if self._shown.get(device.name) == text:
+                self.skipped += 1
+                continue
+            self._shown[device.name] = text
+            device.label.setText(text)
+            self.updated += 1
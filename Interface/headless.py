@@ -0,0 +1,16 @@
+"""
+Qt for the headless entry points (benchmarks, data reduction plots). Importing this selects the
+offscreen platform unless QT_QPA_PLATFORM is already set, so no display is needed.
+"""
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import sys
+from PyQt5 import QtWidgets
+
+def application():
+    """The QApplication, created on first use"""
+    app = QtWidgets.QApplication.instance()
+    if app is None:
+        app = QtWidgets.QApplication(sys.argv[:1])
+    return app
@@ -0,0 +1,115 @@
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtCore import QObject, QTimer, Qt
+from backend.event_log import get_logger
+
+log = get_logger("plots")
+
+def min_max_decimate(times, values, buckets):
+    """
+    Reduce a trace to at most 2 points per bucket (the min and the max, in time order) so that
+    peaks survive when thousands of samples share a pixel column.
+    """
+    count = len(values)
+    if buckets < 1 or count <= 2 * buckets:
+        return times, values
+    size = count // buckets
+    usable = size * buckets  # Drop the oldest remainder so buckets line up with the newest sample
+    times = times[count - usable:].reshape(buckets, size)
+    values = values[count - usable:].reshape(buckets, size)
+    low = np.argmin(values, axis=1)
+    high = np.argmax(values, axis=1)
+    picks = np.stack([np.minimum(low, high), np.maximum(low, high)], axis=1)
+    rows = np.arange(buckets)[:, None]
+    return times[rows, picks].ravel(), values[rows, picks].ravel()
+
+class LivePlot:
+    """One plotted channel: a bounded ring of (time, value) and a persistent PlotDataItem"""
+    def __init__(self, widget, column, color, capacity=30000):
+        self.widget = widget
+        self.column = column
+        self.curve = widget.plot(pen=pg.mkPen(color=color, width=3))
+        self._times = np.empty(capacity)
+        self._values = np.empty(capacity)
+        self._written = 0
+        self._dirty = False
+
+    def append(self, times, values):
+        """Add samples, overwriting the oldest once the ring is full"""
+        capacity = len(self._times)
+        if len(times) > capacity:
+            times, values = times[-capacity:], values[-capacity:]
+        rows = (self._written + np.arange(len(times))) % capacity
+        self._times[rows] = times
+        self._values[rows] = values
+        self._written += len(times)
+        self._dirty = True
+
+    def clear(self):
+        self._written = 0
+        self._dirty = True
+
+    def redraw(self):
+        """Push the decimated ring contents into the existing curve (only if new data arrived)"""
+        if not self._dirty:
+            return
+        self._dirty = False
+        capacity = len(self._times)
+        count = min(self._written, capacity)
+        rows = (self._written - count + np.arange(count)) % capacity
+        times, values = min_max_decimate(self._times[rows], self._values[rows], self.widget.width())
+        self.curve.setData(times, values)
+
+class LivePlots(QObject):
+    """
+    Live sidebar plots with bounded memory and a fixed display rate.
+
+    Samples are appended to each plot's ring buffer as snapshots arrive, but curves are only
+    redrawn by a timer (~30 Hz by default), independent of the sample rate. Each redraw updates
+    the existing PlotDataItem with setData, decimated to the plot's pixel width, so redraw cost
+    stays constant however long the test runs.
+    """
+    def __init__(self, sensors, display_interval_ms=33, parent=None):
+        super().__init__(parent)
+        self._columns = {device.name: column for column, device in enumerate(sensors)}
+        self._plots = []
+        self._t0_ns = None  # Time zero of the x axis (first sample after clear)
+
+        self.redraw_timer = QTimer(self)
+        self.redraw_timer.setTimerType(Qt.PreciseTimer)
+        self.redraw_timer.timeout.connect(self.redraw)
+        self.redraw_timer.start(display_interval_ms)
+
+    def add(self, name, widget, color, capacity=30000):
+        """Plot a sensor on a PlotWidget. Sensors that do not exist are ignored (the plot stays empty)."""
+        if name not in self._columns:
+            log.warning("No sensor named %s to plot", name)
+            return
+        self._plots.append(LivePlot(widget, self._columns[name], color, capacity))
+
+    def append_rows(self, rows):
+        """Add sampler rows ((timestamp_ns, [value per sensor]) tuples) to every plot"""
+        if not rows or not self._plots:
+            return
+        self.append_block(np.array([timestamp for timestamp, _ in rows], dtype=np.int64),
+                          np.array([row for _, row in rows], dtype=np.float64))
+
+    def append_block(self, timestamps_ns, values):
+        """Add a block of rows: int64 timestamps in ns and a (rows x sensors) array of values"""
+        if len(timestamps_ns) == 0 or not self._plots:
+            return
+        if self._t0_ns is None:
+            self._t0_ns = int(timestamps_ns[0])
+        times = (timestamps_ns - self._t0_ns) / 1e9
+        for plot in self._plots:
+            plot.append(times, values[:, plot.column])
+
+    def clear(self):
+        """Empty every plot and restart the time axis at the next sample"""
+        self._t0_ns = None
+        for plot in self._plots:
+            plot.clear()
+
+    def redraw(self):
+        for plot in self._plots:
+            plot.redraw()
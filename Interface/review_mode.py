@@ -0,0 +1,147 @@
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import QObject, QTimer, Qt, pyqtSignal
+import pyqtgraph as pg
+from backend.log_format import format_timestamp
+from backend.review import sensor_column
+
+class ReviewTimeline(QtWidgets.QWidget):
+    """Scrubber for a reviewed log: a slider over the whole log in 1 ms steps and the time under it"""
+    time_changed = pyqtSignal(float)  # Seconds since the epoch
+
+    def __init__(self, start, end, parent=None):
+        super().__init__(parent)
+        self.start = start
+        self.setStyleSheet("background-color: #2e2e2e; color: white; font-weight: bold;")
+        layout = QtWidgets.QHBoxLayout(self)
+        layout.setContentsMargins(8, 4, 8, 4)
+        self.slider = QtWidgets.QSlider(Qt.Horizontal, self)
+        self.slider.setRange(0, max(1, round((end - start) * 1000)))
+        self.slider.setSingleStep(10)
+        self.slider.setPageStep(1000)
+        self.label = QtWidgets.QLabel(self)
+        self.label.setMinimumWidth(330)
+        layout.addWidget(self.slider)
+        layout.addWidget(self.label)
+        self.slider.valueChanged.connect(self._slider_moved)
+
+    def _slider_moved(self, value):
+        self.time_changed.emit(self.start + value / 1000)
+
+    def set_time(self, timestamp):
+        """Move the slider and label to a time without emitting time_changed"""
+        self.slider.blockSignals(True)
+        self.slider.setValue(round((timestamp - self.start) * 1000))
+        self.slider.blockSignals(False)
+        self.label.setText(f"{format_timestamp(timestamp)[:-3]}  (T+{timestamp - self.start:.3f} s)")
+
+class ReviewPlot:
+    """
+    One sidebar graph showing a column of the reviewed log, x axis in seconds from the start
+    of the log. Only the visible range is loaded - whenever the view changes the curve is
+    replaced with ReviewLog.trace for that range at the graph's pixel width. The live curve is
+    hidden (not removed) while reviewing; a draggable line marks the scrubbed time.
+    """
+    def __init__(self, review, widget, column, color):
+        self.review = review
+        self.widget = widget
+        self.column = column
+        self._view_range = widget.viewRange()
+        self._hidden = [item for item in widget.listDataItems() if item.isVisible()]
+        for item in self._hidden:
+            item.hide()
+        self.curve = widget.plot(pen=pg.mkPen(color=color, width=2), connect="finite")
+        self.cursor = pg.InfiniteLine(angle=90, movable=True, pen=pg.mkPen("k", width=1))
+        widget.addItem(self.cursor)
+        # Reload at most once per event loop pass while the view is being dragged or zoomed
+        self._reload_timer = QTimer()
+        self._reload_timer.setSingleShot(True)
+        self._reload_timer.timeout.connect(self.reload)
+        widget.sigXRangeChanged.connect(self._range_changed)
+        widget.enableAutoRange(axis="y")
+        widget.setXRange(0, review.duration, padding=0)
+        self.reload()
+
+    def _range_changed(self, *args):
+        self._reload_timer.start(0)
+
+    def reload(self):
+        if self.column is None:
+            return
+        low, high = self.widget.viewRange()[0]
+        start = self.review.start
+        times, values = self.review.trace(self.column, start + low, start + high, max(self.widget.width(), 100))
+        self.curve.setData(times - start, values)
+
+    def close(self):
+        """Remove the review curve and cursor and bring back the live curve and view"""
+        self._reload_timer.stop()
+        self.widget.sigXRangeChanged.disconnect(self._range_changed)
+        self.widget.removeItem(self.curve)
+        self.widget.removeItem(self.cursor)
+        for item in self._hidden:
+            item.show()
+        self.widget.disableAutoRange()
+        (x_low, x_high), (y_low, y_high) = self._view_range
+        self.widget.setRange(xRange=(x_low, x_high), yRange=(y_low, y_high), padding=0)
+        self.widget.enableAutoRange(axis="x")
+
+class ReviewMode(QObject):
+    """
+    Read-only review of a recorded log in the main window.
+
+    Scrubbing the timeline (or dragging the cursor on any graph) shows the recorded readings on
+    the P&ID labels, through the display refresher so only changed labels repaint, and the
+    recorded valve states on the ValveControl buttons - without touching the valves' real
+    state, which keeps tracking the hardware. Valve buttons are disabled while reviewing. A
+    time lookup is a binary search in the memory-mapped log, so scrubbing costs the same at any
+    log size. Live acquisition and logging carry on underneath; close() puts the live display back.
+    """
+    def __init__(self, review, sensors, valves, refresher, graphs, timeline_geometry, parent=None):
+        super().__init__(parent)
+        self.review = review
+        self.refresher = refresher
+        self._sensors = [(device.name, sensor_column(device.name, review.columns)) for device in sensors]
+        self._valves = [(valve, f"{valve.name} State" if f"{valve.name} State" in review.columns else None)
+                        for valve in valves]
+        self.time = review.start
+
+        refresher.pause()
+        for valve, _ in self._valves:
+            valve.setEnabled(False)
+        self.timeline = ReviewTimeline(review.start, review.end, parent)
+        self.timeline.setGeometry(*timeline_geometry)
+        self.timeline.time_changed.connect(self.show_time)
+        self.timeline.show()
+        self.plots = []
+        for name, widget, color in graphs:
+            plot = ReviewPlot(review, widget, sensor_column(name, review.columns), color)
+            plot.cursor.sigPositionChanged.connect(self._cursor_moved)
+            self.plots.append(plot)
+        self.show_time(review.start)
+
+    def _cursor_moved(self, cursor):
+        self.show_time(self.review.start + cursor.value())
+
+    def show_time(self, timestamp):
+        """Show the log as it was at `timestamp` (seconds since the epoch)"""
+        self.time = min(max(timestamp, self.review.start), self.review.end)
+        row = self.review.row_at(self.time)
+        self.refresher.show_values({name: float(row[column]) for name, column in self._sensors if column is not None})
+        for valve, column in self._valves:
+            if column is not None:
+                valve.update_button_style(bool(row[column]))
+        self.timeline.set_time(self.time)
+        for plot in self.plots:
+            plot.cursor.blockSignals(True)
+            plot.cursor.setValue(self.time - self.review.start)
+            plot.cursor.blockSignals(False)
+
+    def close(self):
+        """Leave review: live labels, real valve states and live graphs come back"""
+        for plot in self.plots:
+            plot.close()
+        self.timeline.deleteLater()
+        for valve, _ in self._valves:
+            valve.setEnabled(True)
+            valve.update_button_style()
+        self.refresher.resume()
@@ -0,0 +1,58 @@
+from PyQt5 import QtWidgets, QtGui
+from PyQt5.QtCore import QTimer, Qt
+from backend.telemetry import telemetry
+
+# Stages shown in the panel, in pipeline order (label, telemetry stage)
+STAGES = [
+    ("tick", "sampler.tick"),
+    ("read", "sampler.read"),
+    ("redline", "sampler.redline"),
+    ("log write", "logger.write"),
+    ("valves", "valves.write"),
+    ("seq late", "sequencer.lateness"),
+]
+
+class TelemetryPanel(QtWidgets.QLabel):
+    """
+    Live view of the hot-path telemetry (backend/telemetry.py).
+
+    Every refresh shows what happened since the previous one: effective sample rate, late
+    ticks, lost stream scans, logger queue depth and dropped rows, and p50/p99 of each pipeline
+    stage. Reading the counters is cheap and happens on the GUI thread only.
+    """
+    def __init__(self, parent=None, refresh_interval_ms=1000):
+        super().__init__(parent)
+        self.setAlignment(Qt.AlignLeft | Qt.AlignTop)
+        self.setFont(QtGui.QFont("Monospace", 8))
+        self.setStyleSheet("background-color: #2e2e2e; color: white; padding: 4px;")
+        self._mark = telemetry.mark()
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(refresh_interval_ms)
+        self.refresh()
+
+    def refresh(self):
+        snapshot = telemetry.snapshot(self._mark)
+        self._mark = telemetry.mark()
+        self.setText(self.format(snapshot))
+
+    @staticmethod
+    def format(snapshot):
+        """Panel text for a telemetry snapshot"""
+        counters = snapshot["counters"]
+        rates = snapshot["rates"]
+        gauges = snapshot["gauges"]
+        lines = [
+            f"rate {rates.get('sampler.rows', 0.0):8.1f} rows/s",
+            f"late {counters.get('sampler.late_ticks', 0):4d}  lost {counters.get('stream.lost_scans', 0):6d}",
+            f"log q {gauges.get('logger.queue_depth', 0):3d}  dropped {counters.get('logger.rows_dropped', 0):5d}",
+            f"{'stage':<9} {'p50 ms':>7} {'p99 ms':>7} {'n':>5}",
+        ]
+        for label, name in STAGES:
+            stage = snapshot["stages"].get(name)
+            if stage is None or stage["count"] == 0:
+                lines.append(f"{label:<9} {'-':>7} {'-':>7} {0:5d}")
+            else:
+                lines.append(f"{label:<9} {stage['p50_ms']:7.2f} {stage['p99_ms']:7.2f} {stage['count']:5d}")
+        return "\n".join(lines)
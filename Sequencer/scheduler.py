@@ -0,0 +1,126 @@
+import ctypes
+import os
+import sys
+import threading
+import time
+from backend.telemetry import telemetry
+from backend.event_log import get_logger
+
+log = get_logger("sequencer")
+
+def raise_thread_priority():
+    """Best effort: make the calling thread high priority. Returns True if it worked."""
+    try:
+        if sys.platform == "win32":
+            THREAD_PRIORITY_TIME_CRITICAL = 15
+            kernel32 = ctypes.windll.kernel32
+            return bool(kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_PRIORITY_TIME_CRITICAL))
+        # Real-time scheduling needs elevated privileges on Linux/macOS
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(os.sched_get_priority_min(os.SCHED_FIFO)))
+        return True
+    except (AttributeError, OSError):
+        return False
+
+class DeadlineScheduler:
+    """
+    Fires sequence events at absolute deadlines measured from T0 on the monotonic clock.
+
+    Every deadline is T0 + the event's offset, so lateness in one event (event-loop latency,
+    prints, a slow LabJack write) never pushes back the ones after it. The scheduler runs on
+    its own thread, independent of the Qt event loop: it sleeps until shortly before each
+    deadline and spins for the last `spin_ms` to avoid OS sleep granularity (~15 ms on Windows).
+
+    The planned and actual firing time of every event is kept in `timing_log` so timing error
+    can be quantified after a run. A fire callback may call delay() to push every later
+    deadline back (e.g. after waiting on a sequence condition); `shift_ns` totals those delays.
+    """
+    def __init__(self, spin_ms=2.0):
+        self.spin_ns = int(spin_ms * 1_000_000)
+        self.thread = None
+        self._stop = threading.Event()
+        self.timing_log = []
+        self.high_priority = False
+        self.t0_ns = None
+        self.deadline_ns = None  # Deadline of the event being fired
+        self.shift_ns = 0
+
+    def start(self, offsets_ms, fire, on_finished=None):
+        """
+        Start firing events.
+
+        Args:
+            offsets_ms: Firing time of each event in ms after T0 (non-decreasing)
+            fire: Called as fire(index) on the scheduler thread; returning False ends the run
+            on_finished: Called as on_finished(completed) on the scheduler thread when the run ends
+        """
+        self.stop()
+        self._stop.clear()
+        self.timing_log = []
+        self.thread = threading.Thread(target=self._run, args=(list(offsets_ms), fire, on_finished))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self, wait=True):
+        """Cancel any remaining events (safe to call from a fire callback; wait=False returns without joining)"""
+        self._stop.set()
+        if wait and self.thread is not None and self.thread is not threading.current_thread() and self.thread.is_alive():
+            self.thread.join()
+
+    def delay(self, delay_ns):
+        """Push every remaining deadline back by delay_ns (call from the fire callback)"""
+        self.t0_ns += delay_ns
+        self.shift_ns += delay_ns
+
+    def _wait_until(self, deadline_ns):
+        """Sleep then spin until the deadline. Returns False if stopped first."""
+        while True:
+            remaining = deadline_ns - time.perf_counter_ns()
+            if remaining <= 0:
+                return not self._stop.is_set()
+            if remaining > self.spin_ns:
+                if self._stop.wait((remaining - self.spin_ns) / 1e9):
+                    return False
+            elif self._stop.is_set():
+                return False
+
+    def _run(self, offsets_ms, fire, on_finished):
+        self.high_priority = raise_thread_priority()
+        if not self.high_priority:
+            log.warning("Sequencer scheduler: could not raise thread priority, running at normal priority")
+        self.t0_ns = time.perf_counter_ns()
+        self.shift_ns = 0
+        completed = True
+        for index, offset_ms in enumerate(offsets_ms):
+            t0_ns = self.t0_ns  # fire() may delay() the deadlines after this one
+            planned_ns = t0_ns + int(offset_ms * 1_000_000)
+            self.deadline_ns = planned_ns
+            if not self._wait_until(planned_ns):
+                completed = False
+                break
+            fired_ns = time.perf_counter_ns()
+            telemetry.record("sequencer.lateness", max(0, fired_ns - planned_ns))
+            try:
+                keep_going = fire(index)
+            except Exception as e:
+                log.error("Sequencer scheduler: event %d failed: %s", index, e)
+                keep_going = False
+            done_ns = time.perf_counter_ns()
+            self.timing_log.append({
+                "event": index,
+                "planned_ms": offset_ms,
+                "actual_ms": (fired_ns - t0_ns) / 1e6,
+                "error_ms": (fired_ns - planned_ns) / 1e6,
+                "duration_ms": (done_ns - fired_ns) / 1e6,
+                "shift_ms": self.shift_ns / 1e6,
+            })
+            log.info("Event %d: planned %s ms, fired %.3f ms (error %+.3f ms)",
+                     index, offset_ms, (fired_ns - t0_ns) / 1e6, (fired_ns - planned_ns) / 1e6)
+            if keep_going is False:
+                completed = False
+                break
+        if self.timing_log:
+            errors = [abs(entry["error_ms"]) for entry in self.timing_log]
+            log.info("Sequencer timing: %d events, max error %.3f ms, mean error %.3f ms",
+                     len(errors), max(errors), sum(errors) / len(errors))
+        if on_finished is not None:
+            on_finished(completed)
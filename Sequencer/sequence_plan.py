@@ -0,0 +1,223 @@
+import csv
+from collections import namedtuple
+from types import MappingProxyType
+from backend.conditions import COMPARISONS, Condition
+
+CHECKPSI = "CHECKPSI"
+# Condition rows: keyword -> (quantity, is a wait)
+CONDITION_ROWS = {
+    "WAIT": ("level", True),
+    "WAITRATE": ("rate", True),
+    "ABORTIF": ("level", False),
+    "ABORTIFRATE": ("rate", False),
+}
+
+class SequenceError(ValueError):
+    """A sequence file that cannot be run. The message names the offending line."""
+
+class PressureGate(namedtuple("PressureGate", "device minimum_psi")):
+    """CHECKPSI step: the sequence only continues if `device` reads at least `minimum_psi`"""
+    __slots__ = ()
+
+    def passes(self):
+        # A NaN reading (dead or disconnected sensor) fails the gate
+        return self.device.pressure >= self.minimum_psi
+
+class Wait(namedtuple("Wait", "condition timeout_ms")):
+    """WAIT / WAITRATE step: hold the sequence until the condition is met, abort after timeout_ms"""
+    __slots__ = ()
+
+class SequenceStep(namedtuple("SequenceStep", "offset_ms changes gate wait guard line")):
+    """
+    One row of the sequence, fired at offset_ms from T0.
+
+    changes is a read-only mapping of valve -> open (True) / closed (False) holding only the
+    valves whose state differs from the previous valve row. Condition rows have no changes and
+    one of: gate, a PressureGate (CHECKPSI); wait, a Wait (WAIT, WAITRATE); guard, a Condition
+    that aborts the sequence if it is met at any time from this step on (ABORTIF,
+    ABORTIFRATE). line is the row's line number in the file.
+    """
+    __slots__ = ()
+
+class RedlineLimit(namedtuple("RedlineLimit", "device_name limit_psi window")):
+    """A redline from the Limits section (window is None for the engine's default)"""
+    __slots__ = ()
+
+class SequencePlan(namedtuple("SequencePlan", "source valves initial_state steps limits warnings")):
+    """
+    A sequence file compiled for execution.
+
+    valves are the valve objects of the sequence columns, in column order, and initial_state
+    their expected state before starting (None if the sequence opens with a CHECKPSI). Each
+    step already holds resolved device references, so firing one is a lookup of its changes
+    and one valve bank write. Everything is a tuple or a read-only mapping; a plan is never
+    modified after load_sequence builds it.
+    """
+    __slots__ = ()
+
+    @property
+    def offsets_ms(self):
+        return [step.offset_ms for step in self.steps]
+
+    @property
+    def duration_ms(self):
+        return self.steps[-1].offset_ms if self.steps else 0
+
+def _rows(reader):
+    """(line number, row) for each non-blank row"""
+    for row in reader:
+        if any(cell.strip() for cell in row):
+            yield reader.line_num, [cell.strip() for cell in row]
+
+def _next(rows, what):
+    try:
+        return next(rows)
+    except StopIteration:
+        raise SequenceError(f"File ends before the {what}")
+
+def _number(text, line, what, kind=float):
+    try:
+        return kind(text)
+    except ValueError:
+        raise SequenceError(f"Line {line}: invalid {what} {text!r}")
+
+def load_sequence(path, device_map):
+    """
+    Read and compile a sequence file. Raises SequenceError (or OSError) if it cannot be run.
+
+    The file has a Limits section (a row of device names and a row of redlines in psi, -1 for
+    none), an optional Windows row of rolling median lengths in samples (-1 for the default),
+    then a Sequence section: a header of "Timestamp (ms)" and valve names, and one row per
+    event with absolute timestamps in ms and a 0/1 state per valve. A row may instead be a
+    condition on a sensor, where <cmp> is one of > >= < <=:
+
+        <time>,CHECKPSI,<transducer>,<minimum psi>              single reading at <time>
+        <time>,WAIT,<sensor>,<cmp>,<value>,<hold ms>,<timeout ms>
+        <time>,WAITRATE,<sensor>,<cmp>,<per second>,<window ms>,<timeout ms>
+        <time>,ABORTIF,<sensor>,<cmp>,<value>,<hold ms>
+        <time>,ABORTIFRATE,<sensor>,<cmp>,<per second>,<window ms>
+
+    A WAIT holds the sequence until its sensor has compared true for <hold ms> (WAITRATE: until
+    its rate of change over <window ms> compares true), and aborts if that takes longer than
+    <timeout ms>. The rows after it keep their spacing from the moment the condition was met,
+    so the sequence moves on as soon as it can. ABORTIF rows abort the sequence if their
+    condition is met at any point after <time>.
+    """
+    with open(path, "r", newline="") as file:
+        rows = _rows(csv.reader(file))
+
+        line, header = _next(rows, "Limits section")
+        if header[0] != "Limits":
+            raise SequenceError(f"Line {line}: sequence file is missing Limits header (found {header[0]!r})")
+        line, limit_devices = _next(rows, "redline devices")
+        values_line, limit_values = _next(rows, "redline values")
+        if len(limit_values) != len(limit_devices):
+            raise SequenceError(f"Line {values_line}: mismatched redline header and value rows")
+        line, section = _next(rows, "Sequence section")
+        windows = None
+        if section[0] == "Windows":
+            windows_line, windows = _next(rows, "redline windows")
+            if len(windows) != len(limit_devices):
+                raise SequenceError(f"Line {windows_line}: mismatched redline header and window rows")
+            line, section = _next(rows, "Sequence section")
+        if section[0] != "Sequence":
+            raise SequenceError(f"Line {line}: Sequence header not found")
+
+        limits = []
+        warnings = []
+        for i, device_name in enumerate(limit_devices):
+            limit = _number(limit_values[i], values_line, f"redline for {device_name}")
+            if limit == -1:
+                continue
+            window = None
+            if windows is not None:
+                window = _number(windows[i], windows_line, f"window for {device_name}", int)
+                window = None if window == -1 else window
+            if device_name not in device_map:
+                warnings.append(f"No device named {device_name} - redline of {limit} psi ignored")
+                continue
+            limits.append(RedlineLimit(device_name, limit, window))
+
+        line, columns = _next(rows, "sequence header")
+        valves = []
+        for name in columns[1:]:
+            if name not in device_map:
+                raise SequenceError(f"Line {line}: no device named {name!r}")
+            if not hasattr(device_map[name], "valve_open"):
+                raise SequenceError(f"Line {line}: {name} is not a valve")
+            if device_map[name] in valves:
+                raise SequenceError(f"Line {line}: {name} appears twice")
+            valves.append(device_map[name])
+
+        steps = []
+        initial_state = None
+        state = None  # Valve states after the last valve row
+        previous_ms = None
+        for line, row in rows:
+            offset_ms = _number(row[0], line, "timestamp", int)
+            if previous_ms is None and offset_ms != 0:
+                raise SequenceError(f"Line {line}: the first event must be at timestamp 0")
+            if previous_ms is not None and offset_ms < previous_ms:
+                raise SequenceError(f"Line {line}: negative delay - timestamp {offset_ms} ms is before {previous_ms} ms")
+            previous_ms = offset_ms
+
+            if len(row) > 1 and row[1] == CHECKPSI:
+                if len(row) < 4:
+                    raise SequenceError(f"Line {line}: CHECKPSI needs a device and a minimum pressure")
+                device = device_map.get(row[2])
+                if device is None or not hasattr(device, "pressure"):
+                    raise SequenceError(f"Line {line}: no pressure transducer named {row[2]!r}")
+                gate = PressureGate(device, _number(row[3], line, "CHECKPSI pressure"))
+                steps.append(SequenceStep(offset_ms, MappingProxyType({}), gate, None, None, line))
+                continue
+            if len(row) > 1 and row[1] in CONDITION_ROWS:
+                steps.append(_condition_step(offset_ms, row, line, device_map))
+                continue
+
+            if len(row) != len(columns):
+                raise SequenceError(f"Line {line}: expected {len(columns)} columns, found {len(row)}")
+            row_state = []
+            for valve, cell in zip(valves, row[1:]):
+                if cell not in ("0", "1"):
+                    raise SequenceError(f"Line {line}: faulty input {cell!r} for {valve.name} (must be 0 or 1)")
+                row_state.append(cell == "1")
+
+            if state is None:
+                # First valve row sets every valve; later rows only what changed
+                changes = dict(zip(valves, row_state))
+                if not steps:
+                    initial_state = tuple(row_state)
+            else:
+                changes = {valve: valve_open for valve, valve_open, before in zip(valves, row_state, state)
+                           if valve_open != before}
+            state = row_state
+            steps.append(SequenceStep(offset_ms, MappingProxyType(changes), None, None, None, line))
+
+    if not steps:
+        raise SequenceError("No sequence data found")
+    return SequencePlan(path, tuple(valves), initial_state, tuple(steps), tuple(limits), tuple(warnings))
+
+def _condition_step(offset_ms, row, line, device_map):
+    """Step for a WAIT / WAITRATE / ABORTIF / ABORTIFRATE row"""
+    keyword = row[1]
+    quantity, is_wait = CONDITION_ROWS[keyword]
+    expected = 7 if is_wait else 6
+    if len(row) < expected:
+        fields = "<sensor>,<cmp>,<value>,<ms>" + (",<timeout ms>" if is_wait else "")
+        raise SequenceError(f"Line {line}: {keyword} needs {fields}")
+    device = device_map.get(row[2])
+    if device is None or not hasattr(device, "value"):
+        raise SequenceError(f"Line {line}: no sensor named {row[2]!r}")
+    if row[3] not in COMPARISONS:
+        raise SequenceError(f"Line {line}: invalid comparison {row[3]!r} (use one of {' '.join(COMPARISONS)})")
+    threshold = _number(row[4], line, f"{keyword} value")
+    span_ms = _number(row[5], line, f"{keyword} time")
+    if span_ms < 0 or (quantity == "rate" and span_ms <= 0):
+        raise SequenceError(f"Line {line}: invalid {keyword} time {row[5]!r}")
+    condition = Condition(row[2], quantity, row[3], threshold, span_ms)
+    if not is_wait:
+        return SequenceStep(offset_ms, MappingProxyType({}), None, None, condition, line)
+    timeout_ms = _number(row[6], line, f"{keyword} timeout")
+    if timeout_ms <= 0:
+        raise SequenceError(f"Line {line}: {keyword} timeout must be positive")
+    return SequenceStep(offset_ms, MappingProxyType({}), None, Wait(condition, timeout_ms), None, line)
@@ -0,0 +1,328 @@
+"""
+Offline sequence simulator and timing analyzer.
+
+Compiles sequence files with the same loader the GUI uses (sequence_plan.load_sequence), against
+the devices defined on the P&ID panel, without Qt or a LabJack. For each file it prints the valve
+state timeline, the total duration and the minimum spacing between events, and flags steps the
+running system cannot honor:
+
+    - events closer together than the measured event latency (scheduler lateness plus valve
+      write, p99) - the later one fires late and the two do not actuate in order
+    - CHECKPSI / WAIT / ABORTIF rows less than one sample after a valve change - the reading
+      they test may not reflect that change yet
+    - WAIT / ABORTIF hold times shorter than one sample, rate windows shorter than two
+    - devices that are not on the panel (checked with a stand-in); --any-device skips these
+
+Measured latency comes from a run's _telemetry.json (--latency), which holds hardware numbers, or
+from a benchmark report (run_benchmarks --output, or by default this machine's
+benchmarks/baseline.json if one was saved), which holds numbers from the simulated LabJack and is
+labelled as such in the output. Without either, event spacing is only checked for events that
+fire at the same time.
+
+    python -m Sequencer.sequence_sim Sequencer/Sequencer_Info/torch_sequence1.csv
+    python -m Sequencer.sequence_sim Sequencer/Sequencer_Info                     # every file, in parallel
+    python -m Sequencer.sequence_sim Sequencer/Sequencer_Info --latency GG_Test/data/run_telemetry.json
+"""
+import argparse
+import ast
+import glob
+import json
+import math
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from Sequencer.sequence_plan import SequenceError, load_sequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PANEL = os.path.join(ROOT, "Interface", "MainPanel.py")
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+SEQUENCES = os.path.join(ROOT, "Sequencer", "Sequencer_Info")
+
+# Device classes constructed on the panel -> kind
+DEVICE_KINDS = {"ValveControl": "valve", "PressureTransducer": "transducer",
+                "Thermocouple": "thermocouple", "LoadCell": "loadcell"}
+# Sample interval while a sequence runs (the sequencer switches to high-speed logging)
+SEQUENCE_SAMPLE_MS = 10
+
+class OfflineValve:
+    """Stand-in for ValveControl: a name and a state"""
+    def __init__(self, name, norm_open=False):
+        self.name = name
+        self.valve_open = norm_open
+
+class OfflineSensor:
+    """Stand-in for a thermocouple or load cell (no reading)"""
+    def __init__(self, name):
+        self.name = name
+        self.value = math.nan
+
+class OfflineTransducer(OfflineSensor):
+    """Stand-in for PressureTransducer (no reading)"""
+    pressure = math.nan
+
+def panel_devices(path=PANEL):
+    """
+    The devices MainWindow constructs, read from its source: {name: (kind, normally open)}.
+    Commented-out devices are not included, so a file that would fail to load in the GUI fails here.
+    """
+    with open(path) as file:
+        tree = ast.parse(file.read(), path)
+    devices = {}
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in DEVICE_KINDS):
+            continue
+        if not node.args or not isinstance(node.args[0], ast.Constant) or not isinstance(node.args[0].value, str):
+            continue
+        norm_open = any(keyword.arg == "norm_open" and isinstance(keyword.value, ast.Constant) and keyword.value.value
+                        for keyword in node.keywords)
+        devices[node.args[0].value] = (DEVICE_KINDS[node.func.id], norm_open)
+    return devices
+
+def guess_kind(name):
+    """Kind of a device that is not on the panel, from the P&ID naming convention"""
+    if name.startswith("PT-"):
+        return "transducer"
+    if name.startswith(("TC-", "LC-")):
+        return "thermocouple" if name.startswith("TC-") else "loadcell"
+    return "valve"
+
+class OfflineDeviceMap(dict):
+    """
+    Device map of stand-ins. Names not on the panel are created on lookup (kind from the name)
+    and recorded in `unknown`, so the rest of the file is still checked.
+    """
+    def __init__(self, devices):
+        super().__init__()
+        self.unknown = []
+        for name, (kind, norm_open) in devices.items():
+            self[name] = self._make(name, kind, norm_open)
+
+    @staticmethod
+    def _make(name, kind, norm_open=False):
+        if kind == "valve":
+            return OfflineValve(name, norm_open)
+        if kind == "transducer":
+            return OfflineTransducer(name)
+        return OfflineSensor(name)
+
+    def __contains__(self, name):
+        if not super().__contains__(name) and name not in self.unknown:
+            self.unknown.append(name)
+        return True
+
+    def __missing__(self, name):
+        if name not in self.unknown:
+            self.unknown.append(name)
+        self[name] = device = self._make(name, guess_kind(name))
+        return device
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+class TimingBudget(namedtuple("TimingBudget", "event_ms sample_ms source simulated")):
+    """
+    How closely events can follow each other (event_ms) and how often sensors are read (sample_ms).
+    simulated is True if event_ms was measured against the simulated LabJack, not the hardware.
+    """
+    __slots__ = ()
+
+def load_budget(path=BASELINE, channels=None, sample_ms=SEQUENCE_SAMPLE_MS):
+    """
+    Event latency from a benchmark report or a run's telemetry dump.
+
+    Benchmark reports give the scheduler's firing error p99 for each channel count (the one
+    closest to `channels` is used), measured against the simulated LabJack on the machine that
+    ran them; telemetry dumps give sequencer.lateness plus valves.write p99 measured on the hardware.
+    """
+    with open(path) as file:
+        report = json.load(file)
+    if "stages" in report:
+        stages = report["stages"]
+        event_ms = sum(stages.get(name, {}).get("p99_ms") or 0.0 for name in ("sequencer.lateness", "valves.write"))
+        return TimingBudget(event_ms, sample_ms, f"{os.path.basename(path)} (lateness + valve write p99)", False)
+    counts = sorted(report["channels"], key=int)
+    key = counts[0] if channels is None else min(counts, key=lambda count: abs(int(count) - channels))
+    event_ms = report["channels"][key]["sequencer_error_ms"]["p99"]
+    source = f"{os.path.basename(path)} ({key} channels, scheduler error p99, simulated LabJack on {report.get('machine', 'an unknown machine')})"
+    return TimingBudget(event_ms, sample_ms, source, True)
+
+class TimelineEntry(namedtuple("TimelineEntry", "offset_ms earliest_ms latest_ms line action state")):
+    """
+    One step of a simulated run. earliest_ms / latest_ms are when it fires if every WAIT before it
+    is met as soon as possible / only at its timeout; state is the valve states after the step.
+    """
+    __slots__ = ()
+
+class Finding(namedtuple("Finding", "line message")):
+    __slots__ = ()
+
+class SequenceReport(namedtuple("SequenceReport", "path error valves timeline duration_ms max_duration_ms min_spacing findings")):
+    """
+    Result of analyzing one file. error is the load error (and everything else empty) if it does
+    not compile; valves are the sequence's valve names, in timeline state order; min_spacing is
+    (ms, line) of the closest pair of valve events, or None.
+    """
+    __slots__ = ()
+
+def _describe(step):
+    if step.gate is not None:
+        return f"CHECKPSI {step.gate.device.name} >= {step.gate.minimum_psi:g} psi"
+    if step.wait is not None:
+        return f"WAIT {step.wait.condition.describe()} (timeout {step.wait.timeout_ms:g} ms)"
+    if step.guard is not None:
+        return f"ABORTIF {step.guard.describe()}"
+    if not step.changes:
+        return "no change"
+    return ", ".join(f"{'open' if valve_open else 'close'} {valve.name}" for valve, valve_open in step.changes.items())
+
+def simulate(plan):
+    """Valve state timeline of a plan, starting from its initial state (closed if it has none)"""
+    state = dict.fromkeys(plan.valves, False)
+    if plan.initial_state is not None:
+        state.update(zip(plan.valves, plan.initial_state))
+    timeline = []
+    min_shift = max_shift = 0.0  # How far WAITs before this step can push it back
+    for step in plan.steps:
+        state.update(step.changes)
+        timeline.append(TimelineEntry(step.offset_ms, step.offset_ms + min_shift, step.offset_ms + max_shift,
+                                      step.line, _describe(step), tuple(state[valve] for valve in plan.valves)))
+        if step.wait is not None:
+            # Met no sooner than its hold time / rate window, at the latest at its timeout
+            min_shift += min(step.wait.condition.span_ms, step.wait.timeout_ms)
+            max_shift += step.wait.timeout_ms
+    return timeline
+
+def check_timing(plan, budget):
+    """Findings for steps the running system cannot honor, and the minimum valve event spacing"""
+    findings = []
+    min_spacing = None
+    last_change = None  # Last step that actuated valves
+    for step in plan.steps:
+        if step.changes:
+            if last_change is not None:
+                spacing = step.offset_ms - last_change.offset_ms
+                if min_spacing is None or spacing < min_spacing[0]:
+                    min_spacing = (spacing, step.line)
+                if spacing == 0:
+                    findings.append(Finding(step.line, f"fires at the same time as line {last_change.line} - "
+                                                       "put both in one row so they go out in one command"))
+                elif spacing < budget.event_ms:
+                    findings.append(Finding(step.line, f"{spacing} ms after line {last_change.line}, less than the "
+                                                       f"measured event latency of {budget.event_ms:.1f} ms"))
+            last_change = step
+            continue
+
+        condition = step.wait.condition if step.wait is not None else step.guard
+        if last_change is not None and step.offset_ms - last_change.offset_ms < budget.sample_ms:
+            findings.append(Finding(step.line, f"checked {step.offset_ms - last_change.offset_ms} ms after the valve change "
+                                               f"at line {last_change.line}, before the next sample ({budget.sample_ms:g} ms)"))
+        if condition is not None:
+            if condition.quantity == "level" and 0 < condition.span_ms < budget.sample_ms:
+                findings.append(Finding(step.line, f"hold of {condition.span_ms:g} ms is shorter than one sample "
+                                                   f"({budget.sample_ms:g} ms) - it acts as a single reading"))
+            if condition.quantity == "rate" and condition.span_ms < 2 * budget.sample_ms:
+                findings.append(Finding(step.line, f"rate window of {condition.span_ms:g} ms covers fewer than two "
+                                                   f"samples ({budget.sample_ms:g} ms apart)"))
+    return findings, min_spacing
+
+def analyze(path, devices, budget, any_device=False):
+    """Load, simulate and check one sequence file. Never raises for a bad file; see SequenceReport.error."""
+    device_map = OfflineDeviceMap(devices)
+    try:
+        plan = load_sequence(path, device_map)
+    except (SequenceError, OSError, UnicodeDecodeError) as e:
+        return SequenceReport(path, str(e), (), (), None, None, None, ())
+    timeline = simulate(plan)
+    findings, min_spacing = check_timing(plan, budget)
+    findings = [Finding(None, warning) for warning in plan.warnings] + findings
+    if not any_device:
+        findings = [Finding(None, f"{name} is not on the panel (checked as a {guess_kind(name)}) - "
+                                              "the GUI rejects it in the sequence and ignores its redline")
+                    for name in device_map.unknown] + findings
+    return SequenceReport(path, None, tuple(valve.name for valve in plan.valves), tuple(timeline), timeline[-1].earliest_ms, timeline[-1].latest_ms,
+                          min_spacing, tuple(findings))
+
+def analyze_all(paths, devices, budget, any_device=False, workers=None):
+    """analyze() every file, in parallel processes; reports come back in the order of `paths`"""
+    if len(paths) == 1:
+        return [analyze(paths[0], devices, budget, any_device)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(analyze, paths, [devices] * len(paths), [budget] * len(paths), [any_device] * len(paths)))
+
+def print_timeline(report):
+    print(report.path)
+    names = " ".join(f"{name[:10]:>10}" for name in report.valves)
+    print(f"{'line':>5} {'t (ms)':>8} {'latest':>8}  {names}  action")
+    for entry in report.timeline:
+        states = " ".join(f"{'OPEN' if valve_open else '-':>10}" for valve_open in entry.state)
+        latest = f"{entry.latest_ms:8g}" if entry.latest_ms != entry.earliest_ms else " " * 8
+        print(f"{entry.line:>5} {entry.earliest_ms:8g} {latest}  {states}  {entry.action}")
+    print()
+
+def print_summary(reports):
+    print(f"{'file':<42} {'status':<8} {'events':>6} {'duration':>10} {'min gap':>8} {'flags':>5}")
+    for report in reports:
+        name = os.path.basename(report.path)
+        if report.error is not None:
+            print(f"{name:<42} {'ERROR':<8} {report.error}")
+            continue
+        duration = f"{report.duration_ms:g}" if report.max_duration_ms == report.duration_ms else \
+            f"{report.duration_ms:g}-{report.max_duration_ms:g}"
+        gap = f"{report.min_spacing[0]:g}" if report.min_spacing else "-"
+        status = "FLAGGED" if report.findings else "OK"
+        print(f"{name:<42} {status:<8} {len(report.timeline):>6} {duration:>10} {gap:>8} {len(report.findings):>5}")
+    for report in reports:
+        for finding in report.findings:
+            where = f":{finding.line}" if finding.line is not None else ""
+            print(f"{os.path.basename(report.path)}{where}: {finding.message}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate and time sequence files without the GUI")
+    parser.add_argument("paths", nargs="*", default=[SEQUENCES], help="sequence files or directories of them")
+    parser.add_argument("--latency", help="run _telemetry.json or benchmark report with the measured latencies "
+                                          "(default: benchmarks/baseline.json if it exists)")
+    parser.add_argument("--sample-ms", type=float, default=SEQUENCE_SAMPLE_MS,
+                        help="sample interval while the sequence runs (default 10, high-speed logging)")
+    parser.add_argument("--any-device", action="store_true",
+                        help="do not flag devices that are not on the panel (kind from the name prefix)")
+    parser.add_argument("--workers", type=int, help="processes for batch validation (default: one per CPU)")
+    parser.add_argument("--output", help="also write the reports as JSON here")
+    parser.add_argument("--strict", action="store_true", help="exit with status 1 on flagged steps, not only load errors")
+    args = parser.parse_args(argv)
+
+    paths = []
+    for path in args.paths:
+        paths.extend(sorted(glob.glob(os.path.join(path, "*.csv"))) if os.path.isdir(path) else [path])
+    if not paths:
+        parser.error("no sequence files found")
+    devices = panel_devices()
+    sensors = sum(kind != "valve" for kind, _ in devices.values())
+    latency = args.latency or (BASELINE if os.path.exists(BASELINE) else None)
+    if latency is not None:
+        budget = load_budget(latency, sensors, args.sample_ms)
+        print(f"Event latency {budget.event_ms:.2f} ms from {budget.source}, samples every {budget.sample_ms:g} ms")
+    else:
+        budget = TimingBudget(0.0, args.sample_ms, None, False)
+        print(f"No measured event latency - pass a run's _telemetry.json with --latency; samples every {budget.sample_ms:g} ms")
+    if budget.simulated:
+        print("Simulated numbers, not hardware - pass a run's _telemetry.json with --latency for measured event latency")
+    print()
+
+    reports = analyze_all(paths, devices, budget, args.any_device, args.workers)
+    if len(reports) == 1 and reports[0].error is None:
+        print_timeline(reports[0])
+    print_summary(reports)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump([report._asdict() for report in reports], file, indent=2)
+    failed = sum(report.error is not None for report in reports)
+    flagged = sum(bool(report.findings) for report in reports if report.error is None)
+    print(f"\n{len(reports)} files: {len(reports) - failed} load, {failed} fail, {flagged} flagged")
+    if failed or (args.strict and flagged):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
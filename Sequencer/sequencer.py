@@ -1,18 +1,29 @@
 # from Sequencer.sequence_reader import load_data_from_csv
 from PyQt5.QtWidgets import QPushButton, QMessageBox, QFileDialog, QWidget, QVBoxLayout
-from PyQt5.QtCore import QTimer, Qt
-import csv
+from PyQt5.QtCore import QTimer, Qt, pyqtSignal
+from Sequencer.scheduler import DeadlineScheduler
+from Sequencer.sequence_plan import SequenceError, load_sequence
+from backend.telemetry import telemetry
+from backend.event_log import get_logger
+import time
+
+log = get_logger("sequencer")
 
 class Sequencer(QWidget):
-    def __init__(self, device_map, data_logger, width = 194, height = 100, x=0, y=0, parent=None):
+    # Emitted from the scheduler thread, handled on the GUI thread
+    sequence_aborted = pyqtSignal(str, str)   # (title, message) for the warning dialog
+    sequence_finished = pyqtSignal(bool)      # True if every event fired
+
+    def __init__(self, device_map, data_logger, width = 194, height = 100, x=0, y=0, parent=None, redline_engine=None, valve_bank=None, condition_engine=None):
         super(Sequencer, self).__init__(parent)
         self.current_event_index = 0
         self.running = False
-        self.timer = None  # Store the timer reference so it can be stopped
+        self.scheduler = DeadlineScheduler()  # Fires events on absolute deadlines off the GUI thread
         self.data_logger = data_logger
-        self.PT_N2_07_data = []
-        self.PT_OX_01_data = []
-        self.PT_FU_01_data = []
+        self.redline_engine = redline_engine  # Receives the limits from the sequence file
+        self.valve_bank = valve_bank  # Writes each event's valve states in one command
+        self.condition_engine = condition_engine  # Evaluates WAIT / ABORTIF rows and redline aborts on the live samples
+        self._aborted = False
         self.current_event_index = 0
         self.input_file = None
         
@@ -29,8 +40,6 @@ class Sequencer(QWidget):
         self.upload_button.setFixedHeight(height // 2)
         self.upload_button.move(0, height // 2)
 
-        self.faulty_sequencer = True
-
         # configure layout
         self.layout = QVBoxLayout()
         self.layout.addWidget(self.start_button)
@@ -49,15 +58,17 @@ class Sequencer(QWidget):
         # Store device map reference
         self.device_map = device_map
         
-        # Initialize sequence data structures
-        self.devices = []
-        self.events = []
+        # Compiled sequence (see sequence_plan.py) - None until a valid file is loaded
+        self.plan = None
 
         # Connect the upload button to open CSV function
         self.upload_button.clicked.connect(self.open_csv)
 
         # Connect the button click to toggle sequencer state
         self.start_button.clicked.connect(self.toggle_sequencer)
+
+        self.sequence_aborted.connect(self._on_sequence_aborted)
+        self.sequence_finished.connect(self._on_sequence_finished)
     
     def toggle_sequencer(self):
         """Toggle between starting and stopping the sequencer."""
@@ -85,24 +96,48 @@ class Sequencer(QWidget):
     def start_sequencer(self):
         """Start the sequencing process."""
         if not self.input_file:
-            print("Error: No sequence file loaded")
+            log.error("No sequence file loaded")
             QMessageBox.warning(self, "Sequencer Error", 
                                "NO SEQUENCE FILE LOADED. Please upload a sequence file.")
             return
 
-        if not self.devices or not self.events or self.faulty_sequencer:
-            print("Error: SEQUENCER ERROR")
+        if self.plan is None:
+            log.error("SEQUENCER ERROR")
             QMessageBox.warning(self, "Sequencer Error", 
                                "INVALID SEQUENCE. Please check the sequence file.")
             return
+
+        # Verify intial state matches expected - extra layer of safety between Software Handler and Sequencer
+        if self.plan.initial_state is not None:
+            for valve, valve_open in zip(self.plan.valves, self.plan.initial_state):
+                if valve.valve_open != valve_open:
+                    log.error("Initial State Error - Sequencer is not prepared to start: Mismatch for %s", valve.name)
+                    QMessageBox.warning(self, "Initial State Error", 
+                           "INVALID STARTING STATE. Please check the sequence file.")
+                    return
+        # Initial state approved, continue
+
+        if self.condition_engine is None and any(step.wait or step.guard for step in self.plan.steps):
+            log.error("Sequence has WAIT/ABORTIF rows but no condition engine")
+            QMessageBox.warning(self, "Sequencer Error",
+                               "INVALID SEQUENCE. Condition rows need the live condition engine.")
+            return
+
         self.running = True
-        print(f"Starting sequencer - setting running=True")
+        self._aborted = False
+        if self.condition_engine is not None:
+            self.condition_engine.start()
+            # Any redline trip aborts the sequence straight from the sampler thread
+            self.condition_engine.watch_redlines(self._redline_tripped)
+        log.info("Starting sequencer - setting running=True")
         if not self.data_logger.high_speed_mode:
             self.data_logger.toggle_sample_rate()
         self.current_event_index = 0
-        self.setText("Stop Sequencer")
+        self.start_button.setText("Stop Sequencer")
         self.update_button_style()
-        self._trigger_event()
+
+        # Steps fire at absolute offsets from T0
+        self.scheduler.start(self.plan.offsets_ms, self._trigger_event, self._scheduler_finished)
     
     def confirm_stop_sequencer(self):
         """Stop the sequencing process."""
@@ -123,103 +158,120 @@ class Sequencer(QWidget):
     
     def stop_sequencer(self):
         """Stop the sequencing process."""
-        print(f"Stopping sequencer - setting running=False")
-        self.PT_TI_01_data = []
-        self.PT_GG_01_data = []
+        log.info("Stopping sequencer - setting running=False")
         self.running = False
-        self.setText("Start Sequencer")
+        self.scheduler.stop(wait=False)
+        if self.condition_engine is not None:
+            self.condition_engine.watch_redlines(None)
+            self.condition_engine.clear_guards()
+            self.condition_engine.abort("sequencer stopped")
+        self.scheduler.stop()
+        self.start_button.setText("Start Sequencer")
         self.update_button_style()
         
         # Check all valves
-        print("Checking valve states:")
-        valves_closed = 0
-        for device in self.devices:
-            if device == "Timestamp (ms)":
-                continue
-            if self.device_map[device].valve_open:
-                print(f"Closing valve: {device}")
-                self.device_map[device].toggle_valve()
-                valves_closed += 1
+        log.debug("Checking valve states")
+        to_close = {}
+        for valve in self.plan.valves if self.plan is not None else ():
+            if valve.valve_open:
+                log.info("Closing valve: %s", valve.name)
+                to_close[valve] = False
             else:
-                print(f"Valve already closed: {device}")
-        print(f"Closed {valves_closed} open valves")
+                log.debug("Valve already closed: %s", valve.name)
+        if to_close and self.valve_bank is not None:
+            self.valve_bank.apply(to_close)
+        else:
+            for valve in to_close:
+                valve.toggle_valve()
+        log.info("Closed %d open valves", len(to_close))
         
 
-    def _trigger_event(self):
-        """Recursive function to trigger events at the specified intervals."""
+    def _trigger_event(self, index):
+        """Fire one event. Runs on the scheduler thread at the event's deadline; returns False to end the sequence."""
         # Check if we should still be running
         if not self.running:
-            print("Trigger cancelled: sequencer not running")
-            return
-        
-        if self.current_event_index >= len(self.events):
-            if self.running:  # We've finished all events
-                print(f"Completed all {len(self.events)} events")
-                self.running = False
-                self.setText("Start Sequencer")
-                self.update_button_style()
+            log.info("Trigger cancelled: sequencer not running")
+            return False
+
+        start_ns = time.perf_counter_ns()
+        # Current step - devices were resolved and validated when the file was loaded
+        step = self.plan.steps[index]
+        self.current_event_index = index + 1
+
+        log.debug("Triggering event %d", index)
+        if step.gate is not None:
+            # Pressure check event
+            log.info("Checking pressure of %s", step.gate.device.name)
+            if not step.gate.passes():
+                self._abort("PRESSURE CHECK FAILED", "PRESSURE CHECK FAILED. TERMINATING AUTO SEQUENCE")
+                return False
+        elif step.wait is not None:
+            # Hold here until the condition is met on the live samples, then move the rest of the
+            # sequence so it keeps its spacing from that moment
+            description = step.wait.condition.describe()
+            log.info("Waiting up to %g ms for %s", step.wait.timeout_ms, description)
+            result, _ = self.condition_engine.wait_for(step.wait.condition, step.wait.timeout_ms / 1000)
+            if result == "timeout":
+                self._abort("CONDITION TIMEOUT", f"{description} NOT MET WITHIN {step.wait.timeout_ms:g} MS. TERMINATING AUTO SEQUENCE")
+                return False
+            if result == "aborted":
+                return False
+            waited_ns = time.perf_counter_ns() - self.scheduler.deadline_ns
+            self.scheduler.delay(waited_ns)
+            log.info("%s met after %.1f ms", description, waited_ns / 1e6)
+        elif step.guard is not None:
+            log.info("Abort condition armed: %s", step.guard.describe())
+            self.condition_engine.add_guard(step.guard, self._guard_tripped)
+        elif step.changes:
+            if self.valve_bank is not None:
+                # Only the valves that change, in one LabJack command so they actuate together
+                self.valve_bank.apply(step.changes)
+            else:
+                for valve, valve_open in step.changes.items():
+                    valve.set_valve(valve_open)
+        telemetry.record("sequencer.event", time.perf_counter_ns() - start_ns)
+        return True
+
+    def _abort(self, title, message):
+        """End the run early from any thread: cancel the remaining events and tell the GUI (once)"""
+        if not self.running or self._aborted:
             return
-        
-        if self.current_event_index == 0:
-            # Verify intial state matches expected - extra layer of safety between Software Handler and Sequencer
-            initial_state = self.events[0]
-            if initial_state[0] != 0:
-                raise ValueError(f"Incorrect initial timestamp in CSV")
-            for i in range(1, len(initial_state)):
-                if initial_state[i] == 0:
-                    if self.device_map[self.devices[i]].valve_open:
-                        self.stop_sequencer()
-                        print("Error: Initial State Error")
-                        QMessageBox.warning(self, "Initial State Error", 
-                               "INVALID STARTING STATE. Please check the sequence file.")
-                        raise ValueError(f"Sequencer is not prepared to start: Mismatch for {self.devices[i]}")
-                if initial_state[i] == 1:
-                    if not self.device_map[self.devices[i]].valve_open:
-                        self.stop_sequencer()
-                        print("Error: Initial State Error")
-                        QMessageBox.warning(self, "Initial State Error", 
-                               "INVALID STARTING STATE. Please check the sequence file.")
-                        
-                        raise ValueError(f"Sequencer is not prepared to start: Mismatch for {self.devices[i]}")
-        # Initial state approved, continue
+        self._aborted = True
+        telemetry.count("sequencer.aborts")
+        self.scheduler.stop(wait=False)
+        if self.condition_engine is not None:
+            self.condition_engine.abort(message)
+        self.sequence_aborted.emit(title, message)
 
-        # # Get the current time delay
-        # current_delay = self.events[self.current_event_index]
+    def _guard_tripped(self, description):
+        """ABORTIF condition met (sampler thread)"""
+        self._abort("ABORT CONDITION MET", f"{description}. TERMINATING AUTO SEQUENCE")
 
-        # Current event
-        event = self.events[self.current_event_index]
-        self.current_event_index += 1
+    def _redline_tripped(self, name):
+        """Redline trip during the run (sampler thread)"""
+        self._abort("REDLINE EXCEEDED", f"{name} EXCEEDED ITS REDLINE. TERMINATING AUTO SEQUENCE")
 
-        print("TRIGGERING EVENT")
-        if (event[1] == "CHECKPSI"):
-            # Pressure check event
-            print(f"Checking pressure of {event[2]}")
-            if self.device_map[event[2]].pressure < event[3]:
-                self.stop_sequencer()
-                QMessageBox.warning(self, "PRESSURE CHECK FAILED", 
-                               "PRESSURE CHECK FAILED. TERMINATING AUTO SEQUENCE")
-        else:
-            for i in range(1, len(event)):
-                if (event[i] == 0): 
-                    self.device_map[self.devices[i]].toggle_valve_off()
-                elif (event[i] == 1):
-                    self.device_map[self.devices[i]].toggle_valve_on()
-                else:
-                    raise ValueError(f"Faulty input for {self.devices[i]} state for event: {event}")
-
-        # Schedule the next event if there are more events remaining
-        if self.current_event_index < len(self.events) and self.running:
-            delay_time = self.events[self.current_event_index][0]
-            print(f"Next event scheduled in {delay_time}ms")
-            QTimer.singleShot(delay_time, self._trigger_event)
+    def _scheduler_finished(self, completed):
+        """Scheduler thread callback once the last event has fired or the sequence was cut short"""
+        if self.condition_engine is not None:
+            self.condition_engine.clear_guards()
+        if self.running:
+            self.sequence_finished.emit(completed)
         else:
-            # Cooldown timer
-            QTimer.singleShot(2000, lambda: (
-                self.data_logger.toggle_sample_rate(),
-                self.stop_sequencer()
-            ))
-            if not self.running:
-                print("Not scheduling next event - sequencer stopped")
+            log.info("Not scheduling cooldown - sequencer stopped")
+
+    def _on_sequence_aborted(self, title, message):
+        self.stop_sequencer()
+        QMessageBox.warning(self, title, message)
+
+    def _on_sequence_finished(self, completed):
+        if completed:
+            log.info("Completed all %d events", len(self.plan.steps))
+        # Cooldown timer
+        QTimer.singleShot(2000, lambda: (
+            self.data_logger.toggle_sample_rate(),
+            self.stop_sequencer()
+        ))
 
     def update_button_style(self):
         """Update button color based on current mode"""
@@ -256,88 +308,41 @@ class Sequencer(QWidget):
 
     def load_data_from_csv(self, device_map, input_file):
         """
-        Load both limits and sequence data from a CSV file.
-        Processes limits section before "Sequence" line and device timing after.
+        Load and compile a sequence file (see sequence_plan.load_sequence for the format).
+
+        On success the plan replaces the current one and its redlines replace the current limits.
+        A file that fails validation leaves the sequencer without a plan, so it cannot be started.
 
         Args:
             device_map (dict): Dictionary mapping device names to device objects.
 
         Returns:
-            tuple: A tuple containing (limits_dict, devices, events)
-            - limits_dict: Dictionary mapping device names to pressure limits
-            - devices: List of device objects in sequence
-            - events: List of timing events in milliseconds
+            SequencePlan, or None if the file could not be loaded
         """
-        eventDevices = []
-        events = []
-        
-        filename = input_file
-        
         try:
-            with open(filename, "r") as file:
-                reader = csv.reader(file)
-                
-                # First section should be limits
-                header = next(reader)
-                if header[0] != "Limits":
-                    print(header)
-                    raise ValueError("Sequencer file is missing Limits header")
-                # read in the redline devices
-                redlineDevices = next(reader)
-                redlines = next(reader)
-                if len(redlines) != len(redlineDevices):
-                    raise ValueError("Mismatched redline header and value rows")
-                for i in range (0, len(redlines)):
-                    device_name = redlineDevices[i]
-                    limit = redlines[i]
-                    if int(limit) == -1:
-                        print(f"No redline added for {device_name}")
-                        continue
-                    try:
-                        device_map[device_name].redline = float(limit)
-                        print(f"Redline of {limit} psi added for {device_name}")
-                    except ValueError:
-                        print(f"Warning: Invalid inputs for {device_name}: {limit}")
-                    except Exception as e:
-                        print(f"Random Error for device: {device_name}, limit: {limit}, error: {e}")
-                
-                # Read in events header
-                if next(reader)[0] != "Sequence":
-                    raise ValueError("Sequence header not found")
-                eventDevices = next(reader)
-                prev_time = 0                    
-                for event in reader:
-                    # Check event format
-                    if len(event) != len(eventDevices):
-                        # If not matching length, check if it's a CHECKPSI event
-                        if event[1] != "CHECKPSI":
-                            raise ValueError(f"Incorrect event row format: {event}")
-                    # Not nested in case there only is one column
-                    if event[1] == "CHECKPSI":
-                        print(f"Adding {event[3]} psi lower bound for {event[2]} at timestamp {event[0]}")
-                    # Get the interval between events
-                    delay = int(event[0]) - prev_time  # Convert timing to integer
-                    if delay < 0:
-                        raise ValueError(f"Negative delay detected - faulty timestamp for: {event}")
-                    prev_time = int(event[0])
-                    event[0] = delay
-                    if event[1] != "CHECKPSI":
-                        for i in range(1, len(event)):
-                            event[i] = int(event[i])
-                    else:
-                        event[3] = int(event[3])
-                    events.append(event)
-            if not eventDevices:
-                print("Warning: No sequence data found.")
-            
-            # for i in range(1, len(events[-1])):
-            #     if events[-1][i] != 0:
-            #         raise(ValueError("Turn everything off in your sequencer shithead"))
-            self.faulty_sequencer = False
-        except Exception as e:
-            print(f"Error loading data from {filename}: {e}")
-
-        return eventDevices, events
+            plan = load_sequence(input_file, device_map)
+        except (SequenceError, OSError) as e:
+            log.error("Error loading data from %s: %s", input_file, e)
+            return None
+
+        for warning in plan.warnings:
+            log.warning("%s", warning)
+        # Limits from a previously loaded file no longer apply
+        if self.redline_engine is not None:
+            self.redline_engine.clear_limits()
+        for limit in plan.limits:
+            device_map[limit.device_name].redline = limit.limit_psi
+            if self.redline_engine is not None:
+                try:
+                    self.redline_engine.set_limit(limit.device_name, limit.limit_psi, limit.window)
+                except KeyError:
+                    log.warning("%s is not a sensor - redline of %s psi ignored", limit.device_name, limit.limit_psi)
+                    continue
+            log.info("Redline of %s psi added for %s", limit.limit_psi, limit.device_name)
+        for step in plan.steps:
+            if step.gate is not None:
+                log.info("Adding %s psi lower bound for %s at timestamp %s", step.gate.minimum_psi, step.gate.device.name, step.offset_ms)
+        return plan
     
     def open_csv(self):
         # Let user select file
@@ -345,12 +350,13 @@ class Sequencer(QWidget):
             
             # If no file selected, don't start sequencer
             if not self.input_file:
-                print("No file selected")
+                log.info("No file selected")
                 return
             else:
-                print(f"Selected sequencer file: {self.input_file}")
+                log.info("Selected sequencer file: %s", self.input_file)
                 
                 #reload sequence data from selected file
-                self.devices, self.events = self.load_data_from_csv(self.device_map, self.input_file)
-                print(f"Loaded sequence with {len(self.devices) - 1} devices and {len(self.events)} events from {self.input_file}")
+                self.plan = self.load_data_from_csv(self.device_map, self.input_file)
+                if self.plan is not None:
+                    log.info("Loaded sequence with %d devices and %d events from %s", len(self.plan.valves), len(self.plan.steps), self.input_file)
             
\ No newline at end of file
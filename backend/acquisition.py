@@ -0,0 +1,117 @@
+import time
+import numpy as np
+from backend.telemetry import telemetry
+from backend.event_log import get_logger
+
+log = get_logger("acquisition")
+
+def channel_name(channel):
+    """Normalize a device channel to a LabJack register name (bare integers are AIN numbers)"""
+    if isinstance(channel, int):
+        return f"AIN{channel}"
+    return channel
+
+class BatchedAcquisition:
+    """
+    Reads every registered sensor with a single LabJack transaction per tick.
+
+    The channels of all transducers, thermocouples and load cells are collected into one
+    de-duplicated name list which is read with one eReadNames call. The raw voltages are
+    then handed to each device's update_from_voltages, so tick latency no longer grows with
+    the number of sensors.
+    """
+    def __init__(self, transducers_list, thermocouples_list, loadcells_list):
+        self._transducers = transducers_list
+        self._thermocouples = thermocouples_list
+        self._loadcells = loadcells_list
+        self.names = []
+        self._plan = []  # (device, [index into names for each device channel])
+        self._sensor_count = 0
+        self.build_channel_list()
+
+    def sensors(self):
+        """All sensors in logging order (transducers, thermocouples, load cells)"""
+        return self._transducers + self._thermocouples + self._loadcells
+
+    def build_channel_list(self):
+        """Rebuild the shared channel list from the registered devices"""
+        names = []
+        index = {}
+        plan = []
+        for device in self.sensors():
+            indices = []
+            for channel in device.channels():
+                name = channel_name(channel)
+                if name not in index:
+                    index[name] = len(names)
+                    names.append(name)
+                indices.append(index[name])
+            plan.append((device, indices))
+        self.names = names
+        self._plan = plan
+        self._sensor_count = len(plan)
+
+    def read(self, labjack):
+        """Read all sensors in one transaction on the shared connection. Falls back to per-device reads if the batch fails."""
+        # Pick up sensors added since the last tick
+        if self._sensor_count != len(self._transducers) + len(self._thermocouples) + len(self._loadcells):
+            self.build_channel_list()
+        if not self.names:
+            return []
+
+        try:
+            voltages = labjack.read_names(self.names)
+        except Exception as e:
+            log.error("Batched read of %d channels failed (%s) - falling back to per-device reads", len(self.names), e)
+            telemetry.count("acquisition.fallbacks")
+            self.read_individually(labjack)
+            return None
+
+        self.distribute(voltages)
+        return voltages
+
+    def distribute(self, voltages):
+        """Hand a row of voltages (ordered like self.names) to each device's conversion"""
+        start_ns = time.perf_counter_ns()
+        for device, indices in self._plan:
+            try:
+                device.update_from_voltages([voltages[i] for i in indices])
+            except Exception as e:
+                log.error("Failed converting reading from %s (%s): %s", device.name, device.input_channel_1, e)
+        telemetry.record("acquisition.convert", time.perf_counter_ns() - start_ns)
+
+    def convert_block(self, block):
+        """
+        Convert a 2D block of voltages (rows = scans, columns ordered like self.names) to engineering
+        units in one vectorized pass. Returns a (scans x sensors) array in sensors() order.
+        """
+        start_ns = time.perf_counter_ns()
+        block = np.asarray(block, dtype=np.float64)
+        values = np.empty((len(block), len(self._plan)))
+        for column, (device, indices) in enumerate(self._plan):
+            # Differential devices are always first channel minus second channel
+            if len(indices) > 1:
+                voltage = block[:, indices[0]] - block[:, indices[1]]
+            else:
+                voltage = block[:, indices[0]]
+            values[:, column] = device.convert(voltage)
+        telemetry.record("acquisition.convert_block", time.perf_counter_ns() - start_ns)
+        return values
+
+    def read_individually(self, labjack):
+        """Read each device on its own (one round trip per device) so a bad channel only affects its device"""
+        for transducer in self._transducers:
+            try:
+                transducer.update_pressure(labjack)
+            except Exception as e:
+                log.error("Failed reading pressure from %s (%s): %s", transducer.name, transducer.input_channel_1, e)
+        for thermocouple in self._thermocouples:
+            try:
+                thermocouple.update_temperature(labjack)
+            except Exception as e:
+                log.error("Failed reading temperature from %s (%s): %s", thermocouple.name, thermocouple.input_channel_1, e)
+        for loadcell in self._loadcells:
+            try:
+                loadcell.update_load(labjack)
+            except Exception as e:
+                log.error("Failed reading load from %s (%s): %s", loadcell.name, loadcell.input_channel_1, e)
@@ -0,0 +1,192 @@
+import operator
+import threading
+from collections import namedtuple
+import numpy as np
+from backend.event_log import get_logger
+
+log = get_logger("conditions")
+
+COMPARISONS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+class Condition(namedtuple("Condition", "device_name quantity comparison threshold span_ms")):
+    """
+    A test on one sensor's live samples.
+
+    quantity "level": the reading compares true against threshold continuously for span_ms
+    (0 = a single sample). quantity "rate": the change per second, measured across span_ms,
+    compares true against threshold. comparison is one of >, >=, <, <=.
+    """
+    __slots__ = ()
+
+    def describe(self):
+        if self.quantity == "rate":
+            return f"{self.device_name} rate {self.comparison} {self.threshold:g}/s over {self.span_ms:g} ms"
+        held = f" for {self.span_ms:g} ms" if self.span_ms else ""
+        return f"{self.device_name} {self.comparison} {self.threshold:g}{held}"
+
+class _Tracker:
+    """Running evaluation of one Condition over successive blocks of samples"""
+    def __init__(self, condition, column):
+        self.condition = condition
+        self.column = column
+        self.compare = COMPARISONS[condition.comparison]
+        self.span_s = condition.span_ms / 1000
+        self._since = None  # Level: time of the first sample of the current true run
+        self._times = np.empty(0)  # Rate: recent samples covering the span
+        self._values = np.empty(0)
+
+    def update(self, times, values):
+        """Feed a block of samples; returns the sample time at which the condition became met, or None"""
+        column = values[:, self.column]
+        if self.condition.quantity == "rate":
+            return self._update_rate(times, column)
+        return self._update_level(times, column)
+
+    def _update_level(self, times, column):
+        with np.errstate(invalid="ignore"):
+            true = self.compare(column, self.condition.threshold)  # NaN compares false
+        start = 0
+        for end in list(np.flatnonzero(~true)) + [len(true)]:
+            if end > start:
+                if self._since is None:
+                    self._since = times[start]
+                held = np.flatnonzero(times[start:end] - self._since >= self.span_s)
+                if len(held):
+                    return times[start + held[0]]
+            if end < len(true):
+                self._since = None
+            start = end + 1
+        return None
+
+    def _update_rate(self, times, column):
+        all_times = np.concatenate((self._times, times))
+        all_values = np.concatenate((self._values, column))
+        new = np.arange(len(self._times), len(all_times))
+        # For each new sample, the newest sample at least span_s older
+        earlier = np.searchsorted(all_times, all_times[new] - self.span_s, side="right") - 1
+        valid = earlier >= 0
+        met = None
+        if valid.any():
+            now, then = new[valid], earlier[valid]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                rate = (all_values[now] - all_values[then]) / (all_times[now] - all_times[then])
+                true = np.flatnonzero(self.compare(rate, self.condition.threshold))
+            if len(true):
+                met = all_times[now[true[0]]]
+        keep = all_times >= all_times[-1] - self.span_s * 2
+        self._times, self._values = all_times[keep], all_values[keep]
+        return met
+
+class ConditionEngine:
+    """
+    Evaluates sequence conditions against the live sample stream.
+
+    The sampler calls evaluate() with every block it acquires (one row per polled tick, every
+    scan in stream mode), so conditions are decided at acquisition rate, not when the next
+    sequence event happens to fire. Two kinds of work are active at a time:
+
+    - waits: wait_for(condition, timeout) blocks the calling thread (the sequencer's scheduler)
+      until the condition is met, the timeout passes or abort() is called. After abort(), new
+      waits return ("aborted", reason) at once until start() is called for the next sequence
+    - guards: add_guard(condition, on_trip) calls on_trip(description) on the sampler thread
+      the first time the condition is met, e.g. to abort a running sequence
+
+    evaluate() returns immediately when nothing is active.
+    """
+    def __init__(self, sensors):
+        self._columns = {device.name: column for column, device in enumerate(sensors)}
+        self._lock = threading.Lock()
+        self._waits = []   # [tracker, threading.Event, result]
+        self._guards = []  # [tracker, on_trip]
+        self._redline_watch = None
+        self._aborted = None  # Reason given to abort(), until start()
+
+    def has_device(self, name):
+        return name in self._columns
+
+    def _tracker(self, condition):
+        if condition.device_name not in self._columns:
+            raise KeyError(f"No sensor named {condition.device_name}")
+        return _Tracker(condition, self._columns[condition.device_name])
+
+    def evaluate(self, times, values):
+        """Feed samples (times in seconds, values with one column per sensor in acquisition order)"""
+        if not self._waits and not self._guards:
+            return
+        times = np.asarray(times, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64).reshape(len(times), -1)
+        tripped = []
+        with self._lock:
+            for wait in self._waits:
+                met = wait[0].update(times, values)
+                if met is not None:
+                    wait[2] = ("met", met)
+                    wait[1].set()
+            self._waits = [wait for wait in self._waits if not wait[1].is_set()]
+            for guard in self._guards:
+                if guard[0].update(times, values) is not None:
+                    tripped.append(guard)
+            if tripped:
+                self._guards = [guard for guard in self._guards if guard not in tripped]
+        for tracker, on_trip in tripped:
+            log.warning("Abort condition met: %s", tracker.condition.describe())
+            on_trip(tracker.condition.describe())
+
+    def wait_for(self, condition, timeout_s):
+        """
+        Block until `condition` is met on samples that arrive from now on.
+
+        Returns:
+            tuple: ("met", sample time), ("timeout", None) or ("aborted", reason)
+        """
+        wait = [self._tracker(condition), threading.Event(), ("timeout", None)]
+        with self._lock:
+            # abort() may have run between the scheduler firing this step and getting here
+            if self._aborted is not None:
+                return ("aborted", self._aborted)
+            self._waits.append(wait)
+        wait[1].wait(timeout_s)
+        with self._lock:
+            if wait in self._waits:
+                self._waits.remove(wait)
+        return wait[2]
+
+    def add_guard(self, condition, on_trip):
+        """Call on_trip(description) the first time `condition` is met. Returns a handle for remove_guard."""
+        guard = [self._tracker(condition), on_trip]
+        with self._lock:
+            self._guards.append(guard)
+        return guard
+
+    def remove_guard(self, guard):
+        with self._lock:
+            if guard in self._guards:
+                self._guards.remove(guard)
+
+    def clear_guards(self):
+        with self._lock:
+            self._guards = []
+
+    def watch_redlines(self, on_trip):
+        """Call on_trip(name) on the sampler thread whenever a redline trips (None stops watching)"""
+        self._redline_watch = on_trip
+
+    def redline_tripped(self, name):
+        """Called by the sampler for every new redline trip"""
+        on_trip = self._redline_watch
+        if on_trip is not None:
+            on_trip(name)
+
+    def start(self):
+        """Accept waits again after abort() (called when a sequence starts)"""
+        with self._lock:
+            self._aborted = None
+
+    def abort(self, reason):
+        """Release every wait with ("aborted", reason), and any later one until start()"""
+        with self._lock:
+            self._aborted = reason
+            waits, self._waits = self._waits, []
+        for wait in waits:
+            wait[2] = ("aborted", reason)
+            wait[1].set()
@@ -1,26 +1,80 @@
-import csv
 import threading
 import queue
 import os
 from datetime import datetime
 import time
 from PyQt5 import QtWidgets
+import numpy as np
 from PyQt5.QtCore import pyqtSignal, Qt
+from backend.log_format import WRITERS, record_dtype
+from backend.pyramid import PyramidBuilder, pyramid_path
+from backend.telemetry import telemetry
+from backend.event_log import get_logger
+
+log = get_logger("data_logger")
+
+class FramePool:
+    """
+    Recycled, preallocated blocks of log records.
+
+    Each frame is a numpy structured array with the log's record layout (Timestamp plus one
+    column per channel). The sampler fills a frame in place and hands the whole frame to the
+    writer thread, which returns it with release() once it is on disk. In steady state no
+    memory is allocated per sample; if the writer falls behind and the pool runs dry a new
+    frame is allocated and counted in `allocations`.
+    """
+    def __init__(self, dtype, frame_size=512, num_frames=32):
+        self.dtype = dtype
+        self.frame_size = frame_size
+        self._free = queue.Queue()
+        for _ in range(num_frames):
+            self._free.put(np.zeros(frame_size, dtype=dtype))
+        self.allocations = 0
+
+    def acquire(self):
+        """Get an empty frame"""
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            self.allocations += 1
+            return np.zeros(self.frame_size, dtype=self.dtype)
+
+    def release(self, frame):
+        """Return a frame once its contents have been written"""
+        if frame.dtype == self.dtype:
+            self._free.put(frame)
 
 class DataLogger(QtWidgets.QPushButton):
     state_changed = pyqtSignal(bool)
     
-    def __init__(self, transducers_list, thermocouples_list, loadcells_list, devices_list, width = 194, height = 100, parent=None, path="GG_Test/data"):
+    def __init__(self, transducers_list, thermocouples_list, loadcells_list, devices_list, width = 194, height = 100, parent=None, path="GG_Test/data", log_format="binary", build_pyramids=True):
         super().__init__(parent)  # Initialize the QPushButton parent class
         self.path = path
+        # "binary" writes fixed-width .mlog records (see backend/log_format.py), "csv" the original text format
+        self.writer_class = WRITERS[log_format]
         self.log_queue = queue.Queue()
         self.running = True
         self._transducers = transducers_list
         self._thermocouples = thermocouples_list
         self._loadcells = loadcells_list
         self._devices = devices_list
+        self.valve_bank = None  # Set by the main window - valve states are read under its lock
         self.high_speed_mode = False  # Track current mode
         self.base_name = "start"
+        self.frame_pool = None
+        self._frame = None      # Frame currently being filled by the sampler
+        self._frame_fill = 0    # Rows used in the current frame
+        self._frame_started = 0.0
+        self._frame_lock = threading.Lock()
+        self.max_frame_age = 1.0  # Seconds before a partially filled frame is handed to the writer anyway
+        self.rows_logged = 0      # Rows handed to the logger by the sampler
+        self.rows_written = 0     # Rows the writer thread has put on disk
+        self.rows_dropped = 0     # Rows that could not be written (no open file)
+        self.rotations = []       # One record per file switch (see _open_rotation)
+        self._open_file = None    # File the writer thread is writing, with the telemetry mark taken when it was opened
+        # Min/max pyramid (backend/pyramid.py) of the open file, built from the frames as they are written
+        self.build_pyramids = build_pyramids
+        self._pyramid = None
 
         # Create layout for the button and the filename textbox
         self.button_layout = QtWidgets.QVBoxLayout(self)
@@ -55,186 +109,330 @@ class DataLogger(QtWidgets.QPushButton):
         # Connect the button click to toggle function
         self.clicked.connect(self.toggle_sample_rate)
 
+        # Reference to the sampler (to be set from main window)
+        self.sampler = None
+
+        # Start the persistent background thread that writes (and rotates) the log files
+        self.thread = threading.Thread(target=self._process_queue)
+        self.thread.daemon = False  # Make thread daemon so it exits when main program exits
+        self.thread.start()
+
         # Create a new log file with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         if self.high_speed_mode:
             mode_str = "high"
         else:
             mode_str = "low"
-        self.filename = f"{self.path}/{self.base_name}_{mode_str}_{timestamp}.csv"
-        print(f"Creating new log file: {self.filename}")
-        
-        # Reference to the timer (to be set from main window)
-        self.reading_timer = None
-
-        # Create CSV file and write header if it doesn't exist
-        if not os.path.exists(self.filename):
-            os.makedirs(os.path.dirname(self.filename), exist_ok=True)  # Create directory if needed
-            with open(self.filename, mode='w', newline='') as file:
-                entry = ["Timestamp"]
-                for transducer in self._transducers:
-                    entry.append(f"{transducer.name} Pressure")
-                for thermocouple in self._thermocouples:
-                    entry.append(f"{thermocouple.name} Temperature")
-                for loadcell in self._loadcells:
-                    entry.append(f"{loadcell.name} Load")
-                for device in self._devices:
-                    entry.append(f"{device.name} State")
-                writer = csv.writer(file)
-                writer.writerow(entry)
-
-        # Start the background thread to handle writing to the CSV
-        self.thread = threading.Thread(target=self._process_queue)
-        self.thread.daemon = False  # Make thread daemon so it exits when main program exits
-        self.thread.start()
-    
-    def set_timer(self, timer):
-        """Set reference to the pressure timer"""
-        self.reading_timer = timer
+        self.rotate(self._new_filename(mode_str))
+
+    def set_sampler(self, sampler):
+        """Set reference to the sampler thread whose interval sets the sampling rate"""
+        self.sampler = sampler
     
     def toggle_sample_rate(self):
         """Toggle between high speed (10ms) and low speed (500ms) and create a new log file"""
-        if not self.reading_timer:
+        if not self.sampler:
             return
         
-        # Stop the current logging thread (going to make a new one for new file)
-        self.running = False             # <- Set this before join
-        if self.thread.is_alive():
-            self.thread.join()           # Wait for thread to finish processing remaining data
-        
+        # Get the base name from the textbox
+        self.base_name = self.filename_textbox.text()
+        if not self.base_name:  # If empty, use default
+            self.base_name = "log"
+            self.filename_textbox.setText(self.base_name)
+
+        # Switch files first so every row sampled at the new rate lands in the new file. The writer
+        # thread does the actual switch; we only queue the request, so this returns immediately.
+        if self.high_speed_mode:
+            self.rotate(self._new_filename("low"))
+        else:
+            self.rotate(self._new_filename("high"))
+
         # Toggle the speed
         if self.high_speed_mode:
             # Switch to low speed
-            mode_str = "low"
-            self.reading_timer.stop()
-            print("Setting timer interval to 500ms")
-            self.reading_timer.setInterval(500)
-            self.reading_timer.start()
+            log.info("Setting sampler interval to 500ms")
+            self.sampler.set_interval(500)
             self.button_text.setText("LOGGING SPEED: \n Low Speed")
             self.high_speed_mode = False
         else:
             # Switch to high speed
-            mode_str = "high"
-            self.reading_timer.stop()
-            print("Setting timer interval to 10ms")
-            self.reading_timer.setInterval(10)
-            self.reading_timer.start()
+            log.info("Setting sampler interval to 10ms")
+            self.sampler.set_interval(10)
             self.button_text.setText("LOGGING SPEED: \n High Speed")
             self.high_speed_mode = True
 
-        # Setup the new file
-
-        # Get the base name from the textbox
-        self.base_name = self.filename_textbox.text()
-        if not self.base_name:  # If empty, use default
-            self.base_name = "log"
-            self.filename_textbox.setText(self.base_name)
-        
-        # Create a new log file with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-        # Create new filename with timestamp and mode
-        new_filename = f"{self.path}/{self.base_name}_{mode_str}_{timestamp}.csv"
-        print(f"Creating new log file: {new_filename}")
-        
-        # Create the new file with headers
-        if not os.path.exists(self.path):
-            os.makedirs(self.path, exist_ok=True)
-        
-        with open(new_filename, mode='w', newline='') as file:
-            entry = ["Timestamp"]
-            for transducer in self._transducers:
-                entry.append(f"{transducer.name} Pressure")
-            for thermocouple in self._thermocouples:
-                entry.append(f"{thermocouple.name} Temperature")
-            for loadcell in self._loadcells:
-                entry.append(f"{loadcell.name} Load")
-            for device in self._devices:
-                entry.append(f"{device.name} State")
-            writer = csv.writer(file)
-            writer.writerow(entry)
-        
-        # Update the filename to use for future logging
-        self.filename = new_filename
-        
-        self.running = True  # Restart logging
-        # Start the background thread to handle writing to the CSV
-        self.thread = threading.Thread(target=self._process_queue)
-        self.thread.daemon = False  # Make thread daemon so it exits when main program exits
-        self.thread.start()
-
         # Update button color
         self.update_button_style()
         
         # Emit signal with current state
         self.state_changed.emit(self.high_speed_mode)
 
-    def log_data(self):
-        """Put the log data in the queue for the background thread to process."""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
-        entry = [timestamp]
+    def log_header(self):
+        """Describe every logged column (in row order) with its device and calibration"""
+        channels = []
         for transducer in self._transducers:
-            entry.append(transducer.pressure)
+            channels.append({"column": f"{transducer.name} Pressure", "device": transducer.name, "quantity": "Pressure",
+                             "units": "psi", "channels": transducer.channels(), "calibration": transducer.calibration()})
         for thermocouple in self._thermocouples:
-            entry.append(thermocouple.temperature)
+            channels.append({"column": f"{thermocouple.name} Temperature", "device": thermocouple.name, "quantity": "Temperature",
+                             "channels": thermocouple.channels(), "calibration": thermocouple.calibration()})
         for loadcell in self._loadcells:
-            entry.append(loadcell.load)
+            channels.append({"column": f"{loadcell.name} Load", "device": loadcell.name, "quantity": "Load",
+                             "channels": loadcell.channels(), "calibration": loadcell.calibration()})
+        valves = []
         for device in self._devices:
-            entry.append(device.valve_open)
-        self.log_queue.put(entry)
+            valves.append({"column": f"{device.name} State", "device": device.name,
+                           "output": device.labjack_output, "norm_open": device.norm_open})
+        return {"created": datetime.now().isoformat(), "channels": channels, "valves": valves}
+
+    def _new_filename(self, mode_str):
+        """Log file name for the current base name, mode and time"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return f"{self.path}/{self.base_name}_{mode_str}_{timestamp}{self.writer_class.extension}"
+
+    def rotate(self, filename):
+        """
+        Switch logging to a new file without stopping the writer.
+
+        Everything logged before this call goes to the current file and everything after it to
+        the new one: the partial frame and a rotate marker are queued together under the frame
+        lock, and the writer thread opens the new file when it reaches the marker.
+        """
+        log.info("Creating new log file: %s", filename)
+        header = self.log_header()
+        with self._frame_lock:
+            self._hand_off_frame()
+            self._set_header(header)
+            self.log_queue.put(("rotate", filename, header, time.perf_counter_ns()))
+        self.filename = filename
+
+    def _set_header(self, header):
+        """Use a new log header, rebuilding the frame pool if the record layout changed"""
+        self.header = header
+        self._channel_fields = [channel["column"] for channel in header["channels"]]
+        self._valve_fields = [valve["column"] for valve in header["valves"]]
+        dtype = record_dtype(header)
+        if self.frame_pool is None or self.frame_pool.dtype != dtype:
+            # Caller holds _frame_lock and has already handed off the current frame
+            self.frame_pool = FramePool(dtype)
+
+    def log_data(self, timestamp=None):
+        """Write the current readings into the frame being filled (timestamp in seconds since the epoch)."""
+        if timestamp is None:
+            timestamp = time.time()
+        record = [timestamp]
+        for transducer in self._transducers:
+            record.append(transducer.pressure)
+        for thermocouple in self._thermocouples:
+            record.append(thermocouple.temperature)
+        for loadcell in self._loadcells:
+            record.append(loadcell.load)
+        record.extend(self._valve_states())
+        with self._frame_lock:
+            if self._frame is None:
+                self._start_frame(timestamp)
+            self._frame[self._frame_fill] = tuple(record)
+            self._frame_fill += 1
+            self.rows_logged += 1
+            if self._frame_fill == len(self._frame) or timestamp - self._frame_started >= self.max_frame_age:
+                self._hand_off_frame()
+
+    def log_block(self, timestamps, values):
+        """
+        Copy a block of already converted samples (e.g. from stream mode) into frames, column by column.
+
+        Args:
+            timestamps: Sample times in seconds since the epoch
+            values: One row per sample, one column per sensor (transducers, thermocouples, load cells)
+        """
+        start = 0
+        with self._frame_lock:
+            while start < len(timestamps):
+                if self._frame is None:
+                    self._start_frame(timestamps[start])
+                # Valves change from the GUI and the sequencer's scheduler while a block is logged -
+                # take the states again for every frame so a long block does not carry stale ones
+                states = self._valve_states()
+                count = min(len(timestamps) - start, len(self._frame) - self._frame_fill)
+                rows = slice(self._frame_fill, self._frame_fill + count)
+                self._frame["Timestamp"][rows] = timestamps[start:start + count]
+                for column, field in enumerate(self._channel_fields):
+                    self._frame[field][rows] = values[start:start + count, column]
+                for state, field in zip(states, self._valve_fields):
+                    self._frame[field][rows] = state
+                self._frame_fill += count
+                self.rows_logged += count
+                start += count
+                if self._frame_fill == len(self._frame) or timestamps[start - 1] - self._frame_started >= self.max_frame_age:
+                    self._hand_off_frame()
+
+    def _valve_states(self):
+        if self.valve_bank is not None:
+            return self.valve_bank.states(self._devices)
+        return [device.valve_open for device in self._devices]
+
+    def _start_frame(self, timestamp):
+        self._frame = self.frame_pool.acquire()
+        self._frame_fill = 0
+        self._frame_started = timestamp
+
+    def _hand_off_frame(self):
+        """Queue the current frame for the writer thread (caller holds _frame_lock)"""
+        if self._frame is not None and self._frame_fill:
+            self.log_queue.put(("frame", self._frame, self._frame_fill))
+        elif self._frame is not None:
+            self.frame_pool.release(self._frame)
+        self._frame = None
+        self._frame_fill = 0
+
+    def flush_frame(self):
+        """Hand the partially filled frame to the writer now (e.g. before switching files)"""
+        with self._frame_lock:
+            self._hand_off_frame()
 
     def _process_queue(self):
-        """Background thread function to process the queue and write to the CSV file."""
+        """Persistent background thread: writes frames and switches files in queue order."""
+        writer = None
+        rotation = None         # Rotation still waiting for its first row
+        last_timestamp = None   # Timestamp of the last row written, across files
+        last_sync = time.time()
+        unsynced = False
+
+        while self.running or not self.log_queue.empty():
+            try:
+                # Block until something arrives (timeout to allow clean shutdown)
+                item = self.log_queue.get(timeout = 0.1)
+            except queue.Empty:
+                # If idle, sync what we have every second
+                log.debug("Idle")
+                if writer is not None and unsynced and time.time() - last_sync > 1.0:
+                    # Force sync to disk (safe but slower)
+                    writer.flush(sync=True)
+                    unsynced = False
+                    last_sync = time.time()
+                continue
+
+            self.log_queue.task_done()
+            telemetry.gauge("logger.queue_depth", self.log_queue.qsize())
+            if item[0] == "rotate":
+                _, filename, header, requested_ns = item
+                # The old file is closed whatever happens next - never write to it again
+                previous, writer = writer, None
+                writer, rotation = self._open_rotation(previous, filename, header, requested_ns, last_timestamp)
+                unsynced = False
+                continue
+
+            _, frame, count = item
+            try:
+                if writer is None:
+                    self.rows_dropped += count
+                    telemetry.count("logger.rows_dropped", count)
+                else:
+                    # Frames are already batches of rows - write them straight out
+                    log.debug("Buffer dump: %d rows", count)
+                    start_ns = time.perf_counter_ns()
+                    writer.write_block(frame[:count])
+                    # Optional: force sync to disk (safe but slower) with sync=True
+                    writer.flush()
+                    telemetry.record("logger.write", time.perf_counter_ns() - start_ns)
+                    if self._pyramid is not None:
+                        self._pyramid[1].add(frame[:count])
+                    telemetry.count("logger.rows_written", count)
+                    unsynced = True
+                    self.rows_written += count
+                    if rotation is not None:
+                        self._close_rotation(rotation, float(frame["Timestamp"][0]))
+                        rotation = None
+                    last_timestamp = float(frame["Timestamp"][count - 1])
+            except Exception as e:
+                log.error("Error writing to log file: %s", e)
+                self.rows_dropped += count
+                telemetry.count("logger.rows_dropped", count)
+                time.sleep(1)  # Prevent CPU spinning on persistent errors
+            finally:
+                self.frame_pool.release(frame)
+
+        # Final flush before exit
+        if writer is not None:
+            writer.flush(sync=True)
+            writer.close()
+            self._dump_telemetry()
+            self._write_pyramid()
+        log.info("Data Logger thread exiting gracefully. Rows logged: %d, written: %d, dropped: %d",
+                 self.rows_logged, self.rows_written, self.rows_dropped)
+
+    def _open_rotation(self, writer, filename, header, requested_ns, last_timestamp):
+        """
+        Close the current file, create the next one and start a rotation record (writer thread).
+        Returns (None, None) if the new file cannot be opened - frames are dropped until the next rotate.
+        """
+        if writer is not None:
+            try:
+                writer.flush(sync=True)
+                writer.close()
+            except Exception as e:
+                log.error("Error closing log file: %s", e)
+            self._dump_telemetry()
+            self._write_pyramid()
         try:
-            with open(self.filename, mode='a', newline='') as file:
-                writer = csv.writer(file)
-
-                buffer = []
-                last_flush = time.time()
-
-                while self.running or not self.log_queue.empty():
-                    try:
-                        # Block until data arrives (timeout to allow clean shutdown)
-                        data = self.log_queue.get(timeout = 0.1)
-                        buffer.append(data)
-                        self.log_queue.task_done()
-
-                        # Write in batches of 100 rows
-                        if buffer and (len(buffer) >= 100 or time.time() - last_flush >= 1.0):
-                            print("Buffer dump")
-                            writer.writerows(buffer)
-                            file.flush()
-                            # Optional: force sync to disk (safe but slower)
-                            # os.fsync(file.fileno())
-                            buffer.clear()
-                            last_flush = time.time()
-
-                    except queue.Empty:
-                        # If idle, flush what we have every second
-                        print("Idle...")
-                        if buffer and time.time() - last_flush > 1.0:
-                            writer.writerows(buffer)
-                            file.flush()
-                            # Force sync to disk (safe but slower)
-                            os.fsync(file.fileno())
-                            buffer.clear()
-                            last_flush = time.time()
-
-                # Final flush before exit
-                writer.writerows(buffer)
-                file.flush()
-                os.fsync(file.fileno())
-                buffer.clear()
-                print("Data Logger thread exiting gracefully.")
+            os.makedirs(os.path.dirname(filename), exist_ok=True)  # Create directory if needed
+            self.writer_class.create(filename, header)
+            writer = self.writer_class(filename, header)
+        except Exception as e:
+            log.error("Could not open log file %s: %s", filename, e)
+            return None, None
+        rotation = {
+            "file": filename,
+            "latency_ms": (time.perf_counter_ns() - requested_ns) / 1e6,  # Request to new file ready
+            "rows_before": self.rows_written,      # Rows written to all earlier files
+            "last_timestamp_before": last_timestamp,
+            "first_timestamp_after": None,
+            "boundary_gap_ms": None,
+        }
+        self.rotations.append(rotation)
+        self._open_file = (filename, telemetry.mark(), self.rows_written)
+        if self.build_pyramids:
+            self._pyramid = (filename, PyramidBuilder([column["column"] for column in header["channels"] + header["valves"]]))
+        return writer, rotation
 
+    def _dump_telemetry(self):
+        """Write the telemetry gathered while the current file was open next to it, as <name>_telemetry.json (writer thread)"""
+        if self._open_file is None:
+            return
+        filename, mark, rows_before = self._open_file
+        self._open_file = None
+        path = os.path.splitext(filename)[0] + "_telemetry.json"
+        try:
+            telemetry.dump(path, mark, file=os.path.basename(filename), rows_in_file=self.rows_written - rows_before,
+                           frame_allocations=self.frame_pool.allocations if self.frame_pool else 0)
+        except Exception as e:
+            log.error("Error writing telemetry for %s: %s", filename, e)
+
+    def _write_pyramid(self):
+        """Write the min/max pyramid of the file just closed next to it, as <name>.mpyr (writer thread)"""
+        if self._pyramid is None:
+            return
+        (filename, builder), self._pyramid = self._pyramid, None
+        if builder.rows == 0:
+            return
+        start_ns = time.perf_counter_ns()
+        try:
+            builder.write(pyramid_path(filename), filename)
+            telemetry.record("logger.pyramid", time.perf_counter_ns() - start_ns)
         except Exception as e:
-            print(f"Error writing to log file: {e}")
-            time.sleep(1)  # Prevent CPU spinning on persistent errors
+            log.error("Error writing pyramid for %s: %s", filename, e)
 
+    def _close_rotation(self, rotation, first_timestamp):
+        """Record the first row in the new file. The boundary gap should be one sample interval."""
+        rotation["first_timestamp_after"] = first_timestamp
+        if rotation["last_timestamp_before"] is not None:
+            rotation["boundary_gap_ms"] = (first_timestamp - rotation["last_timestamp_before"]) * 1000
+            log.info("Rotated to %s in %.2f ms, gap across boundary %.2f ms",
+                     rotation["file"], rotation["latency_ms"], rotation["boundary_gap_ms"])
 
     def stop(self):
         """Stop the logging and gracefully shut down the background thread."""
-        print("Terminating Data Logger")
+        log.info("Terminating Data Logger")
+        self.flush_frame()
         self.running = False
         if self.thread.is_alive():
             self.thread.join()  # Wait for the thread with timeout
@@ -0,0 +1,149 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime
+from backend.telemetry import telemetry
+
+ROOT = "maelstrom"
+
+# Attributes every LogRecord has - anything else on a record came from extra={...}
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "suppressed"}
+
+def get_logger(name):
+    """
+    Event logger for one module, e.g. get_logger("data_logger").
+
+    Pass values as arguments instead of formatting them yourself -
+    log.debug("Wrote %d rows", count) - so nothing is formatted for events that are filtered
+    out, rate limited, or below the configured level. Arguments are formatted later on the
+    writer thread, so pass values (numbers, strings, tuples), not containers that keep changing.
+    """
+    return logging.getLogger(f"{ROOT}.{name}")
+
+class RateLimit(logging.Filter):
+    """
+    Lets each message through at most `burst` times per `period` seconds.
+
+    Messages are keyed by logger, format string and - when it is a string, such as a device or
+    output name - the first argument, so "Idle" from the data logger is limited on its own and
+    each valve gets its own allowance. Nothing is formatted to build the key. The first message
+    of the next period carries the number that were dropped. CRITICAL events are never dropped.
+    """
+    def __init__(self, period=1.0, burst=5):
+        super().__init__()
+        self.period = period
+        self.burst = burst
+        self._windows = {}  # (logger, format string, subject) -> [period start, emitted, suppressed]
+        self.suppressed = 0
+
+    def filter(self, record):
+        if record.levelno >= logging.CRITICAL:
+            return True
+        subject = record.args[0] if isinstance(record.args, tuple) and record.args and isinstance(record.args[0], str) else None
+        key = (record.name, record.msg, subject)
+        window = self._windows.get(key)
+        if window is None or record.created - window[0] >= self.period:
+            if window is not None and window[2]:
+                record.suppressed = window[2]
+            self._windows[key] = [record.created, 1, 0]
+            return True
+        if window[1] < self.burst:
+            window[1] += 1
+            return True
+        window[2] += 1
+        self.suppressed += 1
+        telemetry.count("events.suppressed")
+        return False
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread"""
+    def prepare(self, record):
+        return record
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per event: time, level, source, event (the format string), message and any extra fields"""
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="microseconds"),
+            "level": record.levelname,
+            "source": record.name[len(ROOT) + 1:] or ROOT,
+            "thread": record.threadName,
+            "event": str(record.msg),
+            "message": record.getMessage(),
+        }
+        fields = {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+        if fields:
+            entry["fields"] = fields
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class ConsoleFormatter(logging.Formatter):
+    """The plain messages the application used to print, with the level for warnings and worse"""
+    def format(self, record):
+        message = record.getMessage()
+        if record.levelno >= logging.WARNING:
+            message = f"{record.levelname}: {message}"
+        if getattr(record, "suppressed", 0):
+            message += f" ({record.suppressed} similar messages suppressed)"
+        if record.exc_info:
+            message += "\n" + self.formatException(record.exc_info)
+        return message
+
+_listener = None
+_handler = None
+path = None
+
+def start(directory="GG_Test/logs", file_level=logging.DEBUG, console_level=logging.INFO, period=1.0, burst=5):
+    """
+    Start writing events to <directory>/events_<timestamp>.jsonl (and the console) on a
+    background thread. Until this is called only warnings and worse are shown, on stderr.
+    Returns the event file path.
+    """
+    global _listener, _handler, path
+    if _listener is not None:
+        return path
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"events_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+
+    file_handler = logging.FileHandler(path)
+    file_handler.setLevel(file_level)
+    file_handler.setFormatter(JsonLinesFormatter())
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setLevel(console_level)
+    console_handler.setFormatter(ConsoleFormatter())
+
+    # Callers only create the record and queue it; the listener thread formats and writes
+    events = queue.SimpleQueue()
+    _handler = _DeferredQueueHandler(events)
+    _handler.addFilter(RateLimit(period, burst))
+    root = logging.getLogger(ROOT)
+    root.setLevel(min(file_level, console_level))
+    root.addHandler(_handler)
+    root.propagate = False
+    _listener = logging.handlers.QueueListener(events, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    return path
+
+def stop():
+    """Write out every queued event and close the event file"""
+    global _listener, _handler
+    if _listener is None:
+        return
+    for limit in _handler.filters:
+        if limit.suppressed:
+            logging.getLogger(f"{ROOT}.event_log").info("%d events were suppressed by rate limiting", limit.suppressed)
+    _listener.stop()
+    root = logging.getLogger(ROOT)
+    root.removeHandler(_handler)
+    root.setLevel(logging.NOTSET)
+    root.propagate = True
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+    _handler = None
@@ -1,8 +1,49 @@
+import queue
+import threading
+import time
 from PyQt5.QtCore import QObject, QTimer
 from PyQt5.QtWidgets import QLabel
-from labjack import ljm
+from backend.ljm_backend import ljm
+from backend.telemetry import telemetry
+from backend.event_log import get_logger
+
+log = get_logger("labjack")
+
+class LabJackCommand:
+    """One queued read or write; the caller waits on it for the result"""
+    def __init__(self, kind, names, values=None):
+        self.kind = kind  # "read" or "write"
+        self.names = list(names)
+        self.values = list(values) if values is not None else None
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+
+    def finish(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self._done.set()
+
+    def wait(self):
+        """Block until the command ran; returns the values read (reads) or raises its error"""
+        self._done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
 
 class LabJackConnection(QObject):
+    """
+    Owns the single LabJack handle shared by every device.
+
+    Sensors, valves and the valve bank never open their own handle: they call read_names /
+    write_names here. Those calls go onto one command queue executed by a worker thread, which
+    takes everything queued at once and merges consecutive reads into one eReadNames and
+    consecutive writes into one eWriteNames (in order). Only the heartbeat opens, tests and
+    re-opens the handle, so a dropped link causes one reconnect instead of one per valve.
+
+    Stream mode is the exception: eStreamRead blocks until data arrives, so the stream thread
+    uses `handle` directly once the stream is configured.
+    """
     def __init__(self, status_label: QLabel):
         super().__init__()
         self.handle = None
@@ -11,30 +52,116 @@ class LabJackConnection(QObject):
         self.consecutive_failures = 0
         self.max_failures_before_disconnect = 1  # Require 3 consecutive failures before disconnecting
 
+        # Command queue - every read and write on the handle goes through the worker thread
+        self._commands = queue.Queue()
+        self._io_lock = threading.Lock()  # Held while a batch runs or the handle is replaced
+        self.commands_executed = 0
+        self.batches_executed = 0
+        self.worker = threading.Thread(target=self._process_commands)
+        self.worker.daemon = True
+        self.worker.start()
+
         # Heartbeat Timer
         self.heartbeat_timer = QTimer(self)
         self.heartbeat_timer.timeout.connect(self.heartbeat_check)
         self.heartbeat_interval_ms = 200  
 
+    def submit(self, kind, names, values=None):
+        """Queue a command without waiting for it"""
+        command = LabJackCommand(kind, names, values)
+        self._commands.put(command)
+        return command
+
+    def read_names(self, names):
+        """Read several registers in one queued transaction"""
+        return self.submit("read", names).wait()
+
+    def read_name(self, name):
+        return self.read_names([name])[0]
+
+    def write_names(self, names, values):
+        """Write several registers in one queued transaction (in the given order)"""
+        self.submit("write", names, values).wait()
+
+    def write_name(self, name, value):
+        self.write_names([name], [value])
+
+    def _process_commands(self):
+        """Worker thread: run queued commands, merging runs of the same kind into one LabJack call"""
+        while True:
+            batch = [self._commands.get()]
+            while True:
+                try:
+                    batch.append(self._commands.get_nowait())
+                except queue.Empty:
+                    break
+            telemetry.gauge("labjack.batch_commands", len(batch))
+            with self._io_lock:
+                group = []
+                for command in batch:
+                    if group and command.kind != group[0].kind:
+                        self._execute(group)
+                        group = []
+                    group.append(command)
+                self._execute(group)
+
+    def _execute(self, group):
+        names = [name for command in group for name in command.names]
+        start_ns = time.perf_counter_ns()
+        try:
+            if self.handle is None:
+                raise RuntimeError("LabJack not connected")
+            if group[0].kind == "read":
+                values = ljm.eReadNames(self.handle, len(names), names)
+            else:
+                values = [value for command in group for value in command.values]
+                ljm.eWriteNames(self.handle, len(names), names, values)
+                values = None
+        except Exception as e:
+            if len(group) > 1 and self.handle is not None:
+                # Don't let one bad register fail everyone else's command - retry them one by one
+                for command in group:
+                    self._execute([command])
+                return
+            for command in group:
+                command.finish(error=e)
+            return
+        start = 0
+        for command in group:
+            if values is None:
+                command.finish()
+            else:
+                command.finish(list(values[start:start + len(command.names)]))
+            start += len(command.names)
+        telemetry.record("labjack." + group[0].kind, time.perf_counter_ns() - start_ns)
+        self.commands_executed += len(group)
+        self.batches_executed += 1
+
+    def _close_handle(self):
+        """Close the shared handle (ignoring errors) once no batch is using it"""
+        with self._io_lock:
+            if self.handle is not None:
+                try:
+                    ljm.close(self.handle)
+                except Exception:
+                    pass  # Ignore errors on close
+                self.handle = None
+
     def connect_to_labjack(self):
         # Always try to close any existing handle first
-        if self.handle is not None:
-            try:
-                ljm.close(self.handle)
-            except Exception:
-                pass  # Ignore errors on close
-            self.handle = None
+        self._close_handle()
         
         try:
             # Completely fresh connection attempt
-            self.handle = ljm.openS("ANY", "ANY", "ANY")
+            with self._io_lock:
+                self.handle = ljm.openS("ANY", "ANY", "ANY")
             # ljm.writeLibraryConfigS(ljm.constants.LJME_OPEN_TIMEOUT_MS, 100)  # 0.5 seconds
             ljm.writeLibraryConfigS("LJM_OPEN_TCP_DEVICE_TIMEOUT_MS", 100)  # Reduce TCP timeout to 500 ms
             ljm.writeLibraryConfigS("LJM_SEND_RECEIVE_TIMEOUT_MS", 100)
             
             # Test the connection immediately
-            serial = ljm.eReadName(self.handle, "SERIAL_NUMBER")
-            print(f"Connection successful - Device serial: {serial}")
+            serial = self.read_name("SERIAL_NUMBER")
+            log.info("Connection successful - Device serial: %s", serial)
             
             self.consecutive_failures = 0
             self.connection_status = True
@@ -44,9 +171,9 @@ class LabJackConnection(QObject):
                 self.heartbeat_timer.start(self.heartbeat_interval_ms)
                 
         except Exception as e:
-            print(f"Connection attempt failed: {e}")
+            log.warning("Connection attempt failed: %s", e)
             self.connection_status = False
-            self.handle = None
+            self._close_handle()
             
             # Start heartbeat for reconnection attempts if not running
             if not self.heartbeat_timer.isActive():
@@ -72,13 +199,13 @@ class LabJackConnection(QObject):
             try:
                 # Try reading the serial number to test connection
                 # print("Achieved1")
-                ljm.eReadName(self.handle, "SERIAL_NUMBER")
+                self.read_name("SERIAL_NUMBER")
                 # print("Achieved2")
                 # Connection is good
                 self.consecutive_failures = 0
                 
                 if not self.connection_status:
-                    print("Heartbeat: Connection restored")
+                    log.info("Heartbeat: Connection restored")
                     self.connection_status = True
                     self.update_connection_status(True)
                     
@@ -87,20 +214,15 @@ class LabJackConnection(QObject):
                 self.consecutive_failures += 1
                 
                 if self.consecutive_failures >= self.max_failures_before_disconnect:
-                    print(f"Heartbeat: Connection lost after {self.consecutive_failures} failures - {e}")
+                    log.error("Heartbeat: Connection lost after %d failures - %s", self.consecutive_failures, e)
                     
                     # Clean up the handle
-                    try:
-                        ljm.close(self.handle)
-                    except Exception:
-                        pass  # Ignore errors on close
-                    
-                    self.handle = None
+                    self._close_handle()
                     if self.connection_status != False:
                         self.connection_status = False
                         self.update_connection_status(False)
                 else:
-                    print(f"Heartbeat: Potential connection issue (failure {self.consecutive_failures}/{self.max_failures_before_disconnect})")
+                    log.warning("Heartbeat: Potential connection issue (failure %d/%d)", self.consecutive_failures, self.max_failures_before_disconnect)
                     
         # If we don't have a handle, try to establish a new connection
         elif not self.handle:
@@ -110,11 +232,12 @@ class LabJackConnection(QObject):
             try:
                 # Fresh connection attempt
                 # print("Ping 1")
-                self.handle = ljm.openS("ANY", "ANY", "ANY")
+                with self._io_lock:
+                    self.handle = ljm.openS("ANY", "ANY", "ANY")
                 # print("Ping2")
                 # Test the connection immediately
-                serial = ljm.eReadName(self.handle, "SERIAL_NUMBER")
-                print(f"Heartbeat: Connected to device with serial: {serial}")
+                serial = self.read_name("SERIAL_NUMBER")
+                log.info("Heartbeat: Connected to device with serial: %s", serial)
                 
                 self.connection_status = True
                 self.update_connection_status(True)
@@ -123,28 +246,24 @@ class LabJackConnection(QObject):
                 # Only log failures occasionally to avoid spamming the console
                 # print("Ping3")
                 if self.connection_status: # or self.consecutive_failures % 10 == 0
-                    print(f"Heartbeat: Connection attempt failed - {e}")
+                    log.warning("Heartbeat: Connection attempt failed - %s", e)
                 
                 # Clean up any partially created handle
-                if self.handle is not None:
-                    try:
-                        ljm.close(self.handle)
-                    except Exception:
-                        pass
-                    self.handle = None
+                self._close_handle()
                 
                 self.connection_status = False
                 self.update_connection_status(False)
 
     def close_connection(self):
         """Close the LabJack connection."""
-        if self.handle is not None:
-            try:
-                ljm.close(self.handle)
-            except Exception as e:
-                print(f"Error closing connection: {e}")
-            
-            self.handle = None
+        with self._io_lock:
+            if self.handle is not None:
+                try:
+                    ljm.close(self.handle)
+                except Exception as e:
+                    log.error("Error closing connection: %s", e)
+                
+                self.handle = None
             
         self.connection_status = False
         self.heartbeat_timer.stop()  # Stop the heartbeat when connection is closed
@@ -0,0 +1,37 @@
+import os
+
+class LJMBackend:
+    """
+    Stands in for the `labjack.ljm` module so the LabJack library can be swapped out.
+
+    Every attribute lookup (ljm.eReadNames, ljm.openS, ...) is forwarded to the current
+    backend. By default that is the real LJM library; with the environment variable
+    MAELSTROM_LABJACK=sim (or after use_simulator()) it is a SimulatedLJM, so the whole
+    application - LabJackConnection, the sampler, valves, stream mode - runs without a T7.
+    """
+    def __init__(self):
+        self._backend = None
+
+    def backend(self):
+        if self._backend is None:
+            if os.environ.get("MAELSTROM_LABJACK", "").lower() == "sim":
+                self.use_simulator(latency_ms=float(os.environ.get("MAELSTROM_SIM_LATENCY_MS", "0")))
+            else:
+                from labjack import ljm as real_ljm
+                self._backend = real_ljm
+        return self._backend
+
+    def set_backend(self, backend):
+        """Use an object with the ljm functions (the real module or a simulator)"""
+        self._backend = backend
+
+    def use_simulator(self, **options):
+        """Switch to a fresh simulated T7 and return it (options go to SimulatedLJM)"""
+        from backend.simulated_ljm import SimulatedLJM
+        self._backend = SimulatedLJM(**options)
+        return self._backend
+
+    def __getattr__(self, name):
+        return getattr(self.backend(), name)
+
+ljm = LJMBackend()
@@ -0,0 +1,253 @@
+"""
+Binary log format for the DataLogger (.mlog) and the offline CSV converter.
+
+Layout of a .mlog file:
+    8 bytes   magic b"MAELLOG1"
+    4 bytes   little-endian uint32 length of the JSON header
+    N bytes   UTF-8 JSON header, space padded so the records start on a 64 byte boundary
+    records   fixed-width little-endian records, one per sample, until end of file
+
+Every record is Timestamp (float64 seconds since the epoch), one float32 per sensor and one
+uint8 (0/1) per valve, in the same column order as the CSV logs. The header lists every
+column with its device, quantity and calibration, so a file is self-describing. Because the
+records are fixed width the file can be memory-mapped with numpy, and a file that was cut
+short (e.g. power loss) is still readable up to the last complete record.
+
+Convert to CSV with:
+    python -m backend.log_format <file.mlog> [<file.csv>]
+"""
+import csv
+import json
+import os
+import re
+import sys
+from collections import namedtuple
+from datetime import datetime
+import numpy as np
+
+MAGIC = b"MAELLOG1"
+VERSION = 1
+EXTENSION = ".mlog"
+# Binary copies of CSV logs made for reviewing them (backend/review.py) - not logs in their own right
+REVIEW_EXTENSION = ".review" + EXTENSION
+_ALIGNMENT = 64
+
+def record_dtype(header):
+    """Numpy structured dtype of one record for a header dict"""
+    fields = [("Timestamp", "<f8")]
+    fields += [(channel["column"], "<f4") for channel in header["channels"]]
+    fields += [(valve["column"], "u1") for valve in header["valves"]]
+    return np.dtype(fields)
+
+def write_header(file, header):
+    """Write the magic, header length and JSON header to a new, empty binary file"""
+    header = dict(header, version=VERSION)
+    text = json.dumps(header).encode("utf-8")
+    # Pad so the records start aligned (nicer for memory mapping)
+    prefix = len(MAGIC) + 4
+    text += b" " * (-(prefix + len(text)) % _ALIGNMENT)
+    file.write(MAGIC)
+    file.write(len(text).to_bytes(4, "little"))
+    file.write(text)
+
+def read_header(file):
+    """
+    Read the header of an open binary log.
+
+    Returns:
+        tuple: (header, data_offset) - the header dict and the byte offset of the first record
+    """
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"{getattr(file, 'name', 'file')} is not a Maelstrom binary log")
+    length = int.from_bytes(file.read(4), "little")
+    header = json.loads(file.read(length).decode("utf-8"))
+    if header.get("version") != VERSION:
+        raise ValueError(f"Unsupported log version: {header.get('version')}")
+    return header, len(MAGIC) + 4 + length
+
+def open_log(path):
+    """
+    Memory-map a binary log.
+
+    Returns:
+        tuple: (header, records) - records is a read-only numpy structured array (no data is read up front)
+    """
+    with open(path, "rb") as file:
+        header, offset = read_header(file)
+    dtype = record_dtype(header)
+    count = (os.path.getsize(path) - offset) // dtype.itemsize  # Ignore a trailing partial record
+    if count == 0:
+        return header, np.zeros(0, dtype=dtype)
+    return header, np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count,))
+
+# DataLogger names every file {base}_{mode}_{YYYYmmdd}_{HHMMSS}{extension}, mode "high" or "low"
+_LOG_NAME = re.compile(r"^(?P<base>.+)_(?P<mode>high|low)_(?P<stamp>\d{8}_\d{6})$")
+
+class LogName(namedtuple("LogName", "base mode created")):
+    """The parts of a log file name; created is when the file was opened (naive local datetime)"""
+    __slots__ = ()
+
+def parse_log_name(path):
+    """LogName of a log file path, or None if it does not follow the DataLogger naming"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    match = _LOG_NAME.match(stem)
+    if match is None:
+        return None
+    try:
+        created = datetime.strptime(match["stamp"], "%Y%m%d_%H%M%S")
+    except ValueError:
+        return None
+    return LogName(match["base"], match["mode"], created)
+
+def format_timestamp(timestamp):
+    """Timestamp text used in the CSV logs"""
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+class BinaryLogWriter:
+    """Appends fixed-width records to a binary log created with write_header"""
+    extension = EXTENSION
+
+    @staticmethod
+    def create(filename, header):
+        """Create a new log file containing only the header"""
+        with open(filename, mode="wb") as file:
+            write_header(file, header)
+
+    def __init__(self, filename, header):
+        self.dtype = record_dtype(header)
+        self.file = open(filename, mode="ab")
+
+    def write_block(self, records):
+        """Append a structured array of records (already in the file's record layout)"""
+        self.file.write(records.astype(self.dtype, copy=False).tobytes())
+
+    def flush(self, sync=False):
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+class CsvLogWriter:
+    """Appends rows to a CSV log (the original text format)"""
+    extension = ".csv"
+
+    @staticmethod
+    def create(filename, header):
+        """Create a new log file containing only the header row"""
+        with open(filename, mode="w", newline="") as file:
+            columns = ["Timestamp"] + [column["column"] for column in header["channels"] + header["valves"]]
+            csv.writer(file).writerow(columns)
+
+    def __init__(self, filename, header):
+        self.header = header
+        self.file = open(filename, mode="a", newline="")
+        self.writer = csv.writer(self.file)
+
+    def write_block(self, records):
+        """Append a structured array of records as CSV rows"""
+        self.writer.writerows(csv_rows(self.header, records))
+
+    def flush(self, sync=False):
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+WRITERS = {"binary": BinaryLogWriter, "csv": CsvLogWriter}
+
+def csv_rows(header, records):
+    """Format a structured array of records as CSV rows (text timestamp, True/False valve states)"""
+    columns = [[format_timestamp(timestamp) for timestamp in records["Timestamp"].tolist()]]
+    columns += [records[channel["column"]].astype(str) for channel in header["channels"]]
+    columns += [np.where(records[valve["column"]] != 0, "True", "False") for valve in header["valves"]]
+    return zip(*columns)
+
+def export_csv(path, csv_path=None, chunk_size=100000):
+    """Convert a binary log to the CSV layout the DataLogger used to write. Returns the CSV path."""
+    if csv_path is None:
+        csv_path = os.path.splitext(path)[0] + ".csv"
+    header, records = open_log(path)
+    with open(csv_path, mode="w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(records.dtype.names)
+        # Convert in chunks so large logs never need to be fully in memory
+        for start in range(0, len(records), chunk_size):
+            writer.writerows(csv_rows(header, records[start:start + chunk_size]))
+    return csv_path
+
+def spread_whole_seconds(timestamps):
+    """
+    Spread rows that share a whole-second timestamp evenly across that second.
+
+    The first CSV logs recorded timestamps to the second only, so many consecutive rows carry
+    the same time. Timestamps that already have sub-second resolution are returned unchanged.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    if len(timestamps) == 0 or np.any(timestamps != np.floor(timestamps)):
+        return timestamps
+    starts = np.flatnonzero(np.r_[True, timestamps[1:] != timestamps[:-1]])
+    counts = np.diff(np.r_[starts, len(timestamps)])
+    position = np.arange(len(timestamps)) - np.repeat(starts, counts)
+    return timestamps + position / np.repeat(counts, counts)
+
+def _csv_chunks(path, chunk_size):
+    import pandas as pd
+    carry = None  # Rows of the last timestamp of the previous chunk (may continue in this one)
+    for chunk in pd.read_csv(path, chunksize=chunk_size):
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        if len(chunk) == 0:
+            continue
+        parsed = pd.to_datetime(chunk["Timestamp"], format="ISO8601")
+        # Naive local times, like datetime.fromtimestamp wrote them
+        seconds = np.array([moment.timestamp() for moment in parsed.dt.to_pydatetime()], dtype=np.float64)
+        last = np.flatnonzero(seconds == seconds[-1])[0]
+        carry = chunk.iloc[last:]
+        if last == 0:
+            continue
+        yield _csv_columns(chunk.iloc[:last], seconds[:last])
+    if carry is not None and len(carry):
+        parsed = pd.to_datetime(carry["Timestamp"], format="ISO8601")
+        yield _csv_columns(carry, np.array([moment.timestamp() for moment in parsed.dt.to_pydatetime()], dtype=np.float64))
+
+def _csv_columns(chunk, seconds):
+    import pandas as pd
+    columns = {"Timestamp": spread_whole_seconds(seconds)}
+    for name in chunk.columns[1:]:
+        if name.endswith(" State"):
+            columns[name] = chunk[name].astype(str).str.lower().isin(["true", "1"]).to_numpy(dtype=np.uint8)
+        else:
+            columns[name] = pd.to_numeric(chunk[name], errors="coerce").to_numpy(dtype=np.float64)
+    return columns
+
+def iter_chunks(path, chunk_size=100000):
+    """
+    Read a log (.mlog or .csv) a chunk at a time without loading the whole file.
+
+    Yields:
+        dict: column name -> numpy array for up to chunk_size rows. "Timestamp" is in seconds
+        since the epoch; valve "State" columns are 0/1.
+    """
+    if path.endswith(EXTENSION):
+        _, records = open_log(path)
+        for start in range(0, len(records), chunk_size):
+            block = records[start:start + chunk_size]
+            yield {name: np.asarray(block[name]) for name in records.dtype.names}
+    else:
+        yield from _csv_chunks(path, chunk_size)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not 1 <= len(argv) <= 2:
+        print("Usage: python -m backend.log_format <file.mlog> [<file.csv>]")
+        return 1
+    csv_path = export_csv(*argv)
+    print(f"Wrote {csv_path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
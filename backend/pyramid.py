@@ -0,0 +1,259 @@
+"""
+Multi-resolution min/max pyramids of log files (.mpyr), for browsing long runs quickly.
+
+A pyramid holds the log's columns (the layout DataLogger writes: Timestamp, one reading per
+sensor, one state per valve) reduced to buckets of consecutive rows. Level 0 buckets hold
+BUCKET_ROWS rows and every level above holds LEVEL_FACTOR times more, up to a level of at
+most TOP_BUCKETS buckets. Each bucket keeps its first and last timestamp and the min and max
+of every column, so a viewer can draw a whole test from the top level (peaks included) and
+read the log itself only for a zoomed-in window.
+
+Layout of a .mpyr file:
+    8 bytes   magic b"MAELPYR1"
+    4 bytes   little-endian uint32 length of the JSON header
+    N bytes   UTF-8 JSON header (source log name and size, columns, and each level's
+              bucket size, bucket count and byte offset), space padded to a 64 byte boundary
+    levels    fixed-width little-endian records, level 0 first
+
+DataLogger writes <log>.mpyr next to every log it closes (built as frames are written, so
+the log is not read again). For older logs run:
+    python -m backend.pyramid data/ [more logs or directories]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+import numpy as np
+from backend.log_format import EXTENSION, REVIEW_EXTENSION, iter_chunks
+
+MAGIC = b"MAELPYR1"
+VERSION = 2  # 2: upper levels skip NaN buckets (version 1 pyramids are rebuilt)
+PYRAMID_EXTENSION = ".mpyr"
+BUCKET_ROWS = 64
+LEVEL_FACTOR = 8
+TOP_BUCKETS = 2048
+_ALIGNMENT = 64
+
+def pyramid_path(log_path):
+    """Pyramid file of a log: <log without extension>.mpyr"""
+    return os.path.splitext(log_path)[0] + PYRAMID_EXTENSION
+
+def is_valve_column(column):
+    return column.endswith(" State")
+
+def level_dtype(columns):
+    """Record layout of one level for the log columns (Timestamp excluded)"""
+    fields = [("Timestamp", "<f8"), ("Timestamp end", "<f8")]
+    for column in columns:
+        kind = "u1" if is_valve_column(column) else "<f4"
+        fields += [(f"{column} min", kind), (f"{column} max", kind)]
+    return np.dtype(fields)
+
+def _reduce(records, size, columns, dtype):
+    """Combine every `size` consecutive records (last group may be shorter) into one"""
+    starts = np.arange(0, len(records), size)
+    out = np.zeros(len(starts), dtype=dtype)
+    out["Timestamp"] = records["Timestamp"][starts]
+    out["Timestamp end"] = records["Timestamp end"][np.minimum(starts + size, len(records)) - 1]
+    for column in columns:
+        low, high = f"{column} min", f"{column} max"
+        # fmin/fmax skip NaN (dead sensor) - a bucket of only NaN stays NaN
+        minimum, maximum = (np.minimum, np.maximum) if is_valve_column(column) else (np.fmin, np.fmax)
+        out[low] = minimum.reduceat(records[low], starts)
+        out[high] = maximum.reduceat(records[high], starts)
+    return out
+
+class PyramidBuilder:
+    """
+    Builds a pyramid a block of rows at a time.
+
+    Blocks are anything indexable by column name - the DataLogger's structured frames or the
+    chunks of log_format.iter_chunks. Only level 0 is kept while building (1/BUCKET_ROWS of the
+    rows, two values per column); the upper levels are reduced from it in write().
+    """
+    def __init__(self, columns, bucket_rows=BUCKET_ROWS):
+        self.columns = [column for column in columns if column != "Timestamp"]
+        self.bucket_rows = bucket_rows
+        self.dtype = level_dtype(self.columns)
+        self.rows = 0
+        self._buckets = []  # Level 0 blocks
+        self._carry = None  # Rows left over from the last block (fewer than a bucket)
+
+    def add(self, block):
+        times = np.asarray(block["Timestamp"], dtype=np.float64)
+        if len(times) == 0:
+            return
+        rows = np.zeros(len(times), dtype=self.dtype)
+        rows["Timestamp"] = rows["Timestamp end"] = times
+        for column in self.columns:
+            values = np.asarray(block[column])
+            rows[f"{column} min"] = rows[f"{column} max"] = values
+        if self._carry is not None:
+            rows = np.concatenate((self._carry, rows))
+        usable = len(rows) - len(rows) % self.bucket_rows
+        if usable:
+            self._buckets.append(_reduce(rows[:usable], self.bucket_rows, self.columns, self.dtype))
+        self._carry = rows[usable:] if usable < len(rows) else None
+        self.rows += len(times)
+
+    def levels(self):
+        """Every level, finest first (level 0 includes the partial last bucket)"""
+        blocks = list(self._buckets)
+        if self._carry is not None:
+            blocks.append(_reduce(self._carry, self.bucket_rows, self.columns, self.dtype))
+        level = np.concatenate(blocks) if blocks else np.zeros(0, dtype=self.dtype)
+        levels = [(self.bucket_rows, level)]
+        while len(level) > TOP_BUCKETS:
+            level = _reduce(level, LEVEL_FACTOR, self.columns, self.dtype)
+            levels.append((levels[-1][0] * LEVEL_FACTOR, level))
+        return levels
+
+    def write(self, path, source):
+        """Write the pyramid for the log at `source` (written to a temporary file, then renamed into place)"""
+        levels = self.levels()
+        header = {"version": VERSION, "log": os.path.basename(source), "log_size": os.path.getsize(source),
+                  "rows": self.rows, "columns": self.columns, "levels": []}
+        # Offsets depend on the header length, which depends on the offsets - reserve room for them
+        text = b""
+        for _ in range(2):
+            prefix = len(MAGIC) + 4 + len(text)
+            prefix += -prefix % _ALIGNMENT
+            offset = prefix
+            header["levels"] = []
+            for bucket_rows, level in levels:
+                header["levels"].append({"bucket_rows": bucket_rows, "count": len(level), "offset": offset})
+                offset += level.nbytes
+            text = json.dumps(header).encode("utf-8")
+            text += b" " * (-(len(MAGIC) + 4 + len(text)) % _ALIGNMENT)
+            if len(MAGIC) + 4 + len(text) == prefix:
+                break
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as file:
+            file.write(MAGIC)
+            file.write(len(text).to_bytes(4, "little"))
+            file.write(text)
+            for _, level in levels:
+                file.write(level.tobytes())
+        os.replace(temporary, path)
+        return path
+
+class PyramidLevel(namedtuple("PyramidLevel", "bucket_rows records")):
+    """One level: records are memory-mapped, bucket_rows is how many log rows each covers"""
+    __slots__ = ()
+
+class Pyramid:
+    """A memory-mapped pyramid (see open_pyramid)"""
+    def __init__(self, path, header, levels):
+        self.path = path
+        self.header = header
+        self.columns = header["columns"]
+        self.rows = header["rows"]
+        self.levels = levels
+
+    def window(self, start, end, max_points):
+        """
+        Buckets covering [start, end] (log timestamps) at the finest level that needs no more than
+        max_points buckets, or None if the raw rows in the window already fit in max_points.
+
+        Returns:
+            PyramidLevel with only the buckets that overlap the window, or None
+        """
+        base = self.levels[0]
+        first, last = self._span(base.records, start, end)
+        if (last - first) * base.bucket_rows <= max_points:
+            return None
+        for level in self.levels:
+            first, last = self._span(level.records, start, end)
+            if last - first <= max_points:
+                return PyramidLevel(level.bucket_rows, level.records[first:last])
+        return PyramidLevel(level.bucket_rows, level.records[first:last])
+
+    @staticmethod
+    def _span(records, start, end):
+        first = max(0, int(np.searchsorted(records["Timestamp end"], start, side="left")))
+        last = int(np.searchsorted(records["Timestamp"], end, side="right"))
+        return first, max(first, last)
+
+    @staticmethod
+    def envelope(records, column):
+        """(times, values) drawing the min/max envelope of a column: two points per bucket"""
+        middle = (records["Timestamp"] + records["Timestamp end"]) / 2
+        times = np.repeat(middle, 2)
+        values = np.empty(len(times))
+        values[0::2] = records[f"{column} min"]
+        values[1::2] = records[f"{column} max"]
+        return times, values
+
+def open_pyramid(path, log_path=None):
+    """
+    Memory-map a pyramid. Returns None if it does not exist, is unreadable, or (given log_path)
+    was built from a different version of the log.
+    """
+    try:
+        with open(path, "rb") as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                return None
+            length = int.from_bytes(file.read(4), "little")
+            header = json.loads(file.read(length).decode("utf-8"))
+    except (OSError, ValueError):
+        return None
+    if header.get("version") != VERSION:
+        return None
+    if log_path is not None and (not os.path.exists(log_path) or os.path.getsize(log_path) != header["log_size"]):
+        return None
+    dtype = level_dtype(header["columns"])
+    levels = []
+    for level in header["levels"]:
+        if level["count"]:
+            records = np.memmap(path, dtype=dtype, mode="r", offset=level["offset"], shape=(level["count"],))
+        else:
+            records = np.zeros(0, dtype=dtype)
+        levels.append(PyramidLevel(level["bucket_rows"], records))
+    return Pyramid(path, header, levels)
+
+def build_pyramid(log_path, path=None, chunk_size=100000):
+    """Build the pyramid of a log (.csv or .mlog) a chunk at a time. Returns the pyramid path."""
+    builder = None
+    for chunk in iter_chunks(log_path, chunk_size):
+        if builder is None:
+            builder = PyramidBuilder(list(chunk))
+        builder.add(chunk)
+    if builder is None:
+        raise ValueError(f"{log_path} has no data rows")
+    return builder.write(path or pyramid_path(log_path), log_path)
+
+def find_logs(paths):
+    logs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, files in os.walk(path):
+                logs += [os.path.join(directory, file) for file in sorted(files)
+                         if file.endswith((".csv", EXTENSION)) and not file.endswith(REVIEW_EXTENSION)]
+        else:
+            logs.append(path)
+    return logs
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build min/max pyramids for logs that have none (or an outdated one)")
+    parser.add_argument("paths", nargs="+", help="log files or directories (searched recursively)")
+    parser.add_argument("--force", action="store_true", help="rebuild pyramids that are up to date")
+    args = parser.parse_args(argv)
+
+    built = failed = 0
+    start = time.perf_counter()
+    for log_path in find_logs(args.paths):
+        if not args.force and open_pyramid(pyramid_path(log_path), log_path) is not None:
+            continue  # Up to date
+        try:
+            build_pyramid(log_path)
+            built += 1
+        except (OSError, ValueError, KeyError) as e:
+            print(f"{log_path}: {e}")
+            failed += 1
+    print(f"Built {built} pyramids in {time.perf_counter() - start:.1f} s ({failed} failed)")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+import threading
+import time
+import warnings
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Window samples scan() takes medians of at a time (bounds its memory for long windows)
+_SCAN_VALUES = 1 << 20
+
+class RedlineEngine:
+    """
+    Rolling-median redline checks for every sensor in one vectorized pass.
+
+    The recent samples of all channels live in a single numpy ring (rows = samples, columns =
+    sensors). Each channel has its own window length and limit; check() takes the median of
+    every channel's window with one numpy call per distinct window length and compares all of
+    them against their limits at once. Limits normally come from the Limits section of the
+    sequence file (Sequencer.load_data_from_csv calls set_limit / set_window).
+
+    check() reports every channel whose median is over its limit, on every check for as long as
+    it stays over (so the shutdown is asserted again if something reopens a valve), flagging
+    the first report of each crossing so callers can log it once. It also records the decision
+    latency: the time from the sample's acquisition timestamp to the end of the check.
+    """
+    def __init__(self, sensors, default_window=5):
+        self._sensors = list(sensors)
+        self.names = [device.name for device in sensors]
+        self._columns = {name: column for column, name in enumerate(self.names)}
+        self.num_channels = len(self.names)
+        self.default_window = default_window
+        self.limits = np.full(self.num_channels, np.nan)  # nan = no redline
+        self.windows = np.full(self.num_channels, default_window, dtype=np.int64)
+        self._ring = np.full((default_window, self.num_channels), np.nan)
+        self._written = 0  # Total samples pushed
+        self._tripped = np.zeros(self.num_channels, dtype=bool)
+        self._groups = []  # (window length, column indices) for channels with a limit
+        self._lock = threading.Lock()
+        self.last_latency_ns = 0
+        self.max_latency_ns = 0
+
+    def clone(self):
+        """A new engine with the same sensors, limits and windows and no samples (e.g. to check a replayed log)"""
+        engine = RedlineEngine(self._sensors, self.default_window)
+        with self._lock:
+            engine.limits = self.limits.copy()
+            for column, window in enumerate(self.windows):
+                engine._set_window(column, window)
+        engine._rebuild_groups()
+        return engine
+
+    def set_limit(self, name, limit, window=None):
+        """Set the redline for a device (None removes it) and optionally its window length in samples"""
+        with self._lock:
+            column = self._columns[name]
+            self.limits[column] = np.nan if limit is None else float(limit)
+            self._tripped[column] = False
+            if window is not None:
+                self._set_window(column, window)
+            self._rebuild_groups()
+
+    def set_window(self, name, window):
+        """Set the rolling median window length (in samples) for a device"""
+        with self._lock:
+            self._set_window(self._columns[name], window)
+            self._rebuild_groups()
+
+    def clear_limits(self):
+        """Remove every redline (e.g. before loading a new sequence file)"""
+        with self._lock:
+            self.limits[:] = np.nan
+            self._tripped[:] = False
+            self._rebuild_groups()
+
+    def _set_window(self, column, window):
+        window = int(window)
+        if window < 1:
+            raise ValueError(f"Redline window must be at least 1 sample, got {window}")
+        self.windows[column] = window
+        if window > len(self._ring):
+            # Grow the ring, keeping the most recent samples in order
+            recent = self._recent(len(self._ring))
+            self._ring = np.full((window, self.num_channels), np.nan)
+            self._ring[:len(recent)] = recent
+            self._written = len(recent)
+
+    def _rebuild_groups(self):
+        active = ~np.isnan(self.limits)
+        self._groups = []
+        for window in np.unique(self.windows[active]):
+            self._groups.append((int(window), np.flatnonzero(active & (self.windows == window))))
+
+    def _recent(self, count):
+        """The last `count` samples of every channel, oldest first"""
+        count = min(count, self._written, len(self._ring))
+        rows = (self._written - count + np.arange(count)) % len(self._ring)
+        return self._ring[rows]
+
+    def push(self, values):
+        """Add one sample row, or a 2D block of rows, ordered like the sensors"""
+        values = np.asarray(values, dtype=np.float64).reshape(-1, self.num_channels)
+        with self._lock:
+            self._push(values)
+
+    def _push(self, values):
+        capacity = len(self._ring)
+        if len(values) > capacity:
+            self._written += len(values) - capacity
+            values = values[-capacity:]
+        rows = (self._written + np.arange(len(values))) % capacity
+        self._ring[rows] = values
+        self._written += len(values)
+
+    def window(self, name):
+        """Samples currently in a device's window, oldest first"""
+        with self._lock:
+            column = self._columns[name]
+            return self._recent(int(self.windows[column]))[:, column].tolist()
+
+    def check(self, timestamp_ns=None):
+        """
+        Compare every channel's rolling median against its limit.
+
+        Returns:
+            list: (name, window samples, new) for each channel over its redline - new is True
+            on the first check of a crossing, False while it stays over
+        """
+        tripped = []
+        with self._lock:
+            if self._groups and self._written:
+                over = np.zeros(self.num_channels, dtype=bool)
+                with warnings.catch_warnings():
+                    # Windows that only hold NaN (failed reads) have no median and never trip
+                    warnings.simplefilter("ignore", RuntimeWarning)
+                    for window, columns in self._groups:
+                        medians = np.nanmedian(self._recent(window)[:, columns], axis=0)
+                        over[columns] = medians > self.limits[columns]
+                for column in np.flatnonzero(over):
+                    tripped.append((self.names[column], self._recent(int(self.windows[column]))[:, column].tolist(),
+                                    not self._tripped[column]))
+                self._tripped = over
+
+        if timestamp_ns is not None:
+            self.last_latency_ns = time.perf_counter_ns() - timestamp_ns
+            self.max_latency_ns = max(self.max_latency_ns, self.last_latency_ns)
+        return tripped
+
+    def scan(self, values):
+        """
+        Push a block of rows, checking after every row - the same crossings as push() and check()
+        one row at a time, computed in one pass (used to replay logs faster than real time).
+
+        Returns:
+            list: (row in the block, name, window samples) for each crossing that starts in the block
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(-1, self.num_channels)
+        crossings = []
+        with self._lock:
+            over = np.zeros((len(values), self.num_channels), dtype=bool)
+            padding = {}
+            for window, columns in self._groups:
+                # The previous window - 1 samples, NaN-padded (ignored by nanmedian) before there are enough
+                recent = self._recent(window - 1)[:, columns]
+                padding[window] = window - 1 - len(recent)
+                history = np.full((window - 1, len(columns)), np.nan)
+                history[padding[window]:] = recent
+                data = np.concatenate((history, values[:, columns]))
+                step = max(1, _SCAN_VALUES // (window * len(columns)))
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", RuntimeWarning)
+                    for first in range(0, len(values), step):
+                        windows = sliding_window_view(data[first:first + step + window - 1], window, axis=0)
+                        over[first:first + step, columns] = np.nanmedian(windows, axis=2) > self.limits[columns]
+                for row, column in zip(*np.nonzero(over[:, columns] & ~np.vstack((self._tripped[columns], over[:-1, columns])))):
+                    samples = data[max(row, padding[window]):row + window, column].tolist()
+                    crossings.append((int(row), self.names[columns[column]], samples))
+            if len(values):
+                self._tripped = over[-1].copy()
+            self._push(values)
+        crossings.sort(key=lambda crossing: crossing[0])
+        return crossings
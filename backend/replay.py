@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+import numpy as np
+from PyQt5.QtCore import QObject, pyqtSignal
+from backend.log_format import format_timestamp, iter_chunks
+from backend.event_log import get_logger
+
+log = get_logger("replay")
+
+class LogReplay(QObject):
+    """
+    Plays a recorded log (.csv or .mlog) back beside live acquisition, never through it.
+
+    A background thread reads the log a chunk at a time (memory-mapped for .mlog, so file size
+    does not matter), paces the rows by their recorded timestamps and feeds the logged readings
+    straight into its own RedlineEngine - a clone of the live one, so the same limits and
+    windows - checked as if after every row (RedlineEngine.scan). The live sampler, data logger
+    and sequence conditions are never touched: a replay cannot write into the live log, drive a
+    running sequence or stand in the way of a real redline shutdown.
+
+    Rows are published at display rate through rows_ready (recorded times in ns, values in
+    sensors() order) for the graphs and labels. speed is a multiple of real time (1 = as
+    recorded, 10 = ten times faster); None replays as fast as the rows can be checked, which
+    measures redline throughput on real signal shapes.
+
+    Sensors that are not in the log replay as NaN. Redline trips are recorded in `trips` with
+    the recorded time at which they would have happened.
+    """
+    rows_ready = pyqtSignal(object, object)  # Recorded timestamps (int64 ns), values (rows x sensors)
+    done = pyqtSignal()  # The replay thread has exited (finished, stopped or failed)
+
+    def __init__(self, sensors, redlines, path, speed=1.0, chunk_size=10000, block_rows=2000, display_interval_ms=33):
+        super().__init__()
+        self.sensors = list(sensors)
+        self.live_redlines = redlines
+        self.redlines = None
+        self.path = path
+        self.speed = speed
+        self.chunk_size = chunk_size
+        self.block_rows = block_rows  # Rows checked at a time at max speed (keeps stop() and the display responsive)
+        self.display_interval = display_interval_ms / 1000
+        self.running = False
+        self.finished = False
+        self.error = None
+        self.thread = None
+        self.trips = []  # (recorded time, device name, window samples)
+        self.rows_replayed = 0
+        self.elapsed = 0.0
+        self._pending = []  # (timestamps, values) blocks since the last rows_ready
+        self._last_publish = 0.0
+        self._stop = threading.Event()
+
+    def start(self):
+        """Start replaying on a background thread"""
+        if self.running:
+            log.warning("Replay already running")
+            return
+        # Limits as they are now; later changes to the live engine do not affect the replay
+        self.redlines = self.live_redlines.clone()
+        self._columns = None  # Resolved against the log's columns on the first chunk
+        self.rows_replayed = 0
+        self.trips = []
+        self.error = None
+        self.finished = False
+        self._pending = []
+        self._stop.clear()
+        self.running = True
+        self.thread = threading.Thread(target=self._replay_loop)
+        self.thread.daemon = True  # Never keep the application alive on its own
+        self.thread.start()
+        log.info("Replaying %s at %s", os.path.basename(self.path), self.speed_text())
+
+    def stop(self):
+        """Stop replaying and wait for the replay thread to exit"""
+        self._stop.set()
+        if self.thread is not None and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+        self.running = False
+
+    @staticmethod
+    def _log_column(device, columns):
+        """Log column holding a sensor's reading (e.g. "PT-FU-01 Pressure"), or None if it was not logged"""
+        for quantity in ("Pressure", "Temperature", "Load"):
+            if hasattr(device, quantity.lower()) and f"{device.name} {quantity}" in columns:
+                return f"{device.name} {quantity}"
+        # Older logs labelled every sensor column "Pressure" - match on the device name alone
+        for column in columns:
+            if column.rsplit(" ", 1)[0] == device.name and not column.endswith(" State"):
+                return column
+        return None
+
+    def _replay_loop(self):
+        start_wall = time.perf_counter()
+        first_time = None
+        try:
+            for chunk in iter_chunks(self.path, self.chunk_size):
+                timestamps = chunk["Timestamp"]
+                if len(timestamps) == 0:
+                    continue
+                if first_time is None:
+                    first_time = timestamps[0]
+                    self._columns = [self._log_column(device, chunk) for device in self.sensors]
+                missing = np.full(len(timestamps), np.nan)
+                values = np.column_stack([missing if column is None else chunk[column] for column in self._columns])
+                done = 0
+                while done < len(timestamps):
+                    if self._stop.is_set():
+                        return
+                    if self.speed:
+                        # Check every row that is due by now, then sleep until the next one
+                        due = first_time + (time.perf_counter() - start_wall) * self.speed
+                        end = max(done, int(np.searchsorted(timestamps, due, side="right")))
+                        if end == done:
+                            wait = (timestamps[done] - due) / self.speed
+                            self._stop.wait(min(wait, 0.01))
+                            continue
+                    else:
+                        end = min(len(timestamps), done + self.block_rows)
+                    self._replay_block(timestamps[done:end], values[done:end])
+                    done = end
+            self.finished = True
+        except Exception as e:
+            log.error("Replay of %s failed: %s", self.path, e)
+            self.error = e
+        finally:
+            self._publish()
+            self.elapsed = time.perf_counter() - start_wall
+            self.running = False
+            if self.finished:
+                log.info("Replay finished: %d rows in %.2f s (%.0f rows/s), %d redline trips", self.rows_replayed,
+                         self.elapsed, self.rows_replayed / max(self.elapsed, 1e-9), len(self.trips))
+            self.done.emit()
+
+    def _replay_block(self, timestamps, values):
+        for row, name, window in self.redlines.scan(values):
+            recorded = float(timestamps[row])
+            self.trips.append((recorded, name, window))
+            log.warning("Replay: %s would have tripped its redline at %s", name, format_timestamp(recorded))
+        self.rows_replayed += len(timestamps)
+        self._pending.append((timestamps, values))
+        if time.perf_counter() - self._last_publish >= self.display_interval:
+            self._publish()
+
+    def _publish(self):
+        """Send the rows replayed since the last call to the GUI"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        timestamps = np.concatenate([block[0] for block in pending])
+        values = np.concatenate([block[1] for block in pending])
+        self._last_publish = time.perf_counter()
+        self.rows_ready.emit(np.round(timestamps * 1e9).astype(np.int64), values)
+
+    def speed_text(self):
+        return "max speed" if not self.speed else f"{self.speed:g}x"
+
+    def status_text(self):
+        """One-line summary for the GUI"""
+        state = "Replay" if self.running else "Replay done" if self.finished else "Replay stopped"
+        return f"{state} ({self.speed_text()}): {self.rows_replayed} rows, {len(self.trips)} trips"
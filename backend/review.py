@@ -0,0 +1,145 @@
+"""
+Read-only access to a recorded log for reviewing it in the GUI (see Interface/review_mode.py).
+
+A .mlog is memory-mapped as it is. A .csv is converted once to a cached binary log next to it,
+<log>.review.mlog, which is reused until the CSV changes. Nothing is read up front: looking up
+the row at a time is a binary search over the mapped timestamps, and traces come from the
+log's min/max pyramid (backend/pyramid.py, built on first open if the log has none) until the
+visible window is small enough to read the raw rows, so opening and scrubbing cost the same
+for a 1 MB or a 500 MB log.
+"""
+import bisect
+import os
+from datetime import datetime
+import numpy as np
+from backend.log_format import EXTENSION, REVIEW_EXTENSION, BinaryLogWriter, iter_chunks, open_log, read_header, record_dtype
+from backend.pyramid import Pyramid, PyramidBuilder, PyramidLevel, open_pyramid, pyramid_path
+from backend.event_log import get_logger
+
+log = get_logger("review")
+
+def review_cache_path(path):
+    """Cached binary conversion of a CSV log: <log>.review.mlog"""
+    return os.path.splitext(path)[0] + REVIEW_EXTENSION
+
+def sensor_column(name, columns):
+    """Log column holding a sensor's reading (e.g. "PT-FU-01 Pressure"), or None if it was not logged"""
+    for column in columns:
+        if column.rsplit(" ", 1)[0] == name and not column.endswith(" State"):
+            return column
+    return None
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return {"file": os.path.basename(path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+def convert_csv(path, cache_path=None, chunk_size=100000):
+    """
+    Convert a CSV log to a binary log, a chunk at a time. The header records the CSV's size and
+    mtime (converted_from) so a stale conversion is detected. Returns the binary log path.
+    """
+    cache_path = cache_path or review_cache_path(path)
+    temporary = cache_path + ".tmp"
+    header = writer = None
+    try:
+        for chunk in iter_chunks(path, chunk_size):
+            if writer is None:
+                columns = [column for column in chunk if column != "Timestamp"]
+                header = {
+                    "created": datetime.now().isoformat(),
+                    "converted_from": _source_stamp(path),
+                    "channels": [{"column": column, "device": column.rsplit(" ", 1)[0]}
+                                 for column in columns if not column.endswith(" State")],
+                    "valves": [{"column": column, "device": column.rsplit(" ", 1)[0]}
+                               for column in columns if column.endswith(" State")],
+                }
+                BinaryLogWriter.create(temporary, header)
+                writer = BinaryLogWriter(temporary, header)
+            records = np.zeros(len(chunk["Timestamp"]), dtype=record_dtype(header))
+            for name in records.dtype.names:
+                records[name] = chunk[name]
+            writer.write_block(records)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise ValueError(f"{path} has no data rows")
+    os.replace(temporary, cache_path)
+    return cache_path
+
+def _cached_conversion(path):
+    """Binary conversion of a CSV log, converting it first if there is no up-to-date one"""
+    cache_path = review_cache_path(path)
+    try:
+        with open(cache_path, "rb") as file:
+            header, _ = read_header(file)
+        if header.get("converted_from") == _source_stamp(path):
+            return cache_path
+    except (OSError, ValueError):
+        pass
+    log.info("Converting %s for review", os.path.basename(path))
+    return convert_csv(path, cache_path)
+
+def _log_pyramid(path, records, chunk_size=100000):
+    """The log's pyramid, built from the mapped records (and saved next to the log) if it has none"""
+    pyramid = open_pyramid(pyramid_path(path), path)
+    if pyramid is not None:
+        return pyramid
+    log.info("Building pyramid for %s", os.path.basename(path))
+    builder = PyramidBuilder(records.dtype.names)
+    for start in range(0, len(records), chunk_size):
+        builder.add(records[start:start + chunk_size])
+    try:
+        return open_pyramid(builder.write(pyramid_path(path), path), path)
+    except OSError as e:
+        # Read-only archive - keep it in memory for this review
+        log.warning("Could not save pyramid for %s: %s", path, e)
+        levels = [PyramidLevel(bucket_rows, level) for bucket_rows, level in builder.levels()]
+        return Pyramid(None, {"columns": builder.columns, "rows": builder.rows}, levels)
+
+class ReviewLog:
+    """A memory-mapped log with its pyramid. Times are seconds since the epoch, like the log."""
+    def __init__(self, path, header, records, pyramid):
+        self.path = path
+        self.header = header
+        self.records = records
+        self.pyramid = pyramid
+        self.columns = records.dtype.names[1:]
+        self.times = records["Timestamp"]  # Mapped view - never copied whole
+        self.start = float(self.times[0])
+        self.end = float(self.times[-1])
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    def index_at(self, timestamp):
+        """Index of the last row at or before `timestamp` (the first row before the log starts)"""
+        return max(0, bisect.bisect_right(self.times, timestamp) - 1)
+
+    def row_at(self, timestamp):
+        """The record in effect at `timestamp`"""
+        return self.records[self.index_at(timestamp)]
+
+    def trace(self, column, start, end, max_points):
+        """
+        (times, values) of a column between start and end with no more than about 2 * max_points
+        points: the raw rows if there are few enough, otherwise the min/max envelope of the
+        finest pyramid level that fits.
+        """
+        level = self.pyramid.window(start, end, max_points)
+        if level is not None:
+            return Pyramid.envelope(level.records, column)
+        # One row either side so the line runs to the edges of the window
+        first = max(0, bisect.bisect_left(self.times, start) - 1)
+        last = min(len(self.records), bisect.bisect_right(self.times, end) + 1)
+        rows = self.records[first:last]
+        return np.asarray(rows["Timestamp"]), np.asarray(rows[column], dtype=np.float64)
+
+def open_review(path):
+    """Open a log (.mlog or .csv) for review. Raises ValueError if it has no rows."""
+    mapped = _cached_conversion(path) if not path.endswith(EXTENSION) else path
+    header, records = open_log(mapped)
+    if len(records) == 0:
+        raise ValueError(f"{path} has no data rows")
+    return ReviewLog(path, header, records, _log_pyramid(path, records))
@@ -0,0 +1,69 @@
+import threading
+import numpy as np
+
+class RingBuffer:
+    """
+    Fixed-size, thread-safe ring of samples (one row per scan, one column per channel).
+
+    The writer appends whole blocks with write(). Every reader keeps its own cursor (the
+    total sample count it has already consumed) and calls read_since(cursor), so the GUI and
+    the data logger can drain the same buffer independently. A reader that falls more than
+    `capacity` samples behind loses the oldest samples; the number lost is reported.
+    """
+    def __init__(self, capacity, num_channels, dtype=np.float64):
+        self.capacity = int(capacity)
+        self.num_channels = num_channels
+        self._data = np.full((self.capacity, num_channels), np.nan, dtype=dtype)
+        self._lock = threading.Lock()
+        self.total_written = 0  # Total number of samples ever written
+
+    def write(self, block):
+        """Append a 2D block of samples (rows = scans)"""
+        block = np.asarray(block, dtype=self._data.dtype).reshape(-1, self.num_channels)
+        count = len(block)
+        if count == 0:
+            return
+        with self._lock:
+            # Anything older than one full buffer would be overwritten anyway
+            if count > self.capacity:
+                skipped = count - self.capacity
+                block = block[skipped:]
+                self.total_written += skipped
+                count = self.capacity
+            start = self.total_written % self.capacity
+            first = min(count, self.capacity - start)
+            self._data[start:start + first] = block[:first]
+            if first < count:
+                self._data[:count - first] = block[first:]
+            self.total_written += count
+
+    def read_since(self, cursor):
+        """
+        Copy out every sample written after `cursor`.
+
+        Returns:
+            tuple: (block, first_index, new_cursor, lost)
+            - block: 2D array of the new samples, oldest first
+            - first_index: sample index of block[0]
+            - new_cursor: cursor to pass on the next call
+            - lost: samples that were overwritten before this reader got to them
+        """
+        with self._lock:
+            end = self.total_written
+            start = max(cursor, end - self.capacity)
+            count = end - start
+            block = np.empty((count, self.num_channels), dtype=self._data.dtype)
+            if count:
+                offset = start % self.capacity
+                first = min(count, self.capacity - offset)
+                block[:first] = self._data[offset:offset + first]
+                if first < count:
+                    block[first:] = self._data[:count - first]
+        return block, start, end, start - cursor
+
+    def latest(self):
+        """Return a copy of the most recent sample, or None if nothing has been written"""
+        with self._lock:
+            if self.total_written == 0:
+                return None
+            return self._data[(self.total_written - 1) % self.capacity].copy()
@@ -0,0 +1,198 @@
+import threading
+import time
+from PyQt5.QtCore import QObject, pyqtSignal
+from backend.telemetry import telemetry
+from backend.event_log import get_logger
+
+log = get_logger("sampler")
+
+class Sampler(QObject):
+    """
+    Dedicated acquisition thread, independent of the Qt event loop.
+
+    Every tick the sampler reads all sensors (polled or from the stream ring buffer), runs the
+    conversions, checks redlines and queues the row for the data logger. It never touches a
+    widget: the GUI receives a snapshot through snapshot_ready at display rate, and redline
+    trips through redline_exceeded, both delivered as queued signals on the GUI thread. A slow
+    replot or a modal dialog therefore no longer delays acquisition or redline checking.
+
+    Sample times are taken with time.perf_counter_ns and converted to wall-clock time (for the
+    log files) from a single anchor taken at construction.
+    """
+    snapshot_ready = pyqtSignal(object)
+    redline_exceeded = pyqtSignal(str, list, bool)  # Name, window samples, new crossing
+
+    def __init__(self, labjack, acquisition, stream, data_logger, redlines, interval_ms=500, display_interval_ms=33, conditions=None):
+        super().__init__()
+        self.labjack = labjack
+        self.acquisition = acquisition
+        self.stream = stream
+        self.data_logger = data_logger
+        self.redlines = redlines
+        self.conditions = conditions  # Optional ConditionEngine fed with every sample (sequence waits and aborts)
+        self.interval_ms = interval_ms
+        self.display_interval_ms = display_interval_ms
+        self.running = False
+        self.thread = None
+        self._wake = threading.Event()
+        self._stream_cursor = 0
+        self._stream_buffer = None
+        self._pending_rows = []   # (timestamp_ns, [value per sensor]) since the last snapshot
+        self._warned_disconnected = False
+        self.tick_count = 0
+        self.late_ticks = 0
+
+        # Anchor used to turn perf_counter_ns timestamps into wall-clock time for the log files
+        self._anchor_ns = time.perf_counter_ns()
+        self._anchor_wall = time.time()
+
+    def wall_time(self, timestamp_ns):
+        """Convert a perf_counter_ns timestamp to seconds since the epoch"""
+        return self._anchor_wall + (timestamp_ns - self._anchor_ns) / 1e9
+
+    def set_interval(self, interval_ms):
+        """Change the sampling interval; takes effect immediately"""
+        self.interval_ms = interval_ms
+        self._wake.set()
+
+    def start(self):
+        """Start the sampler thread"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True  # Never keep the application alive on its own
+        self.thread.start()
+
+    def stop(self):
+        """Stop the sampler thread and wait for it to exit"""
+        self.running = False
+        self._wake.set()
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join()
+        self.thread = None
+        # Log whatever a stopped stream still had buffered
+        if self._stream_unread():
+            self.read_stream()
+
+    def _run(self):
+        """Sampler thread: tick on absolute deadlines and publish snapshots at display rate"""
+        next_tick = time.perf_counter_ns()
+        next_publish = next_tick
+        interval_ms = self.interval_ms
+        while self.running:
+            now = time.perf_counter_ns()
+            if self.interval_ms != interval_ms:
+                # Interval changed - restart the schedule from now
+                interval_ms = self.interval_ms
+                next_tick = now
+
+            if now >= next_tick:
+                try:
+                    self.update_data()
+                except Exception as e:
+                    log.error("Sampler tick failed: %s", e)
+                self.tick_count += 1
+                next_tick += interval_ms * 1_000_000
+                now = time.perf_counter_ns()
+                if now > next_tick:
+                    # Fell a whole interval behind - skip rather than burst to catch up
+                    self.late_ticks += 1
+                    telemetry.count("sampler.late_ticks")
+                    next_tick = now
+
+            if now >= next_publish:
+                self.publish()
+                next_publish = now + self.display_interval_ms * 1_000_000
+
+            wait_ns = min(next_tick, next_publish) - time.perf_counter_ns()
+            if wait_ns > 0:
+                self._wake.wait(wait_ns / 1e9)
+                self._wake.clear()
+
+    # Function for each data read. Reads data from all devices in one transaction and pushes it into the redline
+    # engine's rolling windows. If the median of a window exceeds the redline value, the GUI is told to run the
+    # shutdown sequence.
+    # Then, write all the data into the data logger
+    def update_data(self):
+        """Acquire, convert, redline-check and log one tick of data"""
+        timestamp_ns = time.perf_counter_ns()
+        if self.stream.running or self._stream_unread():
+            # Stream mode - the device clocks the scans, we just drain what arrived since last tick
+            # (including whatever was still buffered when the stream stopped)
+            if not self.read_stream():
+                return
+            row = [device.value for device in self.acquisition.sensors()]
+            read_ns = time.perf_counter_ns()
+        else:
+            if not self.labjack.connection_status or self.labjack.handle is None:
+                if not self._warned_disconnected:
+                    log.warning("Cannot update data reading - LabJack not connected")
+                    self._warned_disconnected = True
+                return
+            self._warned_disconnected = False
+
+            # Read every sensor in a single LabJack transaction
+            self.acquisition.read(self.labjack)
+            read_ns = time.perf_counter_ns()
+            telemetry.record("sampler.read", read_ns - timestamp_ns)
+            self.data_logger.log_data(self.wall_time(timestamp_ns))
+            row = [device.value for device in self.acquisition.sensors()]
+            self.redlines.push(row)
+            if self.conditions is not None:
+                self.conditions.evaluate((self.wall_time(timestamp_ns),), (row,))
+            telemetry.count("sampler.rows")
+
+        # Emitted on every tick while a device is over its redline, so the shutdown is re-asserted
+        for name, window, new in self.redlines.check(timestamp_ns):
+            if new and self.conditions is not None:
+                # Abort a running sequence from here rather than waiting for the GUI thread
+                self.conditions.redline_tripped(name)
+            self.redline_exceeded.emit(name, window, new)
+        self._pending_rows.append((timestamp_ns, row))
+        done_ns = time.perf_counter_ns()
+        telemetry.record("sampler.redline", done_ns - read_ns)
+        telemetry.record("sampler.tick", done_ns - timestamp_ns)
+
+    def _stream_unread(self):
+        """True if the stream we were reading has stopped with scans we have not read yet"""
+        buffer = self._stream_buffer
+        return buffer is not None and buffer is self.stream.buffer and self._stream_cursor < buffer.total_written
+
+    def read_stream(self):
+        """Drain new scans from the stream ring buffer: log every scan and keep the latest one for display"""
+        if self.stream.buffer is not self._stream_buffer:
+            # New stream started - start reading its buffer from the beginning
+            self._stream_buffer = self.stream.buffer
+            self._stream_cursor = 0
+        start_ns = time.perf_counter_ns()
+        block, first_index, self._stream_cursor, lost = self._stream_buffer.read_since(self._stream_cursor)
+        if lost:
+            telemetry.count("stream.lost_scans", lost)
+            log.warning("Sampler fell behind the stream - %d scans were overwritten before logging", lost)
+        if len(block) == 0:
+            return False
+        self.acquisition.distribute(block[-1])
+        values = self.acquisition.convert_block(block)
+        times = self.stream.sample_times(first_index, len(block))
+        self.data_logger.log_block(times, values)
+        # Every scan goes through the redline windows (and sequence conditions), not just the one displayed
+        self.redlines.push(values)
+        if self.conditions is not None:
+            self.conditions.evaluate(times, values)
+        telemetry.record("sampler.read", time.perf_counter_ns() - start_ns)
+        telemetry.count("sampler.rows", len(block))
+        return True
+
+    def publish(self):
+        """Send the rows collected since the last snapshot to the GUI"""
+        if not self._pending_rows:
+            return
+        rows, self._pending_rows = self._pending_rows, []
+        self.snapshot_ready.emit({
+            "timestamp_ns": rows[-1][0],
+            "rows": rows,
+            "stream_status": self.stream.status_text(),
+            "late_ticks": self.late_ticks,
+            "redline_latency_ns": self.redlines.last_latency_ns,
+        })
@@ -0,0 +1,281 @@
+import collections
+import random
+import re
+import threading
+import time
+import numpy as np
+from backend.stream_acquisition import SKIPPED_SAMPLE
+
+# First DIO number of each T7 digital port
+DIO_PORTS = {"FIO": 0, "EIO": 8, "CIO": 16, "MIO": 20}
+NUM_DIO = 23
+
+class LJMError(Exception):
+    """Raised by the simulator wherever the real library would raise ljm.LJMError"""
+    def __init__(self, errorString=""):
+        super().__init__(errorString)
+        self.errorString = errorString
+
+def replayed_signal(voltages, rate):
+    """Signal function that plays back recorded voltages at `rate` samples/s, looping at the end"""
+    voltages = np.asarray(voltages, dtype=np.float64)
+    def signal(t):
+        return voltages[(np.asarray(t) * rate).astype(np.int64) % len(voltages)]
+    return signal
+
+class SimulatedLJM:
+    """
+    A simulated LabJack T7 exposing the subset of the ljm API the application uses.
+
+    AIN registers return a signal evaluated at the time of the read: by default a per-channel
+    offset with a slow sine and some noise, or whatever set_signal / replay installs (any
+    function of time in seconds that accepts numpy arrays). Digital lines (FIO/EIO/CIO/MIO,
+    DIO#, DIO_STATE, DIO_DIRECTION, DIO_INHIBIT) are emulated bit for bit and every write is
+    kept in `write_log`. Stream mode produces scans on the simulated device clock.
+
+    Every command sleeps `latency_ms` (plus up to `jitter_ms`) to model the USB/Ethernet round
+    trip. Faults can be injected with fault_rate (random command failures), fail_next() and
+    disconnect() / reconnect().
+    """
+    LJMError = LJMError
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, fault_rate=0.0, noise=0.002, skip_rate=0.0, seed=None, serial=470012345):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.fault_rate = fault_rate
+        self.noise = noise
+        self.skip_rate = skip_rate  # Fraction of stream scans reported as skipped
+        self.serial = serial
+        self.connected = True
+        self._fail_next = 0
+        self._random = random.Random(seed)
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self._handles = set()
+        self._next_handle = 1
+        self._signals = {}
+        self.registers = {}  # Anything written that is not a digital line
+        self.dio_state = 0
+        self.dio_direction = 0
+        self.dio_inhibit = 0
+        self.write_log = collections.deque(maxlen=10000)  # (perf_counter_ns, name, value)
+        self.commands = 0
+        self._addresses = {}  # Stream address -> register name
+        self._stream = None
+
+    # ---- Simulation controls ----
+
+    def set_signal(self, name, signal):
+        """Serve `signal(t)` (t in seconds, scalar or numpy array) on an analog register"""
+        self._signals[name] = signal
+
+    def replay(self, name, voltages, rate):
+        """Serve recorded voltages on an analog register at `rate` samples/s"""
+        self._signals[name] = replayed_signal(voltages, rate)
+
+    def fail_next(self, count=1):
+        """Make the next `count` commands raise"""
+        self._fail_next += count
+
+    def disconnect(self):
+        """Simulate a dropped link: every command and openS fails until reconnect()"""
+        self.connected = False
+
+    def reconnect(self):
+        self.connected = True
+
+    # ---- Internals ----
+
+    def _command(self, handle=None):
+        """Common work for every command: latency and injected faults"""
+        delay = self.latency_ms + self._random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        self.commands += 1
+        if not self.connected:
+            raise LJMError("LJME_RECONNECT_FAILED: simulated device disconnected")
+        if handle is not None and handle not in self._handles:
+            raise LJMError("LJME_INVALID_HANDLE")
+        if self._fail_next > 0:
+            self._fail_next -= 1
+            raise LJMError("LJME_INJECTED_FAULT: fail_next")
+        if self.fault_rate and self._random.random() < self.fault_rate:
+            raise LJMError("LJME_INJECTED_FAULT: fault_rate")
+
+    def _now(self):
+        return time.perf_counter() - self._t0
+
+    def _default_signal(self, name):
+        number = int(name[3:]) if name[3:].isdigit() else 0
+        offset = 0.5 + 0.01 * (number % 50)
+        def signal(t):
+            return offset + 0.05 * np.sin(2 * np.pi * 0.2 * np.asarray(t) + number)
+        return signal
+
+    def _analog(self, name, t):
+        signal = self._signals.get(name)
+        if signal is None:
+            signal = self._signals[name] = self._default_signal(name)
+        values = np.asarray(signal(t), dtype=np.float64)
+        if self.noise:
+            values = values + self._rng.normal(0, self.noise, values.shape)
+        return values
+
+    @staticmethod
+    def _dio_number(name):
+        match = re.fullmatch(r"(FIO|EIO|CIO|MIO)(\d+)", name)
+        if match is not None:
+            return DIO_PORTS[match.group(1)] + int(match.group(2))
+        match = re.fullmatch(r"DIO(\d+)", name)
+        if match is not None:
+            return int(match.group(1))
+        return None
+
+    @staticmethod
+    def _check_name(name):
+        if not isinstance(name, str) or not re.fullmatch(r"[A-Z][A-Z0-9_#]*", name):
+            raise LJMError(f"LJME_INVALID_NAME: {name!r}")
+
+    def _read(self, name):
+        self._check_name(name)
+        if name == "SERIAL_NUMBER":
+            return float(self.serial)
+        if name.startswith("AIN") and name[3:].isdigit():
+            return float(self._analog(name, self._now()))
+        dio = self._dio_number(name)
+        if dio is not None:
+            return float((self.dio_state >> dio) & 1)
+        if name == "DIO_STATE":
+            return float(self.dio_state)
+        if name == "DIO_DIRECTION":
+            return float(self.dio_direction)
+        if name == "DIO_INHIBIT":
+            return float(self.dio_inhibit)
+        return float(self.registers.get(name, 0.0))
+
+    def _write(self, name, value):
+        self._check_name(name)
+        all_lines = (1 << NUM_DIO) - 1
+        dio = self._dio_number(name)
+        if dio is not None:
+            self.dio_direction |= 1 << dio
+            if value:
+                self.dio_state |= 1 << dio
+            else:
+                self.dio_state &= ~(1 << dio)
+        elif name == "DIO_INHIBIT":
+            self.dio_inhibit = int(value) & all_lines
+        elif name in ("DIO_STATE", "DIO_DIRECTION"):
+            writable = ~self.dio_inhibit & all_lines
+            current = self.dio_state if name == "DIO_STATE" else self.dio_direction
+            current = (current & ~writable) | (int(value) & writable)
+            if name == "DIO_STATE":
+                self.dio_state = current
+            else:
+                self.dio_direction = current
+        else:
+            self.registers[name] = value
+        self.write_log.append((time.perf_counter_ns(), name, value))
+
+    # ---- ljm API ----
+
+    def openS(self, deviceType="ANY", connectionType="ANY", identifier="ANY"):
+        self._command()
+        with self._lock:
+            handle = self._next_handle
+            self._next_handle += 1
+            self._handles.add(handle)
+        return handle
+
+    def close(self, handle):
+        with self._lock:
+            if self._stream is not None and self._stream["handle"] == handle:
+                self._stream = None
+            self._handles.discard(handle)
+
+    def writeLibraryConfigS(self, parameter, value):
+        pass
+
+    def eReadName(self, handle, name):
+        self._command(handle)
+        with self._lock:
+            return self._read(name)
+
+    def eReadNames(self, handle, numFrames, aNames):
+        self._command(handle)
+        with self._lock:
+            return [self._read(name) for name in aNames[:numFrames]]
+
+    def eWriteName(self, handle, name, value):
+        self._command(handle)
+        with self._lock:
+            self._write(name, value)
+
+    def eWriteNames(self, handle, numFrames, aNames, aValues):
+        self._command(handle)
+        with self._lock:
+            for name, value in zip(aNames[:numFrames], aValues[:numFrames]):
+                self._write(name, value)
+
+    def namesToAddresses(self, numFrames, names):
+        addresses = []
+        types = []
+        for name in names[:numFrames]:
+            self._check_name(name)
+            if name.startswith("AIN") and name[3:].isdigit():
+                address = 2 * int(name[3:])
+            else:
+                address = 60000 + len(self._addresses)  # Arbitrary, but unique per name
+            self._addresses[address] = name
+            addresses.append(address)
+            types.append(3)  # FLOAT32
+        return addresses, types
+
+    def eStreamStart(self, handle, scansPerRead, numAddresses, aScanList, scanRate):
+        self._command(handle)
+        with self._lock:
+            if self._stream is not None:
+                raise LJMError("STREAM_IS_ACTIVE")
+            self._stream = {
+                "handle": handle,
+                "names": [self._addresses.get(address, f"AIN{address // 2}") for address in aScanList[:numAddresses]],
+                "scans_per_read": int(scansPerRead),
+                "rate": float(scanRate),
+                "start": self._now(),
+                "scans_read": 0,
+            }
+        return float(scanRate)
+
+    def eStreamRead(self, handle):
+        """Block until the next scansPerRead scans are due on the device clock and return them interleaved"""
+        stream = self._stream
+        if stream is None or stream["handle"] != handle:
+            raise LJMError("LJME_NO_STREAM_RUNNING")
+        first = stream["scans_read"]
+        count = stream["scans_per_read"]
+        due = stream["start"] + (first + count) / stream["rate"]
+        wait = due - self._now()
+        if wait > 0:
+            time.sleep(wait)
+        self._command(handle)
+        times = stream["start"] + (first + np.arange(count)) / stream["rate"]
+        block = np.empty((count, len(stream["names"])))
+        with self._lock:
+            for column, name in enumerate(stream["names"]):
+                if name.startswith("AIN"):
+                    block[:, column] = self._analog(name, times)
+                else:
+                    block[:, column] = self._read(name)
+        if self.skip_rate:
+            block[self._rng.random(count) < self.skip_rate] = SKIPPED_SAMPLE
+        stream["scans_read"] = first + count
+        # Scans the device has already taken but we have not read yet
+        device_backlog = max(0, int((self._now() - stream["start"]) * stream["rate"]) - stream["scans_read"])
+        return block.ravel().tolist(), device_backlog * len(stream["names"]), 0
+
+    def eStreamStop(self, handle):
+        with self._lock:
+            if self._stream is None or self._stream["handle"] != handle:
+                raise LJMError("LJME_NO_STREAM_RUNNING")
+            self._stream = None
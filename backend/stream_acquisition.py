@@ -0,0 +1,146 @@
+import threading
+import time
+import numpy as np
+from backend.ljm_backend import ljm
+from backend.ring_buffer import RingBuffer
+from backend.event_log import get_logger
+
+log = get_logger("stream")
+
+# Value LJM inserts for scans it had to skip while recovering from a device buffer overflow
+SKIPPED_SAMPLE = -9999.0
+
+class StreamAcquisition:
+    """
+    Hardware-timed acquisition using LabJack stream mode (ljm.eStreamStart/eStreamRead).
+
+    The T7 clocks every scan itself, so samples are evenly spaced at the requested scan rate
+    instead of following the jitter of the Qt timer. A background thread pulls scans off the
+    device and writes the raw voltages into a RingBuffer that the GUI and DataLogger drain
+    with their own cursors. The channel list is the same one BatchedAcquisition builds from
+    the device objects, so BatchedAcquisition.convert_block turns a block of scans into
+    engineering units.
+    """
+    MIN_SCAN_RATE = 1000     # Hz
+    MAX_SCAN_RATE = 10000    # Hz
+    MAX_SAMPLE_RATE = 100000 # T7 aggregate stream limit in samples/s across all channels
+
+    def __init__(self, acquisition, scan_rate=5000, buffer_seconds=10):
+        self.acquisition = acquisition
+        self.scan_rate = None
+        self.set_scan_rate(scan_rate)
+        self.buffer_seconds = buffer_seconds
+        self.buffer = None
+        self.handle = None
+        self.running = False
+        self.thread = None
+        self.start_time = None  # time.time() of the first scan
+        self.error = None
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.total_scans = 0
+        self.skipped_scans = 0
+        self.device_backlog = 0
+        self.ljm_backlog = 0
+        self.max_device_backlog = 0
+        self.max_ljm_backlog = 0
+
+    def set_scan_rate(self, scan_rate):
+        """Set the scan rate in Hz (applies on the next start)"""
+        if not self.MIN_SCAN_RATE <= scan_rate <= self.MAX_SCAN_RATE:
+            raise ValueError(f"Scan rate must be between {self.MIN_SCAN_RATE} and {self.MAX_SCAN_RATE} Hz, got {scan_rate}")
+        self.scan_rate = scan_rate
+
+    def start(self, labjack):
+        """Configure and start streaming all device channels on the shared LabJack connection"""
+        if self.running:
+            log.warning("Stream already running")
+            return
+        names = list(self.acquisition.names)
+        if not names:
+            raise ValueError("No channels to stream")
+        if self.scan_rate * len(names) > self.MAX_SAMPLE_RATE:
+            raise ValueError(f"{len(names)} channels at {self.scan_rate} Hz exceeds the T7 stream limit of {self.MAX_SAMPLE_RATE} samples/s")
+
+        addresses, _ = ljm.namesToAddresses(len(names), names)
+        scans_per_read = max(1, int(self.scan_rate // 100))  # ~10 ms of data per read
+
+        # Stream from the internal clock with no trigger, default resolution and settling
+        labjack.write_names(["STREAM_TRIGGER_INDEX", "STREAM_CLOCK_SOURCE", "STREAM_RESOLUTION_INDEX", "STREAM_SETTLING_US"],
+                            [0, 0, 0, 0])
+
+        self.buffer = RingBuffer(self.scan_rate * self.buffer_seconds, len(names))
+        self._reset_counters()
+        self.error = None
+        # eStreamRead blocks until data arrives, so the stream thread talks to the shared handle
+        # directly instead of going through the command queue
+        self.handle = labjack.handle
+        self.scan_rate = ljm.eStreamStart(self.handle, scans_per_read, len(addresses), addresses, self.scan_rate)
+        self.start_time = time.time()
+        log.info("Stream started: %d channels at %s Hz", len(names), self.scan_rate)
+
+        self.running = True
+        self.thread = threading.Thread(target=self._stream_loop)
+        self.thread.daemon = True  # Never keep the application alive on its own
+        self.thread.start()
+
+    def _stream_loop(self):
+        """Background thread: move scans from the device into the ring buffer"""
+        num_channels = self.buffer.num_channels
+        while self.running:
+            try:
+                data, device_backlog, ljm_backlog = ljm.eStreamRead(self.handle)
+            except Exception as e:
+                log.error("Stream read failed, stopping stream: %s", e)
+                self.error = e
+                self.running = False
+                break
+
+            block = np.asarray(data, dtype=np.float64).reshape(-1, num_channels)
+            skipped = block == SKIPPED_SAMPLE
+            if skipped.any():
+                self.skipped_scans += int(skipped.any(axis=1).sum())
+                block[skipped] = np.nan
+            self.buffer.write(block)
+
+            self.total_scans += len(block)
+            self.device_backlog = device_backlog
+            self.ljm_backlog = ljm_backlog
+            self.max_device_backlog = max(self.max_device_backlog, device_backlog)
+            self.max_ljm_backlog = max(self.max_ljm_backlog, ljm_backlog)
+
+        try:
+            ljm.eStreamStop(self.handle)
+        except Exception as e:
+            log.error("Error stopping stream: %s", e)
+
+    def stop(self):
+        """Stop streaming and wait for the stream thread to exit"""
+        self.running = False
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join()
+        self.thread = None
+
+    def sample_times(self, first_index, count):
+        """Wall-clock time (seconds since epoch) of `count` scans starting at scan `first_index`"""
+        return self.start_time + (first_index + np.arange(count)) / self.scan_rate
+
+    def stats(self):
+        """Current stream counters"""
+        return {
+            "scan_rate": self.scan_rate,
+            "total_scans": self.total_scans,
+            "skipped_scans": self.skipped_scans,
+            "device_backlog": self.device_backlog,
+            "ljm_backlog": self.ljm_backlog,
+            "max_device_backlog": self.max_device_backlog,
+            "max_ljm_backlog": self.max_ljm_backlog,
+        }
+
+    def status_text(self):
+        """One-line summary of the stream counters for the GUI"""
+        if not self.running:
+            return "Stream: Off"
+        return (f"Stream: {self.scan_rate:.0f} Hz | Backlog {self.device_backlog}/{self.ljm_backlog} "
+                f"| Skipped {self.skipped_scans}")
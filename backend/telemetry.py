@@ -0,0 +1,123 @@
+import bisect
+import json
+import threading
+import time
+
+# Upper edges of the duration histogram buckets, in microseconds (the last bucket is open ended)
+BUCKET_EDGES_US = (5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000, 200000, 500000, 1000000)
+_BUCKET_EDGES_NS = tuple(edge * 1000 for edge in BUCKET_EDGES_US)
+
+class Histogram:
+    """Fixed-bucket duration histogram - recording is one bisect and two additions"""
+    def __init__(self):
+        self.counts = [0] * (len(_BUCKET_EDGES_NS) + 1)
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, duration_ns):
+        self.counts[bisect.bisect_left(_BUCKET_EDGES_NS, duration_ns)] += 1
+        self.count += 1
+        self.total_ns += duration_ns
+        if duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+
+    def state(self):
+        return (list(self.counts), self.count, self.total_ns)
+
+    def summary(self, since=None):
+        """count, mean and bucket-resolution p50/p90/p99 (ms), optionally only since an earlier state()"""
+        counts, count, total_ns = self.state()
+        if since is not None:
+            counts = [now - before for now, before in zip(counts, since[0])]
+            count -= since[1]
+            total_ns -= since[2]
+        summary = {"count": count, "mean_ms": total_ns / count / 1e6 if count else 0.0, "max_ms": self.max_ns / 1e6}
+        for name, fraction in (("p50_ms", 0.5), ("p90_ms", 0.9), ("p99_ms", 0.99)):
+            summary[name] = self._percentile(counts, count, fraction)
+        return summary
+
+    def _percentile(self, counts, count, fraction):
+        """Upper edge (ms) of the bucket holding the given fraction of samples"""
+        if count <= 0:
+            return 0.0
+        target = fraction * count
+        seen = 0
+        for index, bucket in enumerate(counts):
+            seen += bucket
+            if seen >= target:
+                if index < len(_BUCKET_EDGES_NS):
+                    return _BUCKET_EDGES_NS[index] / 1e6
+                return self.max_ns / 1e6
+        return self.max_ns / 1e6
+
+class Telemetry:
+    """
+    Lightweight counters for the hot paths.
+
+    Stages record durations into fixed-bucket histograms (record), counters accumulate events
+    such as rows, late ticks and dropped samples (count), and gauges hold the latest value of
+    something like a queue depth (gauge). Recording takes no lock and formats nothing, so it
+    can sit inside the sampler loop; under heavy contention an occasional count may be lost,
+    which is fine for telemetry.
+
+    mark() captures the current state; snapshot(since=mark) reports only what happened after
+    it, including the rate of every counter. The telemetry panel and the per-log-file dump
+    each keep their own mark.
+    """
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}
+        self._create_lock = threading.Lock()
+
+    def stage(self, name):
+        histogram = self.stages.get(name)
+        if histogram is None:
+            with self._create_lock:
+                histogram = self.stages.setdefault(name, Histogram())
+        return histogram
+
+    def record(self, name, duration_ns):
+        """Add one duration (perf_counter_ns difference) to a stage"""
+        self.stage(name).record(duration_ns)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+
+    def mark(self):
+        """Current state, to pass to snapshot(since=...) later"""
+        return {
+            "time": time.perf_counter(),
+            "stages": {name: histogram.state() for name, histogram in list(self.stages.items())},
+            "counters": dict(self.counters),
+        }
+
+    def snapshot(self, since=None):
+        """Stage summaries, counters, counter rates and gauges (since an earlier mark, if given)"""
+        now = self.mark()
+        elapsed = now["time"] - since["time"] if since else None
+        stages = {}
+        for name, histogram in list(self.stages.items()):
+            before = since["stages"].get(name) if since else None
+            stages[name] = histogram.summary(before)
+        counters = {}
+        rates = {}
+        for name, value in now["counters"].items():
+            counters[name] = value - (since["counters"].get(name, 0) if since else 0)
+            if elapsed:
+                rates[name] = counters[name] / elapsed
+        return {"elapsed_s": elapsed, "stages": stages, "counters": counters, "rates": rates, "gauges": dict(self.gauges)}
+
+    def dump(self, path, since=None, **extra):
+        """Write a snapshot (plus any extra fields) as JSON"""
+        snapshot = self.snapshot(since)
+        snapshot.update(extra)
+        with open(path, "w") as file:
+            json.dump(snapshot, file, indent=2)
+
+# Shared by every instrumented module
+telemetry = Telemetry()
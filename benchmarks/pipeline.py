@@ -0,0 +1,83 @@
+"""
+Headless acquisition pipeline for the benchmarks.
+
+Builds the same objects MainWindow wires together (LabJackConnection, BatchedAcquisition,
+RedlineEngine, DataLogger, Sampler, ValveBank) for any number of sensors, against the
+simulated LabJack and the offscreen Qt platform, so it runs on machines with no T7 and no
+display.
+"""
+from Interface.headless import application
+import shutil
+import tempfile
+from PyQt5 import QtWidgets
+from backend.ljm_backend import ljm
+from backend.labjack_connection import LabJackConnection
+from backend.acquisition import BatchedAcquisition
+from backend.stream_acquisition import StreamAcquisition
+from backend.redline import RedlineEngine
+from backend.data_logger import DataLogger
+from backend.sampler import Sampler
+from Devices.pressure_transducer import PressureTransducer
+from Devices.thermocouple import Thermocouple
+from Devices.load_cell import LoadCell
+from Devices.valve_control import ValveControl
+from Devices.valve_bank import ValveBank
+
+# Digital outputs the benchmark valves are wired to (EIO0-7, CIO0-3)
+VALVE_OUTPUTS = [f"EIO{i}" for i in range(8)] + [f"CIO{i}" for i in range(4)]
+
+class BenchPanel(QtWidgets.QWidget):
+    """Stand-in parent with the scaling attributes the device widgets read from MainWindow"""
+    def __init__(self):
+        super().__init__()
+        self.scaled_width = self.static_width = 1600
+        self.windim_y = self.static_y = 1007
+        self.resize(1600, 1007)
+
+def make_sensors(count, parent):
+    """`count` sensors in roughly the P&ID's mix: mostly transducers, some thermocouples, a few load cells"""
+    transducers, thermocouples, loadcells = [], [], []
+    channel = 0
+    for i in range(count):
+        if i % 10 == 9:
+            loadcells.append(LoadCell(f"LC-BENCH-{i:03d}", f"AIN{channel}", f"AIN{channel + 1}", 5, 1000, 1, 0, 0, 0, parent))
+            channel += 2
+        elif i % 10 in (3, 7):
+            thermocouples.append(Thermocouple(f"TC-BENCH-{i:03d}", f"AIN{channel}", 5, 10000, 1, 0, 0, 0, parent))
+            channel += 1
+        else:
+            transducers.append(PressureTransducer(f"PT-BENCH-{i:03d}", f"AIN{channel}", "", 0.5, 4.5, 1000, 1, 0, 0, 0, parent))
+            channel += 1
+    return transducers, thermocouples, loadcells
+
+class Pipeline:
+    """The acquisition pipeline for `channels` sensors and `valves` valves on a simulated T7"""
+    def __init__(self, channels, valves=8, latency_ms=0.0):
+        self.app = application()
+        self.sim = ljm.use_simulator(latency_ms=latency_ms, seed=0)
+        self.log_path = tempfile.mkdtemp(prefix="maelstrom_bench_")  # Removed again by close()
+        self.panel = BenchPanel()
+        self.labjack = LabJackConnection(None)
+        self.labjack.connect_to_labjack()
+        self.transducers, self.thermocouples, self.loadcells = make_sensors(channels, self.panel)
+        self.valves = [ValveControl(f"SN-BENCH-{i:02d}", VALVE_OUTPUTS[i % len(VALVE_OUTPUTS)], 0, 0,
+                                    parent=self.panel, labjack=self.labjack) for i in range(valves)]
+        self.acquisition = BatchedAcquisition(self.transducers, self.thermocouples, self.loadcells)
+        self.stream = StreamAcquisition(self.acquisition)
+        self.redlines = RedlineEngine(self.acquisition.sensors())
+        self.data_logger = DataLogger(self.transducers, self.thermocouples, self.loadcells, self.valves,
+                                      parent=self.panel, path=self.log_path)
+        self.sampler = Sampler(self.labjack, self.acquisition, self.stream, self.data_logger, self.redlines, interval_ms=10)
+        self.data_logger.set_sampler(self.sampler)
+        self.valve_bank = ValveBank(self.valves, self.labjack)
+
+    def sensors(self):
+        return self.acquisition.sensors()
+
+    def close(self):
+        self.stream.stop()
+        self.sampler.stop()
+        self.data_logger.stop()
+        self.labjack.close_connection()
+        self.panel.deleteLater()
+        shutil.rmtree(self.log_path, ignore_errors=True)
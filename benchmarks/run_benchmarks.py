@@ -0,0 +1,251 @@
+"""
+End-to-end performance benchmarks for the acquisition loop.
+
+Runs headless (offscreen Qt, simulated LabJack) for each channel count and measures:
+    tick_ms             Sampler.update_data latency (one polled read, convert, redline, log)
+    logger_rows_per_s   DataLogger throughput, rows handed over until they are on disk
+    sequencer_error_ms  |actual - planned| firing time of scheduled valve events while the
+                        sampler runs at 10 ms
+    plot_redraw_ms      LivePlots redraw with one curve per channel
+    label_refresh_ms    DisplayRefresher pass over every channel's label
+
+Latencies are reported as percentiles. Results are compared against a baseline recorded on the
+same machine (benchmarks/baseline.json, not checked in - the numbers only mean something on the
+machine that produced them); anything more than --tolerance times worse is flagged (latencies
+only if they also grew by more than --min-delta-ms, so sub-millisecond noise is ignored). A
+baseline from another machine (host name, CPU model, core count, OS or Python differ), or
+taken with a different --quick or --latency-ms, is not compared.
+
+    python -m benchmarks.run_benchmarks --save-baseline      # first run on a machine: record the baseline
+    python -m benchmarks.run_benchmarks                      # run and compare
+    python -m benchmarks.run_benchmarks --channels 20,200 --quick --check
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+import numpy as np
+
+from benchmarks.pipeline import Pipeline
+from Interface.headless import application
+from Sequencer.scheduler import DeadlineScheduler
+from Interface.live_plots import LivePlots
+from Interface.display_refresh import DisplayRefresher
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+CHANNEL_COUNTS = [20, 50, 100, 200]
+
+def cpu_model():
+    """CPU model name (platform.processor() is empty or just the architecture on Linux)"""
+    try:
+        with open("/proc/cpuinfo") as file:
+            for line in file:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+def host_identity():
+    """What makes two runs comparable: the same host, CPU and core count (OS and Python in "machine")"""
+    return {"node": platform.node(), "cpu": cpu_model(), "cores": os.cpu_count()}
+
+def percentiles(samples):
+    """Summary of a list of durations (ms)"""
+    samples = np.asarray(samples, dtype=np.float64)
+    return {
+        "p50": float(np.percentile(samples, 50)),
+        "p90": float(np.percentile(samples, 90)),
+        "p99": float(np.percentile(samples, 99)),
+        "max": float(samples.max()),
+        "mean": float(samples.mean()),
+        "count": int(len(samples)),
+    }
+
+def pump(app, seconds):
+    """Let queued signals and timers run"""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        app.processEvents()
+        time.sleep(0.001)
+
+def bench_tick(pipeline, ticks):
+    """Per-tick latency of the polled sampler path"""
+    durations = []
+    for _ in range(ticks):
+        start = time.perf_counter_ns()
+        pipeline.sampler.update_data()
+        durations.append((time.perf_counter_ns() - start) / 1e6)
+    pipeline.sampler._pending_rows = []
+    return percentiles(durations)
+
+def bench_logger(pipeline, rows, block_rows=1000):
+    """Rows per second from log_block until the writer thread has written them"""
+    logger = pipeline.data_logger
+    columns = len(pipeline.sensors())
+    values = np.random.default_rng(0).normal(100, 5, (block_rows, columns))
+    target = logger.rows_written + rows
+    start = time.perf_counter()
+    t = time.time()
+    for offset in range(0, rows, block_rows):
+        timestamps = t + (offset + np.arange(block_rows)) * 1e-4
+        logger.log_block(timestamps, values)
+    logger.flush_frame()
+    deadline = start + 60
+    while logger.rows_written < target and time.perf_counter() < deadline:
+        time.sleep(0.001)
+    return rows / (time.perf_counter() - start)
+
+def bench_sequencer(pipeline, events, spacing_ms=20):
+    """Firing error of scheduled valve-bank events while the sampler runs at 10 ms"""
+    scheduler = DeadlineScheduler()
+    valves = pipeline.valves
+    done = []
+    def fire(index):
+        pipeline.valve_bank.apply({valve: (index + position) % 2 == 0 for position, valve in enumerate(valves)})
+    pipeline.sampler.start()
+    scheduler.start([i * spacing_ms for i in range(events)], fire, done.append)
+    while not done:
+        pump(pipeline.app, 0.01)
+    pipeline.sampler.stop()
+    return percentiles([abs(entry["error_ms"]) for entry in scheduler.timing_log])
+
+def bench_plots(pipeline, redraws, history_rows=3000):
+    """Cost of a LivePlots redraw with one curve per channel"""
+    import pyqtgraph as pg
+    widget = pg.PlotWidget(pipeline.panel)
+    widget.resize(600, 200)
+    plots = LivePlots(pipeline.sensors(), display_interval_ms=10**6)
+    for device in pipeline.sensors():
+        plots.add(device.name, widget, 'b')
+    rng = np.random.default_rng(0)
+    now = time.perf_counter_ns()
+    rows = [(now + i * 10_000_000, rng.normal(100, 5, len(pipeline.sensors())).tolist()) for i in range(history_rows)]
+    plots.append_rows(rows)
+    durations = []
+    for i in range(redraws):
+        plots.append_rows([(now + (history_rows + i) * 10_000_000, rng.normal(100, 5, len(pipeline.sensors())).tolist())])
+        start = time.perf_counter_ns()
+        plots.redraw()
+        durations.append((time.perf_counter_ns() - start) / 1e6)
+    plots.redraw_timer.stop()
+    return percentiles(durations)
+
+def bench_labels(pipeline, refreshes):
+    """Cost of one DisplayRefresher pass with every reading changed"""
+    refresher = DisplayRefresher(pipeline.sensors(), refresh_interval_ms=10**6)
+    durations = []
+    for i in range(refreshes):
+        for device in pipeline.transducers:
+            device.pressure = 100.0 + i
+        for device in pipeline.thermocouples:
+            device.temperature = 20.0 + i
+        for device in pipeline.loadcells:
+            device.load = 5.0 + i
+        start = time.perf_counter_ns()
+        refresher.refresh()
+        durations.append((time.perf_counter_ns() - start) / 1e6)
+    refresher.refresh_timer.stop()
+    return percentiles(durations)
+
+def run(channel_counts, quick=False, latency_ms=0.0):
+    scale = 0.2 if quick else 1.0
+    results = {}
+    for channels in channel_counts:
+        # The pipeline prints on every file switch and flush - keep the report readable
+        with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+            pipeline = Pipeline(channels, latency_ms=latency_ms)
+            try:
+                results[str(channels)] = {
+                    "tick_ms": bench_tick(pipeline, int(2000 * scale)),
+                    "logger_rows_per_s": bench_logger(pipeline, int(200000 * scale)),
+                    "sequencer_error_ms": bench_sequencer(pipeline, int(100 * scale)),
+                    "plot_redraw_ms": bench_plots(pipeline, int(200 * scale)),
+                    "label_refresh_ms": bench_labels(pipeline, int(200 * scale)),
+                }
+            finally:
+                pipeline.close()
+        print(f"{channels} channels done", file=sys.stderr)
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "machine": f"{platform.system()} {platform.machine()} Python {platform.python_version()}",
+        "host": host_identity(),
+        "latency_ms": latency_ms,
+        "quick": quick,
+        "channels": results,
+    }
+
+def compare(report, baseline, tolerance, min_delta_ms=0.5):
+    """Print current vs baseline; returns the list of regressions (latencies must also be min_delta_ms worse)"""
+    regressions = []
+    print(f"{'channels':>8}  {'metric':<20} {'current':>12} {'baseline':>12} {'ratio':>7}")
+    for channels, metrics in report["channels"].items():
+        for metric, value in metrics.items():
+            old = baseline.get("channels", {}).get(channels, {}).get(metric) if baseline else None
+            if isinstance(value, dict):
+                # Latency - compare the p99 (lower is better)
+                current, previous, label = value["p99"], old["p99"] if old else None, f"{metric} p99"
+                ratio = current / previous if previous else None
+                worse = ratio is not None and ratio > tolerance and current - previous > min_delta_ms
+            else:
+                # Throughput (higher is better)
+                current, previous, label = value, old, metric
+                ratio = current / previous if previous else None
+                worse = ratio is not None and ratio < 1 / tolerance
+            ratio_text = f"{ratio:7.2f}" if ratio is not None else "      -"
+            previous_text = f"{previous:12.3f}" if previous is not None else "           -"
+            print(f"{channels:>8}  {label:<20} {current:12.3f} {previous_text} {ratio_text}{'  REGRESSION' if worse else ''}")
+            if worse:
+                regressions.append((channels, label, current, previous))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Acquisition loop benchmarks (headless, simulated LabJack)")
+    parser.add_argument("--channels", default=",".join(str(count) for count in CHANNEL_COUNTS),
+                        help="comma separated channel counts (default 20,50,100,200)")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations (for CI smoke runs)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated LabJack round trip per command")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="flag results this many times worse than baseline")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="ignore latency changes smaller than this")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 if anything regressed")
+    parser.add_argument("--output", help="also write the results JSON here")
+    args = parser.parse_args(argv)
+
+    application()
+    report = run([int(count) for count in args.channels.split(",")], quick=args.quick, latency_ms=args.latency_ms)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        # Only numbers from the same machine and settings are comparable (quick runs are warm-up dominated)
+        different = [key for key in ("host", "machine", "quick", "latency_ms") if baseline.get(key) != report[key]]
+        if different:
+            print(f"Baseline {args.baseline} differs in {', '.join(different)} - not comparing "
+                  "(record one for this setup with --save-baseline)")
+            baseline = None
+    else:
+        print(f"No baseline at {args.baseline} - record one on this machine with --save-baseline")
+    regressions = compare(report, baseline, args.tolerance, args.min_delta_ms)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    if regressions:
+        print(f"{len(regressions)} results regressed by more than {args.tolerance}x")
+        if args.check:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
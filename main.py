@@ -1,10 +1,14 @@
 import sys
 from PyQt5 import QtWidgets
 from Interface.MainPanel import MainWindow
+from backend import event_log
 
 def main():
     # Main application
     app = QtWidgets.QApplication(sys.argv)
+
+    # Events (valve changes, file switches, warnings) go to GG_Test/logs/events_<time>.jsonl and the console
+    event_log.start()
     
     # Create the main window (fluid panel)
     main_window = MainWindow()
@@ -14,7 +18,10 @@ def main():
     
     main_window.show()
     
-    return app.exec_()
+    try:
+        return app.exec_()
+    finally:
+        event_log.stop()
 
 if __name__ == "__main__":
     sys.exit(main())
\ No newline at end of file
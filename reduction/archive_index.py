@@ -0,0 +1,230 @@
+"""
+On-disk index of the test archive (SQLite).
+
+Every log under data/ (recursively, .csv and .mlog, named by the DataLogger as
+{base}_{mode}_{YYYYmmdd_HHMMSS}) gets a row in `runs` - test name, mode, file creation time,
+start, duration, samples, sample interval - and a row per channel in `channels` with its
+precomputed statistics (min / max / mean, valve openings). refresh() only re-reads logs whose
+size or mtime changed since they were indexed and drops logs that were deleted, so after the
+first build listing or filtering hundreds of runs is a stat() per file plus one query.
+
+    python -m reduction.archive_index                             # refresh and list every run
+    python -m reduction.archive_index --test 'gg_hotfire%' --mode high --channel PT-GG-01
+    python -m reduction.archive_index --since 2025-05-24 --min-duration 5 --no-refresh
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from backend.log_format import EXTENSION, parse_log_name
+from reduction.data_reduction import reduce_log
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA = os.path.join(ROOT, "data")
+INDEX = "archive_index.sqlite"
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    path TEXT PRIMARY KEY,          -- relative to the archive root
+    test TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    created TEXT NOT NULL,          -- from the file name, ISO local time
+    format TEXT NOT NULL,           -- "csv" or "mlog"
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    start TEXT,                     -- first timestamp, ISO local time
+    duration_s REAL,
+    samples INTEGER,
+    sample_interval_ms REAL,
+    error TEXT                      -- why the log could not be read (other fields NULL)
+);
+CREATE INDEX IF NOT EXISTS runs_test ON runs (test);
+CREATE INDEX IF NOT EXISTS runs_created ON runs (created);
+CREATE TABLE IF NOT EXISTS channels (
+    path TEXT NOT NULL REFERENCES runs (path) ON DELETE CASCADE,
+    device TEXT NOT NULL,
+    kind TEXT NOT NULL,             -- "pressure", "temperature", "load" or "valve"
+    min REAL,
+    max REAL,
+    mean REAL,
+    peak_time_s REAL,
+    openings INTEGER,               -- valves only
+    open_total_s REAL,              -- valves only
+    PRIMARY KEY (path, device)
+);
+CREATE INDEX IF NOT EXISTS channels_device ON channels (device);
+"""
+
+def _scan(path, root):
+    """Worker: (relative path, run row, channel rows) for one log"""
+    relative = os.path.relpath(path, root)
+    name = parse_log_name(path)
+    stat = os.stat(path)
+    run = {"path": relative, "test": name.base, "mode": name.mode, "created": name.created.isoformat(),
+           "format": "mlog" if path.endswith(EXTENSION) else "csv", "size": stat.st_size, "mtime": stat.st_mtime,
+           "start": None, "duration_s": None, "samples": None, "sample_interval_ms": None, "error": None}
+    try:
+        summary = reduce_log(path)
+    except (OSError, ValueError, KeyError) as e:
+        run["error"] = str(e)
+        return run, []
+    run.update(start=summary["start"], duration_s=summary["duration_s"], samples=summary["samples"],
+               sample_interval_ms=summary["sample_interval_ms"])
+    channels = []
+    for kind, group in (("pressure", "pressures"), ("temperature", "temperatures"), ("load", "loads")):
+        for device, stats in summary[group].items():
+            if stats is None:
+                channels.append((relative, device, kind, None, None, None, None, None, None))
+            else:
+                channels.append((relative, device, kind, stats["min"], stats["peak"], stats["mean"],
+                                 stats["peak_time_s"], None, None))
+    for device, valve in summary["valves"].items():
+        channels.append((relative, device, "valve", None, None, None, None, len(valve["events"]), valve["open_total_s"]))
+    return run, channels
+
+class ArchiveIndex:
+    """
+    SQLite index of the logs under `root`, stored in <root>/archive_index.sqlite by default.
+    Call refresh() to bring it up to date, then runs() / channels() to query it.
+    """
+    def __init__(self, root=DATA, path=None):
+        self.root = os.path.abspath(root)
+        self.path = path or os.path.join(self.root, INDEX)
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA foreign_keys = ON")
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            # Older layout - it is only a cache, so rebuild it
+            self.db.executescript("DROP TABLE IF EXISTS channels; DROP TABLE IF EXISTS runs;")
+            self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def logs(self):
+        """{relative path: (absolute path, size, mtime)} of every log under the root"""
+        found = {}
+        for directory, _, files in os.walk(self.root):
+            for file in files:
+                if not file.endswith((".csv", EXTENSION)) or parse_log_name(file) is None:
+                    continue
+                path = os.path.join(directory, file)
+                stat = os.stat(path)
+                found[os.path.relpath(path, self.root)] = (path, stat.st_size, stat.st_mtime)
+        return found
+
+    def refresh(self, workers=None):
+        """
+        Index new and changed logs (size or mtime differs) and forget deleted ones.
+
+        Returns:
+            tuple: (logs indexed, logs removed)
+        """
+        found = self.logs()
+        known = {row["path"]: (row["size"], row["mtime"]) for row in self.db.execute("SELECT path, size, mtime FROM runs")}
+        stale = [path for path, (_, size, mtime) in found.items() if known.get(path) != (size, mtime)]
+        removed = [path for path in known if path not in found]
+        scanned = []
+        if stale:
+            paths = [found[path][0] for path in stale]
+            if len(paths) == 1:
+                scanned = [_scan(paths[0], self.root)]
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    scanned = list(pool.map(_scan, paths, [self.root] * len(paths)))
+        with self.db:
+            self.db.executemany("DELETE FROM runs WHERE path = ?", [(path,) for path in removed + stale])
+            for run, channels in scanned:
+                self.db.execute(f"INSERT INTO runs ({', '.join(run)}) VALUES ({', '.join('?' * len(run))})",
+                                list(run.values()))
+                self.db.executemany("INSERT INTO channels VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", channels)
+        return len(stale), len(removed)
+
+    def runs(self, test=None, mode=None, since=None, until=None, channel=None, min_duration=None):
+        """
+        Indexed runs, oldest first, as sqlite3.Row objects.
+
+        Args:
+            test: SQL LIKE pattern on the test name (e.g. "gg_hotfire%")
+            mode: "high" or "low"
+            since / until: ISO date or time bounds on the file creation time
+            channel: only runs that logged this device
+            min_duration: only runs at least this many seconds long
+        """
+        clauses, values = [], []
+        if test is not None:
+            clauses.append("test LIKE ?")
+            values.append(test)
+        if mode is not None:
+            clauses.append("mode = ?")
+            values.append(mode)
+        if since is not None:
+            clauses.append("created >= ?")
+            values.append(since)
+        if until is not None:
+            clauses.append("created < ?")
+            values.append(until)
+        if channel is not None:
+            clauses.append("path IN (SELECT path FROM channels WHERE device = ?)")
+            values.append(channel)
+        if min_duration is not None:
+            clauses.append("duration_s >= ?")
+            values.append(min_duration)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self.db.execute(f"SELECT * FROM runs {where} ORDER BY created, path", values).fetchall()
+
+    def channels(self, path):
+        """Channel statistics of one run (relative path as stored in runs)"""
+        return self.db.execute("SELECT * FROM channels WHERE path = ? ORDER BY kind, device", (path,)).fetchall()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List and filter the test archive through its index")
+    parser.add_argument("--root", default=DATA, help="archive directory (default data/)")
+    parser.add_argument("--no-refresh", action="store_true", help="query the index as it is")
+    parser.add_argument("--workers", type=int, help="processes for indexing new logs (default: one per CPU)")
+    parser.add_argument("--test", help="test name, SQL LIKE pattern (e.g. 'gg_hotfire%%')")
+    parser.add_argument("--mode", choices=("high", "low"))
+    parser.add_argument("--since", help="created on or after (ISO date/time)")
+    parser.add_argument("--until", help="created before (ISO date/time)")
+    parser.add_argument("--channel", help="only runs that logged this device")
+    parser.add_argument("--min-duration", type=float, help="only runs at least this many seconds long")
+    parser.add_argument("--channels", action="store_true", help="also list each run's channel statistics")
+    args = parser.parse_args(argv)
+
+    index = ArchiveIndex(args.root)
+    try:
+        if not args.no_refresh:
+            start = time.perf_counter()
+            indexed, removed = index.refresh(args.workers)
+            print(f"Index refreshed in {(time.perf_counter() - start) * 1000:.0f} ms "
+                  f"({indexed} indexed, {removed} removed)", file=sys.stderr)
+        start = time.perf_counter()
+        runs = index.runs(args.test, args.mode, args.since, args.until, args.channel, args.min_duration)
+        elapsed = time.perf_counter() - start
+        print(f"{'created':<20} {'test':<26} {'mode':<5} {'duration':>9} {'samples':>8} {'interval':>9}  path")
+        for run in runs:
+            if run["error"] is not None:
+                print(f"{run['created']:<20} {run['test']:<26} {run['mode']:<5} {'ERROR':>9}  {run['path']}: {run['error']}")
+                continue
+            interval = f"{run['sample_interval_ms']:7.1f}ms" if run["sample_interval_ms"] is not None else f"{'-':>9}"
+            print(f"{run['created']:<20} {run['test']:<26} {run['mode']:<5} {run['duration_s']:9.2f} "
+                  f"{run['samples']:8d} {interval}  {run['path']}")
+            if args.channels:
+                for channel in index.channels(run["path"]):
+                    if channel["kind"] == "valve":
+                        print(f"{'':>22}{channel['device']:<14} opened {channel['openings']}x, "
+                              f"{channel['open_total_s']:.2f} s in total")
+                    elif channel["max"] is not None:
+                        print(f"{'':>22}{channel['device']:<14} min {channel['min']:10.2f}  max {channel['max']:10.2f}  "
+                              f"mean {channel['mean']:10.2f}")
+        print(f"{len(runs)} runs ({elapsed * 1000:.1f} ms)", file=sys.stderr)
+    finally:
+        index.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Batch reduction of the whole test archive.
+
+Spreads the logs over a process pool (one log per task, each read a chunk at a time by
+data_reduction.Reducer), writes every log's <name>_summary.json (and plot with --plots) to the
+output directory, and one consolidated table with a row per test: duration, sample rate,
+chamber and peak pressures, and valve timings. Progress and throughput are reported as logs
+finish.
+
+    python -m reduction.batch                                  # data/ and data/archive_data/
+    python -m reduction.batch data --workers 4 --plots --output-dir reduced
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from reduction.data_reduction import BURN_FRACTION, find_logs, reduce_file
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARCHIVE = [os.path.join(ROOT, "data"), os.path.join(ROOT, "data", "archive_data")]
+TABLE = "reduction_summary.csv"
+
+def _reduce(path, output_dir, plot, chamber, burn_fraction, chunk_size):
+    """Worker: (path, summary or None, error or None, seconds)"""
+    start = time.perf_counter()
+    try:
+        summary = reduce_file(path, output_dir, plot, chamber, burn_fraction, chunk_size)
+        return path, summary, None, time.perf_counter() - start
+    except (OSError, ValueError, KeyError) as e:
+        return path, None, str(e), time.perf_counter() - start
+
+def table_row(path, summary, error=None):
+    """One row of the consolidated table (column -> value) for a reduced log"""
+    row = {"file": os.path.basename(path), "directory": os.path.dirname(path)}
+    if summary is None:
+        row["error"] = error
+        return row
+    interval = summary["sample_interval_ms"]
+    row.update({
+        "test": summary["test"],
+        "mode": summary["mode"],
+        "start": summary["start"],
+        "samples": summary["samples"],
+        "duration_s": summary["duration_s"],
+        "sample_rate_hz": 1000 / interval if interval else None,
+    })
+    chamber = summary["chamber"]
+    if chamber is not None:
+        row.update({
+            "chamber": chamber["channel"],
+            "chamber_peak_psi": chamber["peak_psi"],
+            "chamber_mean_psi": chamber["mean_psi"],
+            "burn_duration_s": chamber["burn_duration_s"],
+        })
+    for name, stats in summary["pressures"].items():
+        row[f"{name} peak psi"] = stats["peak"] if stats else None
+    for name, valve in summary["valves"].items():
+        events = valve["events"]
+        if not events:
+            continue
+        row[f"{name} openings"] = len(events)
+        row[f"{name} first open s"] = events[0]["open_s"]
+        row[f"{name} last close s"] = events[-1]["close_s"]
+        row[f"{name} open total s"] = valve["open_total_s"]
+    return row
+
+def write_table(rows, path):
+    """Write the rows as CSV, columns in order of first appearance (missing values left blank)"""
+    import pandas as pd
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+def run_batch(paths, output_dir, workers=None, plot=False, chamber=None, burn_fraction=BURN_FRACTION,
+              chunk_size=100000, progress=sys.stderr):
+    """
+    Reduce every log in `paths` (files or directories) in a process pool.
+
+    Returns:
+        list: table rows, in the order of `paths`
+    """
+    logs = [log for path in paths for log in find_logs(path)]
+    sizes = {log: os.path.getsize(log) for log in logs}
+    os.makedirs(output_dir, exist_ok=True)
+    results = {}
+    start = time.perf_counter()
+    done_bytes = done_rows = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_reduce, log, output_dir, plot, chamber, burn_fraction, chunk_size) for log in logs]
+        for done, future in enumerate(as_completed(futures), 1):
+            path, summary, error, seconds = future.result()
+            results[path] = table_row(path, summary, error)
+            done_bytes += sizes[path]
+            done_rows += summary["samples"] if summary else 0
+            elapsed = time.perf_counter() - start
+            status = f"FAILED - {error}" if error else f"{seconds:.2f} s"
+            print(f"[{done:>4}/{len(logs)}] {os.path.basename(path):<48} {status:<10} "
+                  f"{done_bytes / 1e6 / elapsed:6.2f} MB/s  {done / elapsed:6.1f} logs/s", file=progress)
+    elapsed = time.perf_counter() - start
+    print(f"Reduced {len(logs)} logs ({done_bytes / 1e6:.1f} MB, {done_rows} rows) in {elapsed:.1f} s: "
+          f"{done_bytes / 1e6 / elapsed:.2f} MB/s, {done_rows / elapsed:,.0f} rows/s", file=progress)
+    return [results[log] for log in logs]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reduce the whole test archive in parallel")
+    parser.add_argument("paths", nargs="*", default=ARCHIVE, help="log files or directories (default data/ and data/archive_data/)")
+    parser.add_argument("--output-dir", default=os.path.join(ROOT, "data", "reduced"),
+                        help="summaries, plots and the table go here (default data/reduced)")
+    parser.add_argument("--table", default=TABLE, help=f"consolidated table file name (default {TABLE})")
+    parser.add_argument("--workers", type=int, help="processes (default: one per CPU)")
+    parser.add_argument("--plots", action="store_true", help="also render every log's plot (slower)")
+    parser.add_argument("--chunk-rows", type=int, default=100000, help="rows read at a time from each log")
+    parser.add_argument("--chamber", help="chamber transducer (default: first of PT-GG-01, PT-TI-01)")
+    parser.add_argument("--burn-fraction", type=float, default=BURN_FRACTION)
+    args = parser.parse_args(argv)
+
+    rows = run_batch(args.paths, args.output_dir, args.workers, args.plots, args.chamber,
+                     args.burn_fraction, args.chunk_rows)
+    table = os.path.join(args.output_dir, args.table)
+    write_table(rows, table)
+    failed = sum("error" in row for row in rows)
+    print(f"Wrote {table} ({len(rows)} logs, {failed} failed)")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""
+Post-test data reduction (replaces data_reduction.m).
+
+Reads a log (.csv or .mlog), finds its pressure, temperature, load and valve state columns the
+way the MATLAB script did (PT-... Pressure, ... State), and reduces it to a summary: duration
+and sample interval from the recorded timestamps, peak / mean of every channel, the chamber
+pressure over the burn, and the open / close time and duration of every valve event. The
+dual-axis pressure / valve plot is rendered headless (reduction/plots.py).
+
+    python -m reduction.data_reduction data/gg_hotfire_test_1_high_20250524_221008.csv
+    python -m reduction.data_reduction data --no-plot          # every log in a directory
+
+Logs are read a chunk at a time (see Reducer). For the whole archive use reduction/batch.py,
+which spreads the logs over a process pool and writes one summary table.
+
+Outputs go next to each log (or to --output-dir): <name>_summary.json and <name>.png.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from collections import namedtuple
+from datetime import datetime
+import numpy as np
+from backend.log_format import EXTENSION, REVIEW_EXTENSION, iter_chunks, parse_log_name
+
+# Chamber transducers, in order of preference, when --chamber is not given
+CHAMBER_CHANNELS = ("PT-GG-01", "PT-TI-01")
+# Burn window: where chamber pressure is at least this fraction of its peak
+BURN_FRACTION = 0.1
+# Below this peak there was no burn to average over (cold flow, or only sensor noise)
+BURN_MIN_PSI = 20.0
+
+class Run(namedtuple("Run", "path start times pressures temperatures loads states")):
+    """
+    A loaded log. start is the first timestamp (seconds since the epoch) and times are seconds
+    from it; the other fields map column name -> numpy array, states as 0/1.
+    """
+    __slots__ = ()
+
+def classify(column):
+    """Kind of a log column: "pressure", "temperature", "load", "state" or None"""
+    name = column.upper()
+    if "STATE" in name:
+        return "state"
+    if "PT-" in name and "PRESSURE" in name:
+        return "pressure"
+    # Older logs labelled thermocouples "Pressure" too
+    if "TC-" in name or "TEMPERATURE" in name:
+        return "temperature"
+    if "LC-" in name or "LOAD" in name:
+        return "load"
+    return None
+
+def load_run(path, chunk_size=100000):
+    """Read a whole log into a Run (timestamps spread across the second for the older CSV logs)"""
+    chunks = list(iter_chunks(path, chunk_size))
+    if not chunks or not sum(len(chunk["Timestamp"]) for chunk in chunks):
+        raise ValueError(f"{path} has no data rows")
+    columns = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+    timestamps = columns.pop("Timestamp")
+    groups = {"pressure": {}, "temperature": {}, "load": {}, "state": {}}
+    for name, values in columns.items():
+        kind = classify(name)
+        if kind is not None:
+            groups[kind][name] = values
+    start = float(timestamps[0])
+    return Run(path, start, timestamps - start, groups["pressure"], groups["temperature"],
+               groups["load"], groups["state"])
+
+def channel_name(column):
+    """Device name of a column ("PT-GG-01 Pressure" -> "PT-GG-01")"""
+    return column.rsplit(" ", 1)[0]
+
+class _ChannelStats:
+    """Running peak (and its time), mean and min of one channel"""
+    def __init__(self):
+        self.peak = -np.inf
+        self.peak_time = None
+        self.total = 0.0
+        self.count = 0
+        self.min = np.inf
+
+    def add(self, times, values):
+        finite = np.isfinite(values)
+        if not finite.any():
+            return
+        values, times = values[finite], times[finite]
+        peak = int(np.argmax(values))
+        if values[peak] > self.peak:
+            self.peak, self.peak_time = float(values[peak]), float(times[peak])
+        self.total += float(values.sum(dtype=np.float64))
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+
+    def summary(self):
+        """Peak, its time, mean and min (None for a channel with no readings)"""
+        if not self.count:
+            return None
+        return {"peak": self.peak, "peak_time_s": self.peak_time, "mean": self.total / self.count, "min": self.min}
+
+class _ValveEvents:
+    """
+    Open intervals of one valve across chunks: [{"open_s", "close_s", "duration_s"}]. A valve open
+    at the start of the log opens at 0; one still open at the end has close_s and duration_s None.
+    """
+    def __init__(self):
+        self.state = 0
+        self.opened = None
+        self.events = []
+
+    def add(self, times, states):
+        states = np.asarray(states, dtype=np.int8)
+        edges = np.diff(np.r_[np.int8(self.state), states])
+        for row in np.flatnonzero(edges):
+            if edges[row] > 0:
+                self.opened = float(times[row])
+            else:
+                close = float(times[row])
+                self.events.append({"open_s": self.opened, "close_s": close, "duration_s": close - self.opened})
+                self.opened = None
+        self.state = int(states[-1])
+
+    def finish(self):
+        if self.opened is not None:
+            self.events.append({"open_s": self.opened, "close_s": None, "duration_s": None})
+            self.opened = None
+        return self.events
+
+def chamber_summary(channel, times, values, burn_fraction=BURN_FRACTION):
+    """Peak and burn-averaged pressure of the chamber transducer's trace, or None if it has no readings"""
+    finite = np.isfinite(values)
+    if not finite.any():
+        return None
+    peak = int(np.argmax(np.where(finite, values, -np.inf)))
+    summary = {"channel": channel, "peak_psi": float(values[peak]), "peak_time_s": float(times[peak]),
+               "mean_psi": None, "burn_start_s": None, "burn_end_s": None, "burn_duration_s": None}
+    if values[peak] >= BURN_MIN_PSI:
+        with np.errstate(invalid="ignore"):
+            burning = np.flatnonzero(values >= burn_fraction * values[peak])
+        first, last = burning[0], burning[-1]
+        summary.update(mean_psi=float(np.nanmean(values[first:last + 1])), burn_start_s=float(times[first]),
+                       burn_end_s=float(times[last]), burn_duration_s=float(times[last] - times[first]))
+    return summary
+
+class Reducer:
+    """
+    Summary of a log built a chunk at a time (chunks as yielded by log_format.iter_chunks), so
+    no log is ever fully in memory. Only the chamber trace and the sample intervals are kept
+    for the whole file: the burn window depends on the final peak, the median on every interval.
+    """
+    def __init__(self, path, chamber=None, burn_fraction=BURN_FRACTION):
+        self.path = path
+        self.chamber = chamber
+        self.burn_fraction = burn_fraction
+        self.start = None
+        self.rows = 0
+        self._last_time = None
+        self._kinds = {}  # column -> "pressure" / "temperature" / "load" / "state"
+        self._stats = {}
+        self._valves = {}
+        self._chamber_column = None
+        self._chamber = []  # (times, values) chunks of the chamber transducer
+        self._intervals = []
+
+    def _columns(self, chunk):
+        """Classify the columns and pick the chamber transducer (first chunk)"""
+        for name in chunk:
+            kind = classify(name) if name != "Timestamp" else None
+            if kind is None:
+                continue
+            self._kinds[name] = kind
+            if kind == "state":
+                self._valves[name] = _ValveEvents()
+            else:
+                self._stats[name] = _ChannelStats()
+        pressures = {channel_name(name): name for name, kind in self._kinds.items() if kind == "pressure"}
+        names = [self.chamber] if self.chamber else CHAMBER_CHANNELS
+        self._chamber_column = next((pressures[name] for name in names if name in pressures), None)
+
+    def add(self, chunk):
+        timestamps = chunk["Timestamp"]
+        if len(timestamps) == 0:
+            return
+        if self.start is None:
+            self.start = float(timestamps[0])
+            self._columns(chunk)
+        times = timestamps - self.start
+        previous = times[:1] if self._last_time is None else [self._last_time]
+        self._intervals.append(np.diff(np.r_[previous, times]).astype(np.float32))
+        for name, stats in self._stats.items():
+            stats.add(times, np.asarray(chunk[name], dtype=np.float64))
+        for name, valve in self._valves.items():
+            valve.add(times, chunk[name])
+        if self._chamber_column is not None:
+            self._chamber.append((times, np.asarray(chunk[self._chamber_column], dtype=np.float64)))
+        self.rows += len(times)
+        self._last_time = float(times[-1])
+
+    def summary(self):
+        """Summary of everything added, as a JSON-ready dict"""
+        if not self.rows:
+            raise ValueError(f"{self.path} has no data rows")
+        intervals = np.concatenate(self._intervals)[1:]
+        chamber = None
+        if self._chamber_column is not None:
+            times = np.concatenate([times for times, _ in self._chamber])
+            values = np.concatenate([values for _, values in self._chamber])
+            chamber = chamber_summary(channel_name(self._chamber_column), times, values, self.burn_fraction)
+        name = parse_log_name(self.path)
+        groups = {"pressure": {}, "temperature": {}, "load": {}}
+        for column, stats in self._stats.items():
+            groups[self._kinds[column]][channel_name(column)] = stats.summary()
+        valves = {}
+        for column, valve in self._valves.items():
+            events = valve.finish()
+            valves[channel_name(column)] = {
+                "events": events,
+                "open_total_s": sum(event["duration_s"] or 0.0 for event in events),
+            }
+        return {
+            "file": os.path.basename(self.path),
+            "test": name.base if name else None,
+            "mode": name.mode if name else None,
+            "start": datetime.fromtimestamp(self.start).isoformat(timespec="milliseconds"),
+            "samples": self.rows,
+            "duration_s": self._last_time,
+            "sample_interval_ms": float(np.median(intervals) * 1000) if len(intervals) else None,
+            "chamber": chamber,
+            "pressures": groups["pressure"],
+            "temperatures": groups["temperature"],
+            "loads": groups["load"],
+            "valves": valves,
+        }
+
+def reduce_log(path, chamber=None, burn_fraction=BURN_FRACTION, chunk_size=100000):
+    """Summary of one log, read a chunk at a time"""
+    reducer = Reducer(path, chamber, burn_fraction)
+    for chunk in iter_chunks(path, chunk_size):
+        reducer.add(chunk)
+    return reducer.summary()
+
+def find_logs(path):
+    """The logs to reduce: the file itself, or every .csv / .mlog in a directory"""
+    if not os.path.isdir(path):
+        return [path]
+    logs = glob.glob(os.path.join(path, "*.csv")) + glob.glob(os.path.join(path, "*" + EXTENSION))
+    return sorted(log for log in logs if not log.endswith(REVIEW_EXTENSION))
+
+def output_paths(path, output_dir=None):
+    """(summary JSON, plot PNG) paths for a log"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    directory = output_dir or os.path.dirname(path)
+    return os.path.join(directory, stem + "_summary.json"), os.path.join(directory, stem + ".png")
+
+def reduce_file(path, output_dir=None, plot=True, chamber=None, burn_fraction=BURN_FRACTION, chunk_size=100000):
+    """Reduce one log: write its summary (and plot) and return the summary"""
+    summary = reduce_log(path, chamber, burn_fraction, chunk_size)
+    summary_path, plot_path = output_paths(path, output_dir)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(summary_path, "w") as file:
+        json.dump(summary, file, indent=2)
+    if plot:
+        from reduction.plots import render_run
+        # The plot needs every sample (decimated for drawing), so only it loads the whole log
+        render_run(load_run(path), plot_path)
+    return summary
+
+def describe(summary):
+    """One line summary for the console"""
+    line = f"{summary['file']}: {summary['samples']} samples over {summary['duration_s']:.2f} s"
+    if summary["sample_interval_ms"] is not None:
+        line += f" ({summary['sample_interval_ms']:.1f} ms)"
+    chamber = summary["chamber"]
+    if chamber is not None:
+        line += f", {chamber['channel']} peak {chamber['peak_psi']:.1f} psi"
+        if chamber["mean_psi"] is not None:
+            line += f", mean {chamber['mean_psi']:.1f} psi over {chamber['burn_duration_s']:.2f} s"
+    opened = sum(len(valve["events"]) for valve in summary["valves"].values())
+    return line + f", {opened} valve openings"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reduce test logs to summaries and pressure / valve plots")
+    parser.add_argument("paths", nargs="+", help="log files (.csv or .mlog) or directories of them")
+    parser.add_argument("--output-dir", help="write summaries and plots here instead of next to each log")
+    parser.add_argument("--no-plot", action="store_true", help="summaries only")
+    parser.add_argument("--chamber", help=f"chamber transducer (default: first of {', '.join(CHAMBER_CHANNELS)})")
+    parser.add_argument("--burn-fraction", type=float, default=BURN_FRACTION,
+                        help="burn window: chamber pressure above this fraction of its peak (default 0.1)")
+    args = parser.parse_args(argv)
+
+    paths = [log for path in args.paths for log in find_logs(path)]
+    failed = 0
+    for path in paths:
+        try:
+            summary = reduce_file(path, args.output_dir, not args.no_plot, args.chamber, args.burn_fraction)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"{os.path.basename(path)}: FAILED - {e}")
+            failed += 1
+            continue
+        print(describe(summary))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
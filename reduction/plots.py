@@ -0,0 +1,65 @@
+"""
+Headless dual-axis plots for data reduction: pressures on the left axis, valve states (dashed,
+0/1) on the right, like the figure data_reduction.m produced. Rendered with pyqtgraph on the
+offscreen Qt platform, so no display is needed.
+"""
+from Interface.headless import application
+import numpy as np
+import pyqtgraph as pg
+import pyqtgraph.exporters
+from PyQt5.QtCore import Qt
+from Interface.live_plots import min_max_decimate
+from reduction.data_reduction import channel_name
+
+# Points per trace after min/max decimation - well beyond the exported image width
+PLOT_BUCKETS = 4000
+
+def state_changes(times, states):
+    """The samples either side of every change of a 0/1 trace - the same line, far fewer points"""
+    changes = np.flatnonzero(np.diff(states))
+    rows = np.unique(np.concatenate(([0, len(states) - 1], changes, changes + 1)))
+    return times[rows], states[rows].astype(float)
+
+def render_run(run, path, width=1600, height=900):
+    """Render a Run's pressure / valve state plot to a PNG"""
+    app = application()  # Keep a reference while the widgets exist
+    pg.setConfigOptions(antialias=True, background="w", foreground="k")
+    widget = pg.PlotWidget()
+    widget.resize(width, height)
+    plot = widget.getPlotItem()
+    plot.setTitle("Pressure and Solenoid States Over Time")
+    plot.setLabel("bottom", "Time", units="s")
+    plot.setLabel("left", "Pressure (psi)")
+    plot.showGrid(x=True, y=True, alpha=0.3)
+    legend = plot.addLegend(offset=(-10, 10))
+
+    # Valve states on a second view box sharing the x axis, scaled on the right axis
+    states = pg.ViewBox()
+    plot.showAxis("right")
+    plot.scene().addItem(states)
+    plot.getAxis("right").linkToView(states)
+    plot.getAxis("right").setLabel("Solenoid/Binary State")
+    states.setXLink(plot)
+    states.setYRange(-0.1, 1.2, padding=0)
+
+    for index, (column, values) in enumerate(run.pressures.items()):
+        times, values = min_max_decimate(run.times, values, PLOT_BUCKETS)
+        plot.plot(times, values, pen=pg.mkPen(pg.intColor(index, hues=max(len(run.pressures), 1)), width=2),
+                  name=channel_name(column))
+    for index, (column, values) in enumerate(run.states.items()):
+        times, values = state_changes(run.times, values)
+        pen = pg.mkPen(pg.intColor(index, hues=max(len(run.states), 1), values=2), width=1.5, style=Qt.DashLine)
+        curve = pg.PlotDataItem(times, values, pen=pen)
+        states.addItem(curve)
+        legend.addItem(curve, channel_name(column))
+
+    # Lay the widget out (offscreen) so the axes have their real size and ticks before exporting
+    widget.show()
+    app.processEvents()
+    states.setGeometry(plot.vb.sceneBoundingRect())
+    states.linkedViewChanged(plot.vb, states.XAxis)
+    exporter = pg.exporters.ImageExporter(plot)
+    exporter.parameters()["width"] = width
+    exporter.export(path)
+    widget.close()
+    app.processEvents()